@@ -1,17 +1,43 @@
 import sys
 import os
+import argparse
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.advanced_drug_search import AdvancedDrugSearch
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Медицинская поисковая система RAG")
+    parser.add_argument("--serve", action="store_true", help="запустить HTTP-сервис вместо интерактивного режима")
+    parser.add_argument("--host", default="127.0.0.1", help="адрес HTTP-сервиса")
+    parser.add_argument("--port", type=int, default=8000, help="порт HTTP-сервиса")
+    parser.add_argument("--workers", type=int, default=8, help="количество потоков-обработчиков")
+    parser.add_argument("--max-pending", type=int, default=64, help="очередь запросов до ответа 503")
+    parser.add_argument("--backend", choices=["chroma", "numpy", "numpy-float16", "numpy-int8"], default="chroma", help="хранилище векторов")
+    parser.add_argument("--similarity-graph", default=None, help="файл графа похожих лекарств (.npz, по умолчанию data/similarity_graph.npz)")
+    parser.add_argument("--field-index", default=None, help="файл многовекторного индекса полей (.npz, по умолчанию data/field_index.npz)")
+    parser.add_argument("--build-workers", type=int, default=1, help="процессов для кодирования лекарств при обновлении индекса")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    
+    if args.serve:
+        from src.http_server import serve
+        serve("data/drugs_database.json", args.host, args.port, args.workers, args.max_pending,
+              backend=args.backend, similarity_graph_path=args.similarity_graph,
+              field_index_path=args.field_index, build_workers=args.build_workers)
+        return
+    
     print("МЕДИЦИНСКАЯ ПОИСКОВАЯ СИСТЕМА RAG")
     print("=" * 50)
     print("! ВНИМАНИЕ: Эта система не заменяет консультацию врача!")
     print("   Всегда обращайтесь к специалисту для назначения лечения.")
     print("=" * 50)
     
-    search_system = AdvancedDrugSearch("data/drugs_database.json")
+    search_system = AdvancedDrugSearch("data/drugs_database.json", backend=args.backend,
+                                       similarity_graph_path=args.similarity_graph,
+                                       field_index_path=args.field_index,
+                                       build_workers=args.build_workers)
     search_system.interactive_search()
 
 if __name__ == "__main__":
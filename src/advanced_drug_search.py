@@ -1,19 +1,40 @@
 import sys
 import os
+import threading
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from src.vector_database import MedicalVectorDB
 from src.llm_integration import LocalLLMClient, RAGSystem
+from src.response_cache import ResponseCache
+from src.drug_comparison import format_comparison_table
+from src.search_suggestions import generate_suggestions
+from src.field_index import SYMPTOM_FIELDS
 import json
 
 class AdvancedDrugSearch:
-    def __init__(self, data_path: str):
-        self.db = MedicalVectorDB(data_path)
-        self.db.build_vector_database()
+    def __init__(self, data_path: str, response_cache_size: int = 1000,
+                 response_cache_ttl: float = 3600.0, backend="chroma",
+                 record_store_path: str = None, similarity_graph_path: str = None,
+                 field_index_path: str = None, build_workers: int = 1):
+        self.db = MedicalVectorDB(data_path, backend=backend, record_store_path=record_store_path,
+                                  similarity_graph_path=similarity_graph_path,
+                                  field_index_path=field_index_path)
+        # build_workers > 1 - измененные лекарства кодируются в пуле процессов
+        self.db.build_vector_database(incremental=True, workers=build_workers)
+        # Граф похожих лекарств (для подсказок) и индекс полей (поиск по
+        # симптомам) готовятся вместе с индексом
+        self.db.prepare_similarity_graph()
+        self.db.prepare_field_index()
         
         # Инициализация LLM и RAG системы
         self.llm_client = LocalLLMClient()
         self.rag_system = RAGSystem(self.db, self.llm_client)
+        # Блоки контекста первых лекарств готовятся вместе с индексом, остальные - по запросу
+        self.rag_system.context_cache.check_version(self.db.index_version)
+        self.rag_system.context_cache.warm(self.db.drug_store)
+        
+        # Кеш готовых ответов smart_search (включая AI-совет)
+        self.response_cache = ResponseCache(response_cache_size, response_cache_ttl)
         
         # Статистика использования
         self.search_stats = {
@@ -21,43 +42,139 @@ class AdvancedDrugSearch:
             "symptom_searches": 0,
             "drug_info_requests": 0
         }
+        # Счетчики обновляются из потоков-обработчиков HTTP-сервера
+        self._stats_lock = threading.Lock()
+    
+    def _count(self, stat: str):
+        """Учет запроса в статистике использования"""
+        with self._stats_lock:
+            self.search_stats[stat] += 1
+    
+    def warmup(self):
+        """Заблаговременная загрузка модели, коллекции и списка моделей LLM"""
+        self.db.warmup()
+        self.llm_client.warmup()
     
-    def smart_search(self, query: str, max_results: int = 5, use_llm: bool = True):
-        """Умный поиск с RAG"""
-        self.search_stats["total_searches"] += 1
+    def smart_search(self, query: str, max_results: int = 5, use_llm: bool = True,
+                     stream: bool = False, exclude_contraindications: list = None,
+                     fields: tuple = None, mode: str = "vector"):
+        """
+        Умный поиск с RAG
+        
+        Args:
+            query: поисковый запрос
+            max_results: количество результатов
+            use_llm: генерировать AI-совет
+            stream: вернуть AI-совет как генератор токенов (для постепенного вывода)
+            exclude_contraindications: состояния пользователя ("язва",
+                "беременность"); противопоказанные лекарства не попадают в результаты
+            fields: искать по векторам отдельных полей (SYMPTOM_FIELDS,
+                SAFETY_FIELDS) вместо общего вектора лекарства
+            mode: "vector" или "hybrid" - BM25 вместе с векторным поиском
+                (точные названия и редкие термины)
+        """
+        self._count("total_searches")
         
         print(f"🔍 Умный поиск: {query}")
         
-        # Векторный поиск
-        vector_results = self.db.search_drugs(query, max_results)
+        # Векторный (или гибридный) поиск
+        vector_results = self.db.search(query, max_results, mode,
+                                        exclude_contraindications=exclude_contraindications,
+                                        fields=fields)
+        
+        # Состояния, для которых фильтр ничего не исключил (нет в противопоказаниях)
+        unmatched = self.db.unmatched_conditions(exclude_contraindications)
+        if unmatched:
+            print(f"⚠️ Состояния не найдены в противопоказаниях: {', '.join(unmatched)}")
         
         if not vector_results:
-            return {
+            response = {
                 "results": [],
                 "ai_advice": "❌ По вашему запросу ничего не найдено.",
                 "suggestions": ["Попробуйте другие ключевые слова", "Опишите симптомы подробнее"]
             }
+            if exclude_contraindications:
+                response["unmatched_conditions"] = unmatched
+            return response
         
-        # Генерация AI-совета
-        ai_advice = ""
-        if use_llm and vector_results:
-            print("🤖 Генерация AI-совета...")
-            ai_advice = self.rag_system.generate_medical_advice(query, vector_results)
+        cache_key = self._response_cache_key(query, vector_results, use_llm, exclude_contraindications,
+                                             mode, fields)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            print("⚡ Ответ взят из кеша")
+            return cached
         
-        return {
+        response = {
             "results": vector_results,
-            "ai_advice": ai_advice,
-            "suggestions": self._generate_suggestions(vector_results)
+            "ai_advice": "",
+            "suggestions": generate_suggestions(self.db, vector_results,
+                                                self.db.excluded_ids(exclude_contraindications))
         }
+        if exclude_contraindications:
+            response["unmatched_conditions"] = unmatched
+        
+        if not use_llm:
+            self.response_cache.put(cache_key, response)
+            return response
+        
+        # Генерация AI-совета
+        print("🤖 Генерация AI-совета...")
+        if stream:
+            tokens = self.rag_system.generate_medical_advice(query, vector_results, stream=True)
+            response["ai_advice"] = self._stream_and_cache(tokens, cache_key, response)
+            return response
+        
+        response["ai_advice"] = self.rag_system.generate_medical_advice(query, vector_results)
+        
+        # Ошибки LLM не кешируем, чтобы не отдавать их после восстановления Ollama
+        if self.llm_client.last_error is None:
+            self.response_cache.put(cache_key, response)
+        
+        return response
+    
+    def _stream_and_cache(self, tokens, cache_key, response):
+        """Пробрасывает токены совета и кеширует полный ответ после завершения генерации"""
+        generated = []
+        for token in tokens:
+            generated.append(token)
+            yield token
+        
+        if self.llm_client.last_error is None:
+            self.response_cache.put(cache_key, {**response, "ai_advice": "".join(generated)})
+    
+    def _response_cache_key(self, query: str, results, use_llm: bool, conditions=None,
+                            mode: str = "vector", fields: tuple = None):
+        """
+        Ключ кеша ответа: запрос, состояния пользователя, режим поиска, найденные
+        лекарства и параметры генерации (оценки схожести зависят от режима и полей)
+        """
+        self.response_cache.check_version(self.db.index_version)
+        
+        drug_ids = tuple(result['полные_данные']['id'] for result in results)
+        conditions = ResponseCache.normalize_conditions(conditions)
+        search = (mode, tuple(fields or ()))
+        if not use_llm:
+            return (" ".join(query.lower().split()), conditions, search, drug_ids, None)
+        
+        return (
+            " ".join(query.lower().split()),
+            conditions,
+            search,
+            drug_ids,
+            RAGSystem.ADVICE_PROMPT_VERSION,
+            self.llm_client.resolve_model(self.rag_system.advice_model),
+            self.rag_system.advice_temperature
+        )
     
-    def search_by_symptoms(self, symptoms: list, max_results: int = 5):
+    def search_by_symptoms(self, symptoms: list, max_results: int = 5, stream: bool = False):
         """Поиск по списку симптомов с AI-анализом"""
-        self.search_stats["symptom_searches"] += 1
+        self._count("symptom_searches")
         
         query = " ".join(symptoms)
         print(f"🔍 Поиск лекарств для симптомов: {', '.join(symptoms)}")
         
-        return self.smart_search(query, max_results)
+        # Симптомы сравниваются с векторами показаний, а не со всем текстом лекарства
+        return self.smart_search(query, max_results, stream=stream, fields=SYMPTOM_FIELDS)
     
     def search_by_category(self, category: str, query: str = ""):
         """Поиск в определенной категории"""
@@ -66,21 +183,13 @@ class AdvancedDrugSearch:
     
     def get_drug_info(self, drug_name: str):
         """Получение полной информации о лекарстве"""
-        self.search_stats["drug_info_requests"] += 1
+        self._count("drug_info_requests")
         
-        results = self.db.search_drugs(drug_name, n_results=1)
-        if results:
-            drug_data = results[0]['полные_данные']
-            
+        # Название разрешается по индексу названий, модель - только запасной путь
+        drug_data = self.db.resolve_drug(drug_name)
+        if drug_data:
             # Генерация AI-резюме
-            prompt = f"""Дай краткое резюме о лекарстве {drug_name}:
-
-Описание: {drug_data['описание']}
-Показания: {', '.join(drug_data['показания'])}
-Противопоказания: {', '.join(drug_data['противопоказания'])}
-Побочные эффекты: {', '.join(drug_data['побочные_эффекты'])}
-
-Краткое резюме:"""
+            prompt = self.rag_system._build_drug_summary_prompt(drug_name, drug_data)
             
             ai_summary = self.llm_client.generate_response(prompt, temperature=0.1)
             
@@ -90,37 +199,42 @@ class AdvancedDrugSearch:
             }
         return None
     
-    def compare_drugs(self, drug1: str, drug2: str):
-        """Сравнение двух лекарств"""
+    def similar_drugs(self, drug_name: str, k: int = 5):
+        """Лекарства, похожие на указанное (по графу соседей, без семантического поиска)"""
+        drug_data = self.db.resolve_drug(drug_name)
+        if not drug_data:
+            return []
+        return self.db.similar_drugs(drug_data['id'], k)
+    
+    def compare_drugs(self, drug1: str, drug2: str, on_token=None):
+        """Сравнение двух лекарств (on_token - callback для потокового вывода)"""
         print(f"⚖️ Сравнение: {drug1} vs {drug2}")
-        return self.rag_system.compare_drugs(drug1, drug2)
+        return self.rag_system.compare_drugs(drug1, drug2, on_token=on_token)
+    
+    def compare_many(self, names: list, use_llm: bool = False, on_token=None):
+        """Сравнение нескольких лекарств (таблица; use_llm - добавить вывод LLM)"""
+        print(f"⚖️ Сравнение: {' vs '.join(names)}")
+        return self.rag_system.compare_many(names, use_llm=use_llm, on_token=on_token)
+    
+    def check_interactions(self, drug_list: list):
+        """Проверка взаимодействий между лекарствами списка (без LLM)"""
+        print(f"💊 Проверка взаимодействий: {', '.join(drug_list)}")
+        return self.db.check_interactions(drug_list)
     
     def get_categories(self):
         """Получение списка категорий"""
-        categories = set()
-        for drug in self.db.drugs_data:
-            categories.add(drug.get('категория', 'не указана'))
-        return list(categories)
+        return self.db.drug_store.categories()
     
     def get_stats(self):
         """Получение статистики использования"""
-        return self.search_stats
+        with self._stats_lock:
+            counters = dict(self.search_stats)
+        return {
+            **counters,
+            "query_cache": self.db.query_cache.stats(),
+            "response_cache": self.response_cache.stats()
+        }
     
-    def _generate_suggestions(self, results):
-        """Генерация предложений на основе результатов"""
-        suggestions = []
-        
-        categories = set()
-        for result in results:
-            categories.add(result['полные_данные']['категория'])
-        
-        if categories:
-            suggestions.append(f"Похожие категории: {', '.join(list(categories)[:3])}")
-        
-        suggestions.append("Для точного диагноза обратитесь к врачу")
-        
-        return suggestions
-
     def _display_results(self, results):
         """Отображение результатов поиска - ДОБАВЛЕННЫЙ МЕТОД"""
         if not results:
@@ -137,8 +251,19 @@ class AdvancedDrugSearch:
             for result in results:
                 self._display_single_result(result)
             
-            if search_data.get('ai_advice'):
-                print(f"\n🤖 AI-совет:\n{search_data['ai_advice']}")
+            ai_advice = search_data.get('ai_advice')
+            if isinstance(ai_advice, str):
+                if ai_advice:
+                    print(f"\n🤖 AI-совет:\n{ai_advice}")
+            elif ai_advice is not None:
+                # Потоковый совет: выводим токены по мере генерации
+                print("\n🤖 AI-совет:")
+                tokens = []
+                for token in ai_advice:
+                    print(token, end="", flush=True)
+                    tokens.append(token)
+                print()
+                search_data['ai_advice'] = "".join(tokens)
             
             if search_data.get('suggestions'):
                 print(f"\n💡 Подсказки: {', '.join(search_data['suggestions'])}")
@@ -208,13 +333,13 @@ class AdvancedDrugSearch:
             
             if choice == "1":
                 query = input("Введите запрос (симптомы, название и т.д.): ").strip()
-                results = self.smart_search(query)
+                results = self.smart_search(query, stream=True)
                 self._display_results(results)
                 
             elif choice == "2":
                 symptoms = input("Введите симптомы (через запятую): ").split(',')
                 symptoms = [s.strip() for s in symptoms if s.strip()]
-                results = self.search_by_symptoms(symptoms)
+                results = self.search_by_symptoms(symptoms, stream=True)
                 self._display_results(results)
                 
             elif choice == "3":
@@ -264,12 +389,29 @@ class AdvancedDrugSearch:
                     print("❌ Лекарство не найдено")
             
             elif choice == "5":
-                drug1 = input("Первое лекарство: ").strip()
-                drug2 = input("Второе лекарство: ").strip()
+                names_input = input("Лекарства через запятую: ").strip()
+                names = [name.strip() for name in names_input.split(',') if name.strip()]
                 
-                comparison = self.compare_drugs(drug1, drug2)
-                print(f"\n⚖️ Сравнение {drug1} и {drug2}:")
-                print(comparison)
+                if len(names) == 2:
+                    print(f"\n⚖️ Сравнение {names[0]} и {names[1]}:")
+                    streamed = []
+                    
+                    def print_token(token):
+                        streamed.append(token)
+                        print(token, end="", flush=True)
+                    
+                    comparison = self.compare_drugs(names[0], names[1], on_token=print_token)
+                    # Ответ без генерации (лекарство не найдено) не проходит через on_token
+                    if not streamed:
+                        print(comparison, end="")
+                    print()
+                elif len(names) > 2:
+                    comparison = self.compare_many(names)
+                    if comparison["не_найдены"]:
+                        print(f"❌ Не найдены: {', '.join(comparison['не_найдены'])}")
+                    print(f"\n{format_comparison_table(comparison['таблица'])}")
+                else:
+                    print("❌ Укажите хотя бы два лекарства")
             
             elif choice == "6":
                 stats = self.get_stats()
@@ -277,6 +419,12 @@ class AdvancedDrugSearch:
                 print(f"   Всего поисков: {stats['total_searches']}")
                 print(f"   Поисков по симптомам: {stats['symptom_searches']}")
                 print(f"   Запросов информации: {stats['drug_info_requests']}")
+                cache_stats = stats['query_cache']
+                print(f"   Кеш эмбеддингов: {cache_stats['hits']} попаданий, "
+                      f"{cache_stats['misses']} промахов ({cache_stats['size']}/{cache_stats['max_size']})")
+                cache_stats = stats['response_cache']
+                print(f"   Кеш ответов: {cache_stats['hits']} попаданий, "
+                      f"{cache_stats['misses']} промахов ({cache_stats['size']}/{cache_stats['max_size']})")
             
             elif choice == "7":
                 categories = self.get_categories()
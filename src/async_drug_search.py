@@ -0,0 +1,434 @@
+import asyncio
+import json
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, AsyncIterator, Tuple
+
+import httpx
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.vector_database import MedicalVectorDB
+from src.llm_integration import RAGSystem
+from src.response_cache import ResponseCache
+from src.search_suggestions import generate_suggestions
+from src.field_index import SYMPTOM_FIELDS
+
+
+class AsyncLocalLLMClient:
+    def __init__(self, base_url: str = "http://localhost:11434",
+                 max_connections: int = 20, timeout: float = 120.0,
+                 discovery_retry_interval: float = 30.0):
+        """
+        Асинхронный клиент для локальной LLM (Ollama) с пулом соединений
+        
+        Args:
+            base_url: URL локального сервера Ollama
+            max_connections: максимальное число одновременных HTTP-соединений
+            timeout: таймаут запроса в секундах
+            discovery_retry_interval: через сколько секунд повторить запрос
+                списка моделей, если Ollama была недоступна
+        """
+        self.base_url = base_url
+        self.discovery_retry_interval = discovery_retry_interval
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections)
+        )
+        self.available_models = None
+        self._models_checked_at = 0.0
+        self._models_lock = asyncio.Lock()
+    
+    def _models_known(self) -> bool:
+        """Список моделей получен; пустой список перезапрашивается раз в discovery_retry_interval"""
+        if self.available_models is None:
+            return False
+        retry_due = time.monotonic() - self._models_checked_at > self.discovery_retry_interval
+        return bool(self.available_models) or not retry_due
+    
+    async def get_available_models(self) -> List[str]:
+        """Список доступных моделей (запрашивается лениво и кешируется, как в LocalLLMClient)"""
+        if self._models_known():
+            return self.available_models
+        
+        async with self._models_lock:
+            if not self._models_known():
+                models = []
+                try:
+                    response = await self._client.get("/api/tags")
+                    if response.status_code == 200:
+                        models = [model['name'] for model in response.json().get('models', [])]
+                except Exception as e:
+                    print(f"Не удалось подключиться к Ollama: {e}")
+                self.available_models = models
+                self._models_checked_at = time.monotonic()
+        
+        return self.available_models
+    
+    async def resolve_model(self, model: str) -> str:
+        """Модель, которая фактически будет использована для генерации"""
+        available = await self.get_available_models()
+        if model in available or not available:
+            return model
+        return available[0]
+    
+    async def _build_payload(self, prompt: str, model: str, temperature: float,
+                             max_tokens: int, stream: bool) -> Dict:
+        """Формирование запроса к /api/generate"""
+        return {
+            "model": await self.resolve_model(model),
+            "prompt": prompt,
+            "stream": stream,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            }
+        }
+    
+    async def generate(self, prompt: str, model: str = "llama2",
+                       temperature: float = 0.3, max_tokens: int = 1000) -> Tuple[str, bool]:
+        """
+        Генерация ответа
+        
+        Returns:
+            (текст ответа или сообщение об ошибке, признак успешной генерации)
+        """
+        if not await self.get_available_models():
+            return "Локальная LLM не доступна. Убедитесь, что Ollama запущен.", False
+        
+        payload = await self._build_payload(prompt, model, temperature, max_tokens, stream=False)
+        
+        try:
+            response = await self._client.post("/api/generate", json=payload)
+            if response.status_code == 200:
+                return response.json().get('response', 'Пустой ответ от модели'), True
+            return f"Ошибка LLM: {response.status_code}", False
+        except Exception as e:
+            return f"Ошибка подключения к LLM: {str(e)}", False
+    
+    async def generate_response(self, prompt: str, model: str = "llama2",
+                                temperature: float = 0.3, max_tokens: int = 1000) -> str:
+        """Генерация ответа (только текст, как LocalLLMClient.generate_response)"""
+        text, _ = await self.generate(prompt, model, temperature, max_tokens)
+        return text
+    
+    async def generate_stream(self, prompt: str, model: str = "llama2",
+                              temperature: float = 0.3, max_tokens: int = 1000) -> AsyncIterator[str]:
+        """Потоковая генерация: токены по мере получения NDJSON-чанков от Ollama"""
+        if not await self.get_available_models():
+            yield "Локальная LLM не доступна. Убедитесь, что Ollama запущен."
+            return
+        
+        payload = await self._build_payload(prompt, model, temperature, max_tokens, stream=True)
+        
+        try:
+            async with self._client.stream("POST", "/api/generate", json=payload) as response:
+                if response.status_code != 200:
+                    yield f"Ошибка LLM: {response.status_code}"
+                    return
+                
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        yield f"Ошибка LLM: {chunk['error']}"
+                        return
+                    token = chunk.get('response', '')
+                    if token:
+                        yield token
+                    if chunk.get('done'):
+                        break
+        except Exception as e:
+            yield f"Ошибка подключения к LLM: {str(e)}"
+    
+    async def aclose(self):
+        """Закрытие пула соединений"""
+        await self._client.aclose()
+
+
+class AsyncAdvancedDrugSearch:
+    def __init__(self, data_path: str, llm_base_url: str = "http://localhost:11434",
+                 retrieval_workers: int = 4, max_concurrent_retrievals: int = 32,
+                 max_concurrent_generations: int = 4, max_llm_connections: int = 20,
+                 response_cache_size: int = 1000, response_cache_ttl: float = 3600.0,
+                 backend="chroma", record_store_path: str = None,
+                 similarity_graph_path: str = None, field_index_path: str = None,
+                 build_workers: int = 1):
+        """
+        Асинхронный пайплайн поиска и RAG для обслуживания многих сессий
+        в одном процессе
+        
+        Args:
+            data_path: путь к JSON файлу с лекарствами
+            llm_base_url: URL сервера Ollama
+            retrieval_workers: размер пула потоков для эмбеддингов и запросов к Chroma
+            max_concurrent_retrievals: лимит одновременных операций поиска
+            max_concurrent_generations: лимит одновременных генераций LLM
+            max_llm_connections: размер пула HTTP-соединений к Ollama
+            response_cache_size: размер кеша готовых ответов
+            response_cache_ttl: время жизни ответа в кеше, сек
+            backend: хранилище векторов - "chroma" или "numpy"
+            record_store_path: файл SQLite для записей лекарств (потоковая загрузка)
+            similarity_graph_path: файл графа похожих лекарств (.npz)
+            field_index_path: файл многовекторного индекса полей (.npz)
+            build_workers: процессов для кодирования измененных лекарств при
+                обновлении индекса (1 - в текущем процессе)
+        """
+        self.db = MedicalVectorDB(data_path, backend=backend, record_store_path=record_store_path,
+                                  similarity_graph_path=similarity_graph_path,
+                                  field_index_path=field_index_path)
+        self.db.build_vector_database(incremental=True, workers=build_workers)
+        # Граф похожих лекарств (для подсказок) и индекс полей (поиск по
+        # симптомам) готовятся вместе с индексом
+        self.db.prepare_similarity_graph()
+        self.db.prepare_field_index()
+        
+        self.llm_client = AsyncLocalLLMClient(llm_base_url, max_connections=max_llm_connections)
+        # RAGSystem используется только для построения промптов
+        self.rag_system = RAGSystem(self.db, self.llm_client)
+        self.rag_system.context_cache.check_version(self.db.index_version)
+        self.rag_system.context_cache.warm(self.db.drug_store)
+        self.response_cache = ResponseCache(response_cache_size, response_cache_ttl)
+        
+        # Модель и Chroma блокирующие - выполняем их в ограниченном пуле потоков
+        self._executor = ThreadPoolExecutor(max_workers=retrieval_workers,
+                                            thread_name_prefix="retrieval")
+        self._retrieval_limit = asyncio.Semaphore(max_concurrent_retrievals)
+        self._generation_limit = asyncio.Semaphore(max_concurrent_generations)
+        
+        self.search_stats = {
+            "total_searches": 0,
+            "symptom_searches": 0,
+            "drug_info_requests": 0
+        }
+    
+    async def _run_retrieval(self, func, *args, **kwargs):
+        """Выполнение блокирующего поиска в пуле потоков с лимитом параллелизма"""
+        async with self._retrieval_limit:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+    
+    async def _generate(self, prompt: str, **kwargs) -> Tuple[str, bool]:
+        """Генерация LLM с лимитом одновременных генераций"""
+        async with self._generation_limit:
+            return await self.llm_client.generate(prompt, **kwargs)
+    
+    async def warmup(self):
+        """Заблаговременная загрузка модели, коллекции и списка моделей LLM"""
+        await self._run_retrieval(self.db.warmup)
+        await self.llm_client.get_available_models()
+    
+    async def search_drugs(self, query: str, n_results: int = 5, category_filter: str = None,
+                           exclude_contraindications: list = None, fields: tuple = None,
+                           mode: str = "vector"):
+        """Векторный (или гибридный, mode="hybrid") поиск без блокировки event loop"""
+        return await self._run_retrieval(self.db.search, query, n_results, mode,
+                                         category_filter=category_filter,
+                                         exclude_contraindications=exclude_contraindications,
+                                         fields=fields)
+    
+    async def _response_cache_key(self, query: str, results, use_llm: bool, conditions=None,
+                                  mode: str = "vector", fields: tuple = None):
+        """
+        Ключ кеша ответа: запрос, состояния пользователя, режим поиска, найденные
+        лекарства и параметры генерации (оценки схожести зависят от режима и полей)
+        """
+        self.response_cache.check_version(self.db.index_version)
+        
+        drug_ids = tuple(result['полные_данные']['id'] for result in results)
+        conditions = ResponseCache.normalize_conditions(conditions)
+        search = (mode, tuple(fields or ()))
+        if not use_llm:
+            return (" ".join(query.lower().split()), conditions, search, drug_ids, None)
+        
+        return (
+            " ".join(query.lower().split()),
+            conditions,
+            search,
+            drug_ids,
+            RAGSystem.ADVICE_PROMPT_VERSION,
+            await self.llm_client.resolve_model(self.rag_system.advice_model),
+            self.rag_system.advice_temperature
+        )
+    
+    async def smart_search(self, query: str, max_results: int = 5, use_llm: bool = True,
+                           exclude_contraindications: list = None, fields: tuple = None,
+                           mode: str = "vector"):
+        """
+        Умный поиск с RAG (exclude_contraindications - состояния пользователя,
+        fields - поиск по векторам отдельных полей, mode="hybrid" - BM25
+        вместе с векторным поиском)
+        """
+        self.search_stats["total_searches"] += 1
+        
+        vector_results = await self.search_drugs(
+            query, max_results, exclude_contraindications=exclude_contraindications, fields=fields,
+            mode=mode
+        )
+        
+        # Состояния, для которых фильтр ничего не исключил (нет в противопоказаниях)
+        unmatched = self.db.unmatched_conditions(exclude_contraindications)
+        
+        if not vector_results:
+            response = {
+                "results": [],
+                "ai_advice": "❌ По вашему запросу ничего не найдено.",
+                "suggestions": ["Попробуйте другие ключевые слова", "Опишите симптомы подробнее"]
+            }
+            if exclude_contraindications:
+                response["unmatched_conditions"] = unmatched
+            return response
+        
+        cache_key = await self._response_cache_key(query, vector_results, use_llm,
+                                                   exclude_contraindications, mode, fields)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        response = {
+            "results": vector_results,
+            "ai_advice": "",
+            # Граф похожих лекарств при первом обращении строится - не в event loop
+            "suggestions": await self._run_retrieval(
+                generate_suggestions, self.db, vector_results,
+                self.db.excluded_ids(exclude_contraindications)
+            )
+        }
+        if exclude_contraindications:
+            response["unmatched_conditions"] = unmatched
+        
+        success = True
+        if use_llm:
+            prompt = self.rag_system._build_advice_prompt(query, vector_results)
+            response["ai_advice"], success = await self._generate(
+                prompt,
+                model=self.rag_system.advice_model,
+                temperature=self.rag_system.advice_temperature,
+                max_tokens=self.rag_system.advice_max_tokens(prompt)
+            )
+        
+        # Ошибки LLM не кешируем, чтобы не отдавать их после восстановления Ollama
+        if success:
+            self.response_cache.put(cache_key, response)
+        
+        return response
+    
+    async def stream_advice(self, query: str, max_results: int = 5) -> AsyncIterator[str]:
+        """Поиск и потоковая генерация AI-совета"""
+        vector_results = await self.search_drugs(query, max_results)
+        if not vector_results:
+            yield "К сожалению, в базе данных не найдено подходящих лекарств для ваших симптомов."
+            return
+        
+        prompt = self.rag_system._build_advice_prompt(query, vector_results)
+        tokens: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(self._stream_to_queue(prompt, tokens))
+        try:
+            while True:
+                token = await tokens.get()
+                if token is None:
+                    return
+                yield token
+        finally:
+            # Брошенный или закрытый потребитель останавливает генерацию
+            producer.cancel()
+    
+    async def _stream_to_queue(self, prompt: str, tokens: asyncio.Queue):
+        """
+        Потоковая генерация в отдельной задаче: слот _generation_limit занят
+        только на время генерации, а не пока потребитель читает токены
+        """
+        try:
+            async with self._generation_limit:
+                async for token in self.llm_client.generate_stream(
+                    prompt,
+                    model=self.rag_system.advice_model,
+                    temperature=self.rag_system.advice_temperature,
+                    max_tokens=self.rag_system.advice_max_tokens(prompt)
+                ):
+                    tokens.put_nowait(token)
+        finally:
+            tokens.put_nowait(None)
+    
+    async def search_by_symptoms(self, symptoms: list, max_results: int = 5):
+        """Поиск по списку симптомов с AI-анализом"""
+        self.search_stats["symptom_searches"] += 1
+        return await self.smart_search(" ".join(symptoms), max_results, fields=SYMPTOM_FIELDS)
+    
+    async def search_by_category(self, category: str, query: str = ""):
+        """Поиск в определенной категории"""
+        return await self.search_drugs(query, category_filter=category)
+    
+    async def get_drug_info(self, drug_name: str):
+        """Получение полной информации о лекарстве"""
+        self.search_stats["drug_info_requests"] += 1
+        
+        drug_data = await self._run_retrieval(self.db.resolve_drug, drug_name)
+        if not drug_data:
+            return None
+        
+        prompt = self.rag_system._build_drug_summary_prompt(drug_name, drug_data)
+        ai_summary, _ = await self._generate(prompt, temperature=0.1)
+        
+        return {
+            "data": drug_data,
+            "ai_summary": ai_summary
+        }
+    
+    async def similar_drugs(self, drug_name: str, k: int = 5):
+        """Лекарства, похожие на указанное (по графу соседей)"""
+        drug_data = await self._run_retrieval(self.db.resolve_drug, drug_name)
+        if not drug_data:
+            return []
+        return await self._run_retrieval(self.db.similar_drugs, drug_data['id'], k)
+    
+    async def compare_drugs(self, drug1: str, drug2: str) -> str:
+        """Сравнение двух лекарств"""
+        drug1_info, drug2_info = await self._run_retrieval(self.db.resolve_drugs, [drug1, drug2])
+        
+        if not drug1_info or not drug2_info:
+            return "Не удалось найти информацию об одном из лекарств"
+        
+        prompt = self.rag_system._build_comparison_prompt(drug1, drug1_info, drug2, drug2_info)
+        comparison, _ = await self._generate(prompt)
+        return comparison
+    
+    async def compare_many(self, names: list, use_llm: bool = False) -> dict:
+        """Сравнение нескольких лекарств: таблица без LLM, по запросу - вывод LLM"""
+        comparison = await self._run_retrieval(self.rag_system.build_comparison, names)
+        if use_llm and len(comparison["лекарства"]) >= 2:
+            prompt = self.rag_system._build_many_comparison_prompt(comparison["таблица"])
+            comparison["сравнение"], _ = await self._generate(prompt)
+        return comparison
+    
+    async def check_interactions(self, drug_list: list) -> dict:
+        """Проверка взаимодействий между лекарствами списка (без LLM)"""
+        return await self._run_retrieval(self.db.check_interactions, drug_list)
+    
+    def get_categories(self):
+        """Получение списка категорий"""
+        return self.db.drug_store.categories()
+    
+    def get_stats(self):
+        """Получение статистики использования"""
+        return {
+            **self.search_stats,
+            "query_cache": self.db.query_cache.stats(),
+            "response_cache": self.response_cache.stats()
+        }
+    
+    async def aclose(self):
+        """Освобождение пула соединений и потоков"""
+        await self.llm_client.aclose()
+        self._executor.shutdown(wait=False)
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
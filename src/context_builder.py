@@ -0,0 +1,222 @@
+import math
+import re
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_CYRILLIC_RE = re.compile(r"[а-яА-ЯёЁ]")
+
+# Окно контекста (num_ctx), с которым модели запущены в Ollama, в токенах;
+# модель ищется по самому длинному совпадающему префиксу имени ("llama2:13b" -> "llama2")
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "llama2": 4096,
+    "llama3": 8192,
+    "mistral": 8192,
+    "mixtral": 32768,
+    "gemma": 8192,
+    "qwen": 8192,
+    "phi": 2048,
+}
+DEFAULT_CONTEXT_WINDOW = 2048
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Оценка числа токенов для моделей Ollama (llama/mistral) без токенизатора:
+    кириллица в BPE-словарях этих моделей дробится сильнее латиницы,
+    ~2.5 символа на токен против ~4
+    """
+    if not text:
+        return 0
+    cyrillic = len(_CYRILLIC_RE.findall(text))
+    return math.ceil(cyrillic / 2.5 + (len(text) - cyrillic) / 4)
+
+
+def context_window(model: str, windows: Dict[str, int] = None) -> int:
+    """Окно контекста модели в токенах"""
+    windows = MODEL_CONTEXT_WINDOWS if windows is None else windows
+    name = (model or "").lower()
+    best_prefix = max((prefix for prefix in windows if name.startswith(prefix.lower())),
+                      key=len, default=None)
+    return windows[best_prefix] if best_prefix is not None else DEFAULT_CONTEXT_WINDOW
+
+
+def _context_block(drug) -> str:
+    """Блок лекарства для контекста медицинского совета (без номера)"""
+    return (
+        f"{drug['название']}:\n"
+        f"   - Описание: {drug['описание']}\n"
+        f"   - Показания: {', '.join(drug['показания'][:3])}\n"
+        f"   - Дозировка: {drug['дозировка']}\n"
+        f"   - Противопоказания: {', '.join(drug['противопоказания'][:3])}\n"
+        f"   - Побочные эффекты: {', '.join(drug['побочные_эффекты'][:3])}\n"
+    )
+
+
+def _brief_block(drug) -> str:
+    """Сокращенный блок для лекарств с низким рейтингом: без описания и побочных эффектов"""
+    return (
+        f"{drug['название']}:\n"
+        f"   - Показания: {', '.join(drug['показания'][:2])}\n"
+        f"   - Дозировка: {drug['дозировка']}\n"
+        f"   - Противопоказания: {', '.join(drug['противопоказания'][:3])}\n"
+    )
+
+
+def _comparison_block(drug) -> str:
+    """Блок лекарства для промпта сравнения"""
+    return (
+        f"- Описание: {drug['описание']}\n"
+        f"- Показания: {', '.join(drug['показания'])}\n"
+        f"- Противопоказания: {', '.join(drug['противопоказания'])}\n"
+        f"- Побочные эффекты: {', '.join(drug['побочные_эффекты'])}"
+    )
+
+
+def _summary_block(drug) -> str:
+    """Блок лекарства для промпта краткого резюме"""
+    return (
+        f"Описание: {drug['описание']}\n"
+        f"Показания: {', '.join(drug['показания'])}\n"
+        f"Противопоказания: {', '.join(drug['противопоказания'])}\n"
+        f"Побочные эффекты: {', '.join(drug['побочные_эффекты'])}"
+    )
+
+
+BLOCK_FORMATS: Dict[str, Callable] = {
+    "context": _context_block,
+    "brief": _brief_block,
+    "comparison": _comparison_block,
+    "summary": _summary_block,
+}
+
+# Уровни детализации блока контекста: от полного к сокращенному
+DETAIL_LEVELS: Tuple[str, ...] = ("context", "brief")
+
+
+class DrugContextCache:
+    # Сколько лекарств прогревается при запуске; остальные блоки строятся по запросу
+    WARM_LIMIT = 1000
+    
+    def __init__(self, max_size: int = 100000, token_counter: Callable[[str], int] = estimate_tokens):
+        """
+        Кеш готовых текстовых блоков лекарств для промптов и их длины в токенах
+        
+        Args:
+            max_size: максимальное количество блоков (LRU)
+            token_counter: функция подсчета токенов для используемой LLM
+        """
+        self.max_size = max_size
+        self.token_counter = token_counter
+        self._blocks: "OrderedDict[Tuple[str, int], Tuple[str, int]]" = OrderedDict()
+        self.version = None
+        self._lock = threading.Lock()
+    
+    def check_version(self, version: Any):
+        """Сброс блоков при изменении базы лекарств (ключи блоков - только id)"""
+        with self._lock:
+            if version != self.version:
+                self._blocks.clear()
+                self.version = version
+    
+    def block(self, drug, kind: str = "context") -> Tuple[str, int]:
+        """Текст блока лекарства и число токенов"""
+        key = (kind, drug['id'])
+        with self._lock:
+            cached = self._blocks.get(key)
+            if cached is not None:
+                self._blocks.move_to_end(key)
+                return cached
+        
+        text = BLOCK_FORMATS[kind](drug)
+        cached = (text, self.token_counter(text))
+        with self._lock:
+            self._blocks[key] = cached
+            if len(self._blocks) > self.max_size:
+                self._blocks.popitem(last=False)
+        return cached
+    
+    def warm(self, drugs: Iterable, kinds: Iterable[str] = ("context",), limit: Optional[int] = WARM_LIMIT):
+        """
+        Заполнение кеша при построении индекса или запуске сервера
+        
+        Args:
+            drugs: записи лекарств
+            kinds: виды блоков
+            limit: сколько первых лекарств прогреть (None - все, в пределах max_size);
+                хранилище на диске не читается целиком
+        """
+        kinds = list(kinds)
+        for drug in islice(drugs, limit):
+            if len(self._blocks) >= self.max_size:
+                break
+            for kind in kinds:
+                self.block(drug, kind)
+    
+    def build_context(self, drugs: List, max_tokens: Optional[int] = None,
+                      levels: Tuple[str, ...] = DETAIL_LEVELS) -> Tuple[str, int]:
+        """
+        Контекст из пронумерованных блоков лекарств в порядке рейтинга
+        
+        Без бюджета все лекарства получают полный блок. С бюджетом сначала
+        в него по рейтингу набираются самые сокращенные блоки (не поместившиеся
+        лекарства отбрасываются), затем оставшиеся токены идут на повышение
+        детализации, начиная с лекарств с наибольшим рейтингом - сокращаются
+        и отбрасываются в первую очередь лекарства с низким рейтингом.
+        
+        Args:
+            drugs: записи лекарств в порядке рейтинга
+            max_tokens: бюджет токенов (None - без ограничения)
+            levels: виды блоков от полного к сокращенному
+        
+        Returns:
+            (текст контекста, число токенов)
+        """
+        if max_tokens is None:
+            chosen = [(drug, 0) for drug in drugs]
+        else:
+            chosen = self._pack(drugs, max_tokens, levels)
+        
+        parts = []
+        total_tokens = 0
+        for number, (drug, level) in enumerate(chosen, 1):
+            tokens = self._numbered_tokens(drug, levels[level], number)
+            parts.append(f"\n{number}. " + self.block(drug, levels[level])[0])
+            total_tokens += tokens
+        return "".join(parts), total_tokens
+    
+    def _numbered_tokens(self, drug, kind: str, number: int) -> int:
+        return self.block(drug, kind)[1] + self.token_counter(f"\n{number}. ")
+    
+    def _pack(self, drugs: List, max_tokens: int, levels: Tuple[str, ...]) -> List[Tuple]:
+        """Выбор лекарств и уровня детализации каждого: [(лекарство, индекс в levels)]"""
+        lowest = len(levels) - 1
+        chosen = []
+        tokens = []
+        total_tokens = 0
+        for number, drug in enumerate(drugs, 1):
+            drug_tokens = self._numbered_tokens(drug, levels[lowest], number)
+            if total_tokens + drug_tokens > max_tokens:
+                break
+            chosen.append([drug, lowest])
+            tokens.append(drug_tokens)
+            total_tokens += drug_tokens
+        
+        for number, item in enumerate(chosen, 1):
+            while item[1] > 0:
+                upgraded = self._numbered_tokens(item[0], levels[item[1] - 1], number)
+                if total_tokens - tokens[number - 1] + upgraded > max_tokens:
+                    break
+                total_tokens += upgraded - tokens[number - 1]
+                tokens[number - 1] = upgraded
+                item[1] -= 1
+        
+        return [tuple(item) for item in chosen]
+    
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+    
+    def __len__(self) -> int:
+        return len(self._blocks)
@@ -0,0 +1,163 @@
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from src.lexical_index import tokenize
+
+# Противопоказание лекарства: (id лекарства, номер в списке противопоказаний)
+Entry = Tuple[int, int]
+
+# Состояния пользователя, которые не совпадают с формулировками противопоказаний
+# по основам слов: состояние -> термины противопоказаний. Остальные состояния
+# сопоставляются сами с собой.
+CONDITION_TERMS = {
+    "почки": ("почечная недостаточность", "анурия"),
+    "почек": ("почечная недостаточность", "анурия"),
+    "заболевания почек": ("почечная недостаточность", "анурия"),
+    "печень": ("печень", "печеночная недостаточность"),
+    "заболевания печени": ("печень", "печеночная недостаточность"),
+    "язва": ("язвенный",),
+    "язва желудка": ("язвенный",),
+    "кровотечение": ("кровотечение", "гемофилия"),
+    "грудное вскармливание": ("лактация",),
+    "кормление грудью": ("лактация",),
+    "дети": ("детский возраст",),
+    "ребенок": ("детский возраст",),
+    "диабет": ("диабет", "диабетический"),
+    "сахарный диабет": ("диабет", "диабетический"),
+    "гипертония": ("гипертензия",),
+    "высокое давление": ("гипертензия",),
+    "гипотония": ("гипотензия",),
+    "низкое давление": ("гипотензия",),
+    "аритмия": ("тахиаритмия", "блокада"),
+}
+
+# Общие слова формулировок: по отдельности не указывают на конкретное
+# противопоказание ("тяжелая", "заболевания", "недостаточность")
+GENERIC_WORDS = (
+    "болезнь", "заболевание", "заболевания", "поражение", "поражения", "нарушение",
+    "нарушения", "функция", "функции", "недостаточность", "тяжелый", "тяжелая", "тяжелые",
+    "острый", "острая", "хронический", "хроническая", "степень", "стадия", "синдром",
+    "возраст", "лет",
+)
+
+
+class ContraindicationIndex:
+    def __init__(self, drugs: Iterable[Dict] = (), condition_terms: Dict[str, Tuple[str, ...]] = None):
+        """
+        Инвертированный индекс: основа слова противопоказания -> противопоказания
+        лекарств, в которых она встречается
+        
+        Состояние пользователя переводится в термины противопоказаний по словарю
+        condition_terms ("почки" -> "почечная недостаточность", "анурия");
+        термин совпадает с противопоказанием, если все основы термина есть среди
+        основ противопоказания. Подробно описанное состояние ("язвенная болезнь
+        желудка") находит и противопоказания, целиком входящие в него, и
+        противопоказания с любым его значимым словом (не из GENERIC_WORDS,
+        не число).
+        Основы сравниваются целиком: "боль" (бол) не находит "язвенная
+        болезнь" (болезн).
+        
+        Args:
+            drugs: записи лекарств
+            condition_terms: словарь состояний (по умолчанию CONDITION_TERMS)
+        """
+        self._postings: Dict[str, Set[Entry]] = {}
+        self._stems_by_id: Dict[int, Set[str]] = {}
+        self._entry_stems: Dict[Entry, FrozenSet[str]] = {}
+        self._generic = {stem for word in GENERIC_WORDS for stem in tokenize(word)}
+        self._terms: Dict[Tuple[str, ...], List[Tuple[str, ...]]] = {
+            tuple(tokenize(condition)): [tuple(tokenize(term)) for term in terms]
+            for condition, terms in (CONDITION_TERMS if condition_terms is None else condition_terms).items()
+        }
+        
+        for drug in drugs:
+            self.add(drug)
+    
+    def add(self, drug: Dict):
+        """Индексация противопоказаний лекарства"""
+        drug_id = drug['id']
+        if drug_id in self._stems_by_id:
+            self.remove(drug_id)
+        
+        stems = set()
+        for number, contraindication in enumerate(drug.get('противопоказания') or ()):
+            entry_stems = frozenset(tokenize(contraindication))
+            for stem in entry_stems:
+                self._postings.setdefault(stem, set()).add((drug_id, number))
+            self._entry_stems[(drug_id, number)] = entry_stems
+            stems |= entry_stems
+        self._stems_by_id[drug_id] = stems
+    
+    def remove(self, drug_id: int):
+        """Удаление лекарства из индекса"""
+        for stem in self._stems_by_id.pop(drug_id, ()):
+            entries = self._postings.get(stem)
+            if entries is None:
+                continue
+            removed = {entry for entry in entries if entry[0] == drug_id}
+            entries.difference_update(removed)
+            for entry in removed:
+                self._entry_stems.pop(entry, None)
+            if not entries:
+                del self._postings[stem]
+    
+    def _term_entries(self, term: Tuple[str, ...]) -> Set[Entry]:
+        """Противопоказания, содержащие все основы термина"""
+        entries = None
+        for stem in term:
+            stem_entries = self._postings.get(stem, set())
+            entries = set(stem_entries) if entries is None else entries & stem_entries
+            if not entries:
+                return set()
+        return entries or set()
+    
+    def _entries_within(self, stems: Set[str]) -> Set[Entry]:
+        """Противопоказания, все основы которых входят в основы состояния"""
+        candidates = set()
+        for stem in stems:
+            candidates |= self._postings.get(stem, set())
+        return {entry for entry in candidates if self._entry_stems[entry] <= stems}
+    
+    def drugs_with(self, condition: str) -> Set[int]:
+        """id лекарств, противопоказанных при состоянии"""
+        stems = tuple(tokenize(condition))
+        if not stems:
+            return set()
+        
+        entries = set()
+        for term in self._terms.get(stems, [stems]):
+            entries |= self._term_entries(term)
+        
+        if len(stems) > 1:
+            # "язвенная болезнь желудка" -> "язвенная болезнь"
+            entries |= self._entries_within(set(stems))
+            # Значимые слова по отдельности (и через словарь): "язвенная" -> "язвенный колит"
+            for stem in stems:
+                if stem in self._generic or len(stem) < 3 or stem.isdigit():
+                    continue
+                for term in self._terms.get((stem,), [(stem,)]):
+                    entries |= self._term_entries(term)
+        return {drug_id for drug_id, _ in entries}
+    
+    def match(self, conditions: Iterable[str]) -> Tuple[Set[int], List[str]]:
+        """
+        Сопоставление состояний пользователя с противопоказаниями
+        
+        Returns:
+            (id противопоказанных лекарств, состояния без единого совпадения)
+        """
+        excluded = set()
+        unmatched = []
+        for condition in conditions or ():
+            drug_ids = self.drugs_with(condition)
+            if drug_ids:
+                excluded |= drug_ids
+            else:
+                unmatched.append(condition)
+        return excluded, unmatched
+    
+    def excluded_ids(self, conditions: Iterable[str]) -> Set[int]:
+        """id лекарств, противопоказанных хотя бы при одном из состояний"""
+        return self.match(conditions)[0]
+    
+    def __len__(self) -> int:
+        return len(self._stems_by_id)
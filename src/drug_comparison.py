@@ -0,0 +1,63 @@
+from typing import Dict, List, Sequence
+
+# Поле записи -> заголовок строки таблицы сравнения
+COMPARISON_FIELDS = (
+    ("показания", "Показания"),
+    ("противопоказания", "Противопоказания"),
+    ("побочные_эффекты", "Побочные эффекты"),
+    ("взаимодействие", "Взаимодействие"),
+)
+
+
+def _common_items(values: List[List[str]]) -> List[str]:
+    """Элементы первого списка, встречающиеся во всех списках (без учета регистра)"""
+    if len(values) < 2:
+        return []
+    others = [{item.lower() for item in value} for value in values[1:]]
+    return [item for item in values[0] if all(item.lower() in other for other in others)]
+
+
+def build_comparison_table(drugs: Sequence) -> Dict:
+    """
+    Таблица сравнения лекарств, построенная локально, без LLM
+    
+    Args:
+        drugs: записи лекарств в порядке сравнения
+    
+    Returns:
+        {"лекарства": [названия],
+         "поля": {поле: {"значения": [значение по каждому лекарству],
+                         "общие": [элементы, общие для всех лекарств]}}}
+    """
+    fields = {}
+    for field, _ in COMPARISON_FIELDS:
+        values = []
+        for drug in drugs:
+            value = drug.get(field)
+            values.append(list(value) if isinstance(value, (list, tuple)) else (value or ""))
+        
+        is_list = all(isinstance(value, list) for value in values)
+        fields[field] = {
+            "значения": values,
+            "общие": _common_items(values) if is_list else []
+        }
+    
+    return {
+        "лекарства": [drug['название'] for drug in drugs],
+        "поля": fields
+    }
+
+
+def format_comparison_table(table: Dict) -> str:
+    """Текстовое представление таблицы сравнения (для консоли и промпта LLM)"""
+    names = table["лекарства"]
+    lines = [f"Лекарства: {', '.join(names)}"]
+    for field, title in COMPARISON_FIELDS:
+        row = table["поля"][field]
+        lines.append(f"\n{title}:")
+        for name, value in zip(names, row["значения"]):
+            text = ', '.join(value) if isinstance(value, list) else value
+            lines.append(f"- {name}: {text or '-'}")
+        if row["общие"]:
+            lines.append(f"- Общие для всех: {', '.join(row['общие'])}")
+    return "\n".join(lines)
@@ -0,0 +1,105 @@
+import json
+import re
+from typing import Dict, Iterator
+
+RECORDS_KEY = "лекарства"
+_WHITESPACE = " \t\r\n,"
+# Символы, меняющие вложенность или границы строк при поиске конца записи
+_STRUCTURE = re.compile(r'[{}\[\]"\\]')
+
+
+def iter_drug_records(path: str, read_size: int = 1 << 20) -> Iterator[Dict]:
+    """
+    Потоковое чтение записей лекарств без загрузки всего файла
+    
+    Поддерживаются JSON Lines (.jsonl, одна запись схемы "лекарства" на строку)
+    и обычный drugs_database.json - массив "лекарства" разбирается
+    инкрементально, по одной записи. Ошибочная запись сразу вызывает
+    ValueError, не дожидаясь конца файла.
+    
+    Args:
+        path: файл с лекарствами
+        read_size: размер блока чтения (символов)
+    """
+    if path.endswith(".jsonl"):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        return
+    
+    yield from _iter_json_array(path, RECORDS_KEY, read_size)
+
+
+def _iter_json_array(path: str, key: str, read_size: int) -> Iterator[Dict]:
+    """Элементы массива по ключу key верхнего уровня JSON-документа"""
+    array_start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        while True:
+            match = array_start.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            block = f.read(read_size)
+            if not block:
+                raise ValueError(f"В файле {path} нет массива '{key}'")
+            # Хвост сохраняется на случай, если ключ разрезан границей блока
+            buffer = buffer[-256:] + block
+        
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position == len(buffer):
+                block = f.read(read_size)
+                if not block:
+                    raise ValueError(f"Неожиданный конец файла {path}")
+                buffer, position = block, 0
+                continue
+            
+            if buffer[position] == ']':
+                return
+            if buffer[position] != '{':
+                raise ValueError(f"Ожидалась запись-объект в массиве '{key}' файла {path}")
+            
+            end = _object_end(buffer, position)
+            if end < 0:
+                # Запись не поместилась в буфер - дочитываем следующий блок
+                block = f.read(read_size)
+                if not block:
+                    raise ValueError(f"Неожиданный конец файла {path}")
+                buffer, position = buffer[position:] + block, 0
+                continue
+            
+            # Запись целиком в буфере: ошибка разбора - это ошибка данных
+            yield json.loads(buffer[position:end])
+            position = end
+
+
+def _object_end(text: str, start: int) -> int:
+    """Позиция после объекта, начинающегося в text[start], или -1, если он не закончился"""
+    depth = 0
+    in_string = False
+    escaped = -1
+    for match in _STRUCTURE.finditer(text, start):
+        position = match.start()
+        if position == escaped:
+            continue
+        char = text[position]
+        if in_string:
+            if char == '\\':
+                escaped = position + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+            if depth == 0:
+                return position + 1
+    return -1
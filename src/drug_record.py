@@ -0,0 +1,175 @@
+import sys
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional, Tuple
+
+
+def _intern_all(values) -> Tuple[str, ...]:
+    return tuple(sys.intern(str(value)) for value in values or ())
+
+
+class DrugRecord(Mapping):
+    """
+    Компактная запись лекарства: слоты вместо словаря, списки - кортежи,
+    повторяющиеся строки (категории, противопоказания, показания, побочные
+    эффекты) интернированы и общие для всех записей.
+    
+    Поддерживает доступ по ключам схемы drugs_database.json (drug['название']),
+    поэтому используется везде вместо словаря; в dict преобразуется только
+    на границе вывода (to_dict, JSON).
+    """
+    
+    # Ключ схемы -> (слот, поле-список)
+    FIELDS = {
+        "id": ("id", False),
+        "название": ("name", False),
+        "описание": ("description", False),
+        "показания": ("indications", True),
+        "противопоказания": ("contraindications", True),
+        "дозировка": ("dosage", False),
+        "побочные_эффекты": ("side_effects", True),
+        "взаимодействие": ("interactions", False),
+        "категория": ("category", False),
+    }
+    KEYS = tuple(FIELDS)
+    
+    __slots__ = ("id", "name", "description", "indications", "contraindications",
+                 "dosage", "side_effects", "interactions", "category", "_extra", "_present")
+    
+    def __init__(self, id: int, name: str, description: str = "",
+                 indications: Tuple[str, ...] = (), contraindications: Tuple[str, ...] = (),
+                 dosage: str = "", side_effects: Tuple[str, ...] = (), interactions: str = "",
+                 category: Optional[str] = None, extra: Dict = None):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.indications = _intern_all(indications)
+        self.contraindications = _intern_all(contraindications)
+        self.dosage = dosage
+        self.side_effects = _intern_all(side_effects)
+        self.interactions = interactions
+        self.category = sys.intern(category) if category is not None else None
+        # Поля вне схемы хранятся отдельно (у обычных записей их нет)
+        self._extra = extra or None
+        self._present = None
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DrugRecord":
+        """Запись из словаря схемы drugs_database.json"""
+        if isinstance(data, DrugRecord):
+            return data
+        
+        values = {}
+        extra = {}
+        for key, value in data.items():
+            field = cls.FIELDS.get(key)
+            if field is None:
+                extra[key] = value
+            else:
+                values[field[0]] = value
+        
+        record = cls(extra=extra, **values)
+        if len(values) < len(cls.FIELDS):
+            # Поля, отсутствующие во входных данных, не видны через интерфейс Mapping
+            record._present = tuple(key for key in cls.FIELDS if key in data)
+        return record
+    
+    def _keys(self) -> Tuple[str, ...]:
+        return self._present if self._present is not None else self.KEYS
+    
+    def __getitem__(self, key: str):
+        field = self.FIELDS.get(key)
+        if field is not None and (self._present is None or key in self._present):
+            return getattr(self, field[0])
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        yield from self._keys()
+        if self._extra:
+            yield from self._extra
+    
+    def __len__(self) -> int:
+        return len(self._keys()) + (len(self._extra) if self._extra else 0)
+    
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        other_dict = other.to_dict() if isinstance(other, DrugRecord) else dict(other)
+        return self.to_dict() == other_dict
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return f"DrugRecord(id={self.id!r}, name={self.name!r})"
+    
+    def to_dict(self) -> Dict:
+        """Словарь схемы drugs_database.json (списки вместо кортежей)"""
+        data = {}
+        for key in self._keys():
+            slot, is_list = self.FIELDS[key]
+            value = getattr(self, slot)
+            data[key] = list(value) if is_list else value
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+
+class SearchResult(Mapping):
+    """
+    Результат поиска: ссылка на запись лекарства, рейтинг и схожесть.
+    Поля результата вычисляются при обращении, без копирования записи.
+    """
+    
+    KEYS = ("рейтинг", "схожесть", "лекарство", "описание", "показания",
+            "дозировка", "противопоказания", "полные_данные")
+    
+    __slots__ = ("rank", "similarity", "record")
+    
+    def __init__(self, rank: int, similarity: float, record: DrugRecord):
+        self.rank = rank
+        self.similarity = similarity
+        self.record = record
+    
+    def __getitem__(self, key: str):
+        if key == "рейтинг":
+            return self.rank
+        if key == "схожесть":
+            return f"{self.similarity:.3f}"
+        if key == "лекарство":
+            return self.record["название"]
+        if key == "противопоказания":
+            return self.record["противопоказания"][:3]
+        if key == "полные_данные":
+            return self.record
+        if key in ("описание", "показания", "дозировка"):
+            return self.record[key]
+        raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+    
+    def __len__(self) -> int:
+        return len(self.KEYS)
+    
+    def __repr__(self) -> str:
+        return f"SearchResult(rank={self.rank}, similarity={self.similarity:.3f}, drug={self.record['название']!r})"
+    
+    def to_dict(self) -> Dict:
+        """Словарь результата в прежнем формате (для JSON)"""
+        data = {key: self[key] for key in self.KEYS}
+        data["показания"] = list(data["показания"])
+        data["противопоказания"] = list(data["противопоказания"])
+        data["полные_данные"] = to_builtin(self.record)
+        return data
+
+
+def to_builtin(value):
+    """Рекурсивное преобразование записей и результатов в dict/list (граница вывода)"""
+    if isinstance(value, (DrugRecord, SearchResult)):
+        return value.to_dict()
+    if isinstance(value, Mapping):
+        return {key: to_builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_builtin(item) for item in value]
+    return value
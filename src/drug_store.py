@@ -0,0 +1,252 @@
+import json
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Iterator
+
+from src.drug_record import DrugRecord
+from src.name_resolver import NameResolver
+
+
+class DrugStore:
+    def __init__(self, drugs: List[Dict] = None, names: NameResolver = None):
+        """
+        Хранилище лекарств в памяти с индексами для поиска за O(1)
+        
+        Args:
+            drugs: список записей лекарств в формате drugs_database.json
+            names: индекс названий, который хранилище заполняет (общий с
+                MedicalVectorDB); по умолчанию собственный
+        """
+        self._by_id: Dict[int, Dict] = {}
+        self.names = NameResolver() if names is None else names
+        self._ids_by_category: Dict[str, List[int]] = {}
+        
+        for drug in drugs or []:
+            self.add(drug)
+    
+    def add(self, drug: Dict):
+        """Добавление (или замена) лекарства во всех индексах"""
+        drug_id = drug['id']
+        if drug_id in self._by_id:
+            self.remove(drug_id)
+        
+        self._by_id[drug_id] = drug
+        self.names.add(drug_id, drug['название'])
+        category = drug.get('категория', 'не указана')
+        self._ids_by_category.setdefault(category, []).append(drug_id)
+    
+    def remove(self, drug_id: int):
+        """Удаление лекарства из всех индексов"""
+        drug = self._by_id.pop(drug_id, None)
+        if drug is None:
+            return
+        
+        self.names.remove(drug_id)
+        category = drug.get('категория', 'не указана')
+        category_ids = self._ids_by_category.get(category, [])
+        if drug_id in category_ids:
+            category_ids.remove(drug_id)
+        if not category_ids:
+            self._ids_by_category.pop(category, None)
+    
+    def get(self, drug_id: int) -> Optional[Dict]:
+        """Запись лекарства по id"""
+        return self._by_id.get(drug_id)
+    
+    def id_for_name(self, name: str) -> Optional[int]:
+        """id лекарства по точному названию (без учета регистра и пунктуации)"""
+        return self.names.resolve_exact(name)
+    
+    def get_by_name(self, name: str) -> Optional[Dict]:
+        """Запись лекарства по точному названию (без учета регистра)"""
+        drug_id = self.id_for_name(name)
+        return self._by_id.get(drug_id) if drug_id is not None else None
+    
+    def ids_for_category(self, category: str) -> List[int]:
+        """Список id лекарств категории"""
+        return list(self._ids_by_category.get(category, []))
+    
+    def category_of(self, drug_id: int) -> Optional[str]:
+        """Категория лекарства по id"""
+        drug = self._by_id.get(drug_id)
+        return drug.get('категория', 'не указана') if drug else None
+    
+    def categories(self) -> List[str]:
+        """Список всех категорий"""
+        return list(self._ids_by_category)
+    
+    def __len__(self) -> int:
+        return len(self._by_id)
+    
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self._by_id.values())
+    
+    def __contains__(self, drug_id: int) -> bool:
+        return drug_id in self._by_id
+
+
+class SqliteDrugStore:
+    PAGE_SIZE = 1000
+    
+    def __init__(self, path: str, cache_size: int = 1024):
+        """
+        Компактное хранилище лекарств на диске (SQLite, записи в сжатом JSON)
+        с тем же интерфейсом, что и DrugStore: в памяти держится только
+        LRU-кеш недавно запрошенных записей
+        
+        Args:
+            path: файл базы SQLite
+            cache_size: количество записей в кеше
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[int, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS drugs (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                category TEXT NOT NULL,
+                payload BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS drugs_name ON drugs(name);
+            CREATE INDEX IF NOT EXISTS drugs_category ON drugs(category);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+    
+    @staticmethod
+    def _normalize_name(name: str) -> str:
+        """Нормализация названия для столбца name (без учета регистра)"""
+        return name.lower().strip()
+    
+    @staticmethod
+    def _encode(drug: Dict) -> bytes:
+        data = drug.to_dict() if isinstance(drug, DrugRecord) else drug
+        return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    
+    @staticmethod
+    def _decode(payload: bytes) -> DrugRecord:
+        return DrugRecord.from_dict(json.loads(zlib.decompress(payload).decode('utf-8')))
+    
+    def add_many(self, drugs: Iterable[Dict]):
+        """Добавление (или замена) пакета лекарств одной транзакцией"""
+        rows = [
+            (drug['id'], self._normalize_name(drug['название']),
+             drug.get('категория', 'не указана'), self._encode(drug))
+            for drug in drugs
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO drugs VALUES (?, ?, ?, ?)", rows)
+            for row in rows:
+                self._cache.pop(row[0], None)
+    
+    def add(self, drug: Dict):
+        """Добавление (или замена) лекарства"""
+        self.add_many([drug])
+    
+    def remove(self, drug_id: int):
+        """Удаление лекарства"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM drugs WHERE id = ?", (drug_id,))
+            self._cache.pop(drug_id, None)
+    
+    def clear(self):
+        """Удаление всех записей"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM drugs")
+                self._conn.execute("DELETE FROM meta")
+            self._cache.clear()
+    
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+    
+    def get(self, drug_id: int) -> Optional[Dict]:
+        """Запись лекарства по id"""
+        with self._lock:
+            drug = self._cache.get(drug_id)
+            if drug is not None:
+                self._cache.move_to_end(drug_id)
+                return drug
+            
+            row = self._conn.execute("SELECT payload FROM drugs WHERE id = ?", (drug_id,)).fetchone()
+            if row is None:
+                return None
+            
+            drug = self._decode(row[0])
+            self._cache[drug_id] = drug
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return drug
+    
+    def id_for_name(self, name: str) -> Optional[int]:
+        """id лекарства по точному названию (без учета регистра)"""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM drugs WHERE name = ? LIMIT 1",
+                                     (self._normalize_name(name),)).fetchone()
+        return row[0] if row else None
+    
+    def get_by_name(self, name: str) -> Optional[Dict]:
+        """Запись лекарства по точному названию (без учета регистра)"""
+        drug_id = self.id_for_name(name)
+        return self.get(drug_id) if drug_id is not None else None
+    
+    def ids_for_category(self, category: str) -> List[int]:
+        """Список id лекарств категории"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM drugs WHERE category = ? ORDER BY id",
+                                      (category,)).fetchall()
+        return [row[0] for row in rows]
+    
+    def category_of(self, drug_id: int) -> Optional[str]:
+        """Категория лекарства по id"""
+        with self._lock:
+            row = self._conn.execute("SELECT category FROM drugs WHERE id = ?", (drug_id,)).fetchone()
+        return row[0] if row else None
+    
+    def categories(self) -> List[str]:
+        """Список всех категорий"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT category FROM drugs GROUP BY category ORDER BY MIN(id)"
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM drugs").fetchone()[0]
+    
+    def __iter__(self) -> Iterator[Dict]:
+        """Постраничный обход записей в порядке id (без загрузки всех в память)"""
+        last_id = -(1 << 63)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, payload FROM drugs WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, self.PAGE_SIZE)
+                ).fetchall()
+            if not rows:
+                return
+            for _, payload in rows:
+                yield self._decode(payload)
+            last_id = rows[-1][0]
+    
+    def __contains__(self, drug_id: int) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM drugs WHERE id = ?", (drug_id,)).fetchone() is not None
@@ -0,0 +1,77 @@
+import hashlib
+from typing import Dict, List, Tuple
+
+from src.synonym_matcher import SynonymDictionary
+
+
+class DrugTextBuilder:
+    def __init__(self, model_name: str, synonyms: SynonymDictionary):
+        """
+        Построение семантического текста лекарства и записи для хранилища.
+        Объект сериализуется (pickle) и передается процессам параллельной сборки.
+        
+        Args:
+            model_name: модель эмбеддингов (входит в отпечаток текста)
+            synonyms: словарь синонимов показаний и категорий
+        """
+        self.model_name = model_name
+        self.synonyms = synonyms
+    
+    def semantic_text(self, drug: Dict) -> str:
+        """Текст лекарства, расширенный синонимами, для кодирования моделью"""
+        # Расширяем показания синонимами
+        enhanced_indications = []
+        for indication in drug['показания']:
+            synonyms = self.synonyms.indication_synonyms.expansions(indication.lower())
+            enhanced_indications.append(" ".join([indication] + synonyms))
+        
+        category_synonyms = self.synonyms.category_synonyms.get(drug.get('категория', ''), '')
+        # Собираем полный текст
+        text_parts = [
+            f"Лекарство: {drug['название']}",
+            f"Действие: {drug['описание']}",
+            f"Лечит: {', '.join(enhanced_indications)}",
+            f"Симптомы: {', '.join(drug['показания'])}",
+            f"Категория: {drug.get('категория', '')} {category_synonyms}",
+            f"Применение: {drug['дозировка']}",
+            f"Ограничения: {', '.join(drug['противопоказания'])}",
+            f"Побочные: {', '.join(drug['побочные_эффекты'])}"
+        ]
+        
+        return ". ".join(text_parts)
+    
+    def field_texts(self, drug: Dict) -> List[Tuple[str, str]]:
+        """
+        Короткие тексты полей для многовекторного индекса: описание целиком,
+        списки - по одному элементу (показания расширены синонимами)
+        
+        Returns:
+            [(поле, текст)] в порядке полей
+        """
+        items = []
+        if drug.get('описание'):
+            items.append(("описание", f"{drug['название']}: {drug['описание']}"))
+        for indication in drug['показания']:
+            synonyms = self.synonyms.indication_synonyms.expansions(indication.lower())
+            items.append(("показания", " ".join([indication] + synonyms)))
+        for contraindication in drug['противопоказания']:
+            items.append(("противопоказания", contraindication))
+        for side_effect in drug['побочные_эффекты']:
+            items.append(("побочные_эффекты", side_effect))
+        return items
+    
+    def fingerprint(self, drug_text: str) -> str:
+        """Отпечаток семантического текста лекарства вместе с именем модели"""
+        return hashlib.sha256(f"{self.model_name}\n{drug_text}".encode('utf-8')).hexdigest()
+    
+    def prepare_entry(self, drug: Dict) -> Tuple[int, str, Dict]:
+        """Документ, метаданные и идентификатор записи лекарства для коллекции"""
+        drug_text = self.semantic_text(drug)
+        metadata = {
+            "название": drug["название"],
+            "категория": drug.get("категория", "не указана"),
+            "показания": ", ".join(drug["показания"][:3]),
+            "id": str(drug["id"]),
+            "отпечаток": self.fingerprint(drug_text)
+        }
+        return drug["id"], drug_text, metadata
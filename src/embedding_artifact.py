@@ -0,0 +1,123 @@
+import json
+import os
+import struct
+from typing import Dict, List, Optional
+
+import numpy as np
+
+MAGIC = b"MEDEMB1\n"
+ALIGNMENT = 64
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+class EmbeddingArtifact:
+    def __init__(self, model_name: str, ids: List[int], fingerprints: List[str],
+                 embeddings: np.ndarray, path: str = None, categories: List[str] = None):
+        """
+        Матрица эмбеддингов лекарств, строки выровнены по списку id
+        
+        Args:
+            model_name: модель, которой построены эмбеддинги
+            ids: id лекарств в порядке строк матрицы
+            fingerprints: отпечатки текстов лекарств в порядке строк
+            embeddings: матрица (количество лекарств x размерность)
+            path: файл, из которого загружен артефакт
+            categories: категории лекарств в порядке строк (необязательно)
+        """
+        self.model_name = model_name
+        self.ids = list(ids)
+        self.fingerprints = list(fingerprints)
+        self.embeddings = embeddings
+        self.path = path
+        self.categories = list(categories) if categories is not None else None
+        self._row_by_id: Dict[int, int] = {drug_id: row for row, drug_id in enumerate(self.ids)}
+    
+    @property
+    def dtype(self) -> str:
+        return str(self.embeddings.dtype)
+    
+    @property
+    def dim(self) -> int:
+        return self.embeddings.shape[1] if self.embeddings.ndim == 2 else 0
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def row_for(self, drug_id: int) -> Optional[int]:
+        """Номер строки лекарства или None"""
+        return self._row_by_id.get(drug_id)
+    
+    def get(self, drug_id: int, fingerprint: str = None) -> Optional[np.ndarray]:
+        """
+        Эмбеддинг лекарства в float32
+        
+        Args:
+            drug_id: id лекарства
+            fingerprint: если задан, эмбеддинг возвращается только при совпадении
+                отпечатка (текст лекарства не менялся с момента экспорта)
+        """
+        row = self._row_by_id.get(drug_id)
+        if row is None or (fingerprint is not None and self.fingerprints[row] != fingerprint):
+            return None
+        return np.asarray(self.embeddings[row], dtype=np.float32)
+    
+    @staticmethod
+    def save(path: str, model_name: str, ids: List[int], fingerprints: List[str],
+             embeddings: np.ndarray, dtype: str = "float32", categories: List[str] = None):
+        """
+        Запись артефакта: заголовок с метаданными и выровненная матрица
+        
+        Формат файла: MAGIC, длина заголовка (uint32 little-endian), JSON-заголовок
+        (модель, тип, размерность, id и отпечатки строк), выравнивание до 64 байт,
+        затем матрица в порядке строк.
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Неподдерживаемый тип эмбеддингов: {dtype}")
+        
+        matrix = np.ascontiguousarray(embeddings, dtype=dtype)
+        if matrix.ndim != 2 or matrix.shape[0] != len(ids) or len(ids) != len(fingerprints):
+            raise ValueError("Матрица эмбеддингов не выровнена по списку id")
+        
+        header = json.dumps({
+            "model": model_name,
+            "dtype": dtype,
+            "count": matrix.shape[0],
+            "dim": matrix.shape[1],
+            "ids": [int(drug_id) for drug_id in ids],
+            "fingerprints": list(fingerprints),
+            "categories": list(categories) if categories is not None else None
+        }, ensure_ascii=False).encode('utf-8')
+        
+        prefix_size = len(MAGIC) + 4 + len(header)
+        padding = (-prefix_size) % ALIGNMENT
+        
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            f.write(b"\0" * padding)
+            f.write(matrix.tobytes())
+        # Атомарная подмена: старый файл может быть открыт через memory map
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingArtifact":
+        """Загрузка артефакта через read-only memory map (общий page cache для процессов)"""
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} не является артефактом эмбеддингов")
+            (header_size,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_size).decode('utf-8'))
+        
+        prefix_size = len(MAGIC) + 4 + header_size
+        offset = prefix_size + (-prefix_size) % ALIGNMENT
+        shape = (header["count"], header["dim"])
+        
+        if header["count"]:
+            embeddings = np.memmap(path, dtype=header["dtype"], mode='r', offset=offset, shape=shape)
+        else:
+            embeddings = np.zeros(shape, dtype=header["dtype"])
+        
+        return cls(header["model"], header["ids"], header["fingerprints"], embeddings, path,
+                   header.get("categories"))
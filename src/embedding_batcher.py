@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import Future
+from typing import List
+
+import numpy as np
+
+
+class EmbeddingBatcher:
+    def __init__(self, model, max_batch_size: int = 64, max_wait: float = 0.005):
+        """
+        Объединение одновременных запросов на кодирование в один вызов модели
+        
+        Потоки обработчиков вызывают encode() как у SentenceTransformer, а фоновый
+        поток собирает накопившиеся запросы (не дольше max_wait секунд или до
+        max_batch_size текстов) и кодирует их одним пакетом.
+        
+        Args:
+            model: модель с методом encode(texts, normalize_embeddings=...)
+            max_batch_size: максимальное количество текстов в пакете
+            max_wait: максимальное ожидание пополнения пакета в секундах
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+    
+    def encode(self, texts: List[str], normalize_embeddings: bool = True) -> np.ndarray:
+        """Кодирование текстов в составе общего пакета (блокирует до готовности)"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("EmbeddingBatcher остановлен")
+            self._pending.append((list(texts), normalize_embeddings, future))
+            self._condition.notify()
+        return future.result()
+    
+    def _take_batch(self):
+        """Ожидание запросов и формирование пакета"""
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+            if not self._pending:
+                return []
+            
+            # Даем другим потокам шанс добавить запросы в этот же пакет
+            self._condition.wait_for(
+                lambda: self._closed or sum(len(item[0]) for item in self._pending) >= self.max_batch_size,
+                timeout=self.max_wait
+            )
+            
+            batch, size = [], 0
+            while self._pending and (not batch or size + len(self._pending[0][0]) <= self.max_batch_size):
+                item = self._pending.pop(0)
+                batch.append(item)
+                size += len(item[0])
+            return batch
+    
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            
+            # Нормализованные и ненормализованные запросы кодируются раздельно
+            for normalize in (True, False):
+                group = [item for item in batch if item[1] == normalize]
+                if not group:
+                    continue
+                texts = [text for item in group for text in item[0]]
+                try:
+                    embeddings = self.model.encode(texts, normalize_embeddings=normalize)
+                except Exception as e:
+                    for _, _, future in group:
+                        future.set_exception(e)
+                    continue
+                
+                offset = 0
+                for item_texts, _, future in group:
+                    future.set_result(embeddings[offset:offset + len(item_texts)])
+                    offset += len(item_texts)
+    
+    def close(self):
+        """Остановка фонового потока после обработки накопленных запросов"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._worker.join()
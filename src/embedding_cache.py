@@ -0,0 +1,128 @@
+import atexit
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class QueryEmbeddingCache:
+    def __init__(self, model_name: str, max_size: int = 10000, cache_dir: str = None):
+        """
+        LRU-кеш эмбеддингов запросов с опциональным сохранением на диск
+        
+        Args:
+            model_name: название модели, входит в ключ кеша
+            max_size: максимальное количество эмбеддингов в памяти
+            cache_dir: каталог для сохранения кеша между перезапусками
+                (матрица float32, загружаемая через memory map, и индекс ключей)
+        """
+        self.model_name = model_name
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Кеш используется из пула потоков асинхронного пайплайна и HTTP-сервера
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+        if cache_dir:
+            self.load()
+            atexit.register(self.save)
+    
+    @staticmethod
+    def normalize_query(expanded_query: str) -> str:
+        """Нормализация расширенного запроса для ключа кеша"""
+        return " ".join(expanded_query.lower().split())
+    
+    def _key(self, expanded_query: str) -> str:
+        return f"{self.model_name}\x1f{self.normalize_query(expanded_query)}"
+    
+    def get(self, expanded_query: str) -> Optional[np.ndarray]:
+        """Эмбеддинг из кеша или None при промахе"""
+        key = self._key(expanded_query)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+    
+    def put(self, expanded_query: str, embedding: np.ndarray):
+        """Сохранение эмбеддинга с вытеснением самых старых записей"""
+        key = self._key(expanded_query)
+        with self._lock:
+            self._entries[key] = np.asarray(embedding, dtype=np.float32)
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Очистка кеша и счетчиков"""
+        with self._lock:
+            self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def stats(self) -> Dict:
+        """Статистика попаданий для подбора размера кеша"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+            "max_size": self.max_size
+        }
+    
+    def _paths(self):
+        return (os.path.join(self.cache_dir, "query_embeddings.npy"),
+                os.path.join(self.cache_dir, "query_embeddings.json"))
+    
+    def save(self):
+        """Сохранение кеша на диск (матрица эмбеддингов и индекс ключей)"""
+        if not self.cache_dir or not self._entries:
+            return
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        matrix_path, index_path = self._paths()
+        with self._lock:
+            keys: List[str] = list(self._entries)
+            matrix = np.stack([self._entries[key] for key in keys]).astype(np.float32)
+        
+        # Пишем во временные файлы и подменяем атомарно: старая матрица
+        # может быть открыта через memory map в этом или другом процессе
+        np.save(matrix_path + ".tmp.npy", matrix)
+        with open(index_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({"model": self.model_name, "keys": keys}, f, ensure_ascii=False)
+        os.replace(matrix_path + ".tmp.npy", matrix_path)
+        os.replace(index_path + ".tmp", index_path)
+    
+    def load(self):
+        """Загрузка сохраненного кеша через memory map"""
+        matrix_path, index_path = self._paths()
+        if not (os.path.exists(matrix_path) and os.path.exists(index_path)):
+            return
+        
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get("model") != self.model_name:
+                print("Кеш эмбеддингов построен другой моделью, пропускаем")
+                return
+            
+            matrix = np.load(matrix_path, mmap_mode='r')
+            keys = index["keys"][-self.max_size:]
+            offset = len(index["keys"]) - len(keys)
+            for row, key in enumerate(keys, offset):
+                self._entries[key] = matrix[row]
+            print(f"Загружено {len(keys)} эмбеддингов запросов из кеша")
+        except Exception as e:
+            print(f"Ошибка загрузки кеша эмбеддингов: {e}")
+            self._entries.clear()
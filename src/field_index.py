@@ -0,0 +1,163 @@
+import hashlib
+import os
+from typing import Callable, Iterable, List, Sequence, Set
+
+import numpy as np
+
+from src.parallel_build import chunked
+from src.retrieval_backends import Hits
+
+# Поля лекарства с отдельными векторами (номер поля хранится в int8)
+INDEXED_FIELDS = ("описание", "показания", "противопоказания", "побочные_эффекты")
+
+# Поля для типов запросов: симптомы ищутся по показаниям, вопросы
+# безопасности - по противопоказаниям
+SYMPTOM_FIELDS = ("показания",)
+SAFETY_FIELDS = ("противопоказания",)
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class FieldVectorIndex:
+    def __init__(self, drug_ids: np.ndarray, fields: np.ndarray, keys: np.ndarray,
+                 matrix: np.ndarray, categories: Sequence[str], index_version: str = None):
+        """
+        Многовекторный индекс: отдельный вектор для описания и для каждого
+        показания, противопоказания и побочного эффекта; оценка лекарства -
+        максимальная схожесть среди его векторов выбранных полей (max-sim)
+        
+        Строки одного лекарства идут подряд.
+        
+        Args:
+            drug_ids: id лекарства каждой строки
+            fields: номер поля (в INDEXED_FIELDS) каждой строки
+            keys: хеши текстов строк (для повторного использования векторов)
+            matrix: нормализованные эмбеддинги строк, float32
+            categories: категории лекарств в порядке первого появления в drug_ids
+            index_version: версия индекса лекарств, по которой построен индекс
+        """
+        self.drug_ids = np.asarray(drug_ids, dtype=np.int64)
+        self.fields = np.asarray(fields, dtype=np.int8)
+        self.keys = np.asarray(keys)
+        self.matrix = np.asarray(matrix, dtype=np.float32)
+        self.index_version = index_version
+        
+        starts = np.flatnonzero(np.r_[True, self.drug_ids[1:] != self.drug_ids[:-1]]) \
+            if len(self.drug_ids) else np.zeros(0, dtype=np.int64)
+        # Номер лекарства каждой строки и категории лекарств по номеру
+        self._unique_ids = self.drug_ids[starts]
+        self._row_drugs = np.cumsum(np.r_[False, self.drug_ids[1:] != self.drug_ids[:-1]]) \
+            if len(self.drug_ids) else np.zeros(0, dtype=np.int64)
+        self._categories = np.asarray(list(categories), dtype=object)
+    
+    def __len__(self) -> int:
+        return len(self.drug_ids)
+    
+    @classmethod
+    def build(cls, drugs: Iterable, field_texts: Callable, encode: Callable,
+              batch_size: int = 256, index_version: str = None,
+              previous: "FieldVectorIndex" = None) -> "FieldVectorIndex":
+        """
+        Построение индекса пакетами лекарств
+        
+        Args:
+            drugs: записи лекарств
+            field_texts: функция лекарство -> [(поле, текст)]
+                (DrugTextBuilder.field_texts)
+            encode: функция кодирования списка текстов в нормализованные векторы
+            batch_size: лекарств в одном пакете кодирования
+            index_version: версия индекса лекарств
+            previous: прежний индекс; векторы текстов, не изменившихся
+                с его построения, берутся из него без кодирования
+        """
+        reuse = {}
+        if previous is not None and len(previous):
+            reuse = {key: row for row, key in enumerate(previous.keys)}
+        
+        drug_ids, fields, keys, categories, blocks = [], [], [], [], []
+        for chunk in chunked(drugs, batch_size):
+            texts = []
+            for drug in chunk:
+                items = field_texts(drug)
+                if not items:
+                    continue
+                categories.append(drug.get('категория') or "")
+                for field, text in items:
+                    drug_ids.append(drug['id'])
+                    fields.append(INDEXED_FIELDS.index(field))
+                    keys.append(_text_key(text))
+                    texts.append(text)
+            
+            if not texts:
+                continue
+            chunk_keys = keys[len(keys) - len(texts):]
+            block = [previous.matrix[reuse[key]] if key in reuse else None for key in chunk_keys]
+            to_encode = [i for i, vector in enumerate(block) if vector is None]
+            if to_encode:
+                encoded = np.asarray(encode([texts[i] for i in to_encode]), dtype=np.float32)
+                for i, vector in zip(to_encode, encoded):
+                    block[i] = vector
+            blocks.append(np.asarray(block, dtype=np.float32))
+        
+        matrix = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+        return cls(drug_ids, fields, np.asarray(keys, dtype="U40"), matrix, categories, index_version)
+    
+    def query(self, query_embeddings: np.ndarray, n_results: int, fields: Sequence[str],
+              category: str = None, exclude_ids: Set[int] = None) -> List[Hits]:
+        """
+        Лекарства с наибольшей схожестью запроса с любым из их векторов
+        в полях fields; фильтры категории и исключения применяются к строкам
+        до ранжирования
+        """
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        if query_embeddings.ndim == 1:
+            query_embeddings = query_embeddings[None, :]
+        
+        unknown = [field for field in fields if field not in INDEXED_FIELDS]
+        if unknown:
+            raise ValueError(f"Поля без векторов: {', '.join(unknown)}")
+        
+        mask = np.isin(self.fields, [INDEXED_FIELDS.index(field) for field in fields])
+        if category:
+            mask &= self._categories[self._row_drugs] == category
+        if exclude_ids:
+            mask &= ~np.isin(self.drug_ids, list(exclude_ids))
+        
+        rows = np.flatnonzero(mask)
+        if not len(rows) or n_results <= 0:
+            return [[] for _ in range(len(query_embeddings))]
+        
+        scores = query_embeddings @ self.matrix[rows].T
+        # Строки лекарства идут подряд - максимум по группам без цикла
+        row_drugs = self._row_drugs[rows]
+        starts = np.flatnonzero(np.r_[True, row_drugs[1:] != row_drugs[:-1]])
+        drug_scores = np.maximum.reduceat(scores, starts, axis=1)
+        drug_ids = self._unique_ids[row_drugs[starts]]
+        
+        k = min(n_results, drug_scores.shape[1])
+        top = np.argpartition(-drug_scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(drug_scores, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        
+        return [
+            [(int(drug_ids[column]), float(2.0 - 2.0 * drug_scores[query_index, column]))
+             for column in columns]
+            for query_index, columns in enumerate(top)
+        ]
+    
+    def save(self, path: str):
+        """Сохранение в .npz вместе с версией индекса лекарств"""
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, drug_ids=self.drug_ids, fields=self.fields, keys=self.keys,
+                 matrix=self.matrix, categories=np.asarray(self._categories, dtype="U"),
+                 index_version=np.array(self.index_version or ""))
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "FieldVectorIndex":
+        with np.load(path) as data:
+            return cls(data["drug_ids"], data["fields"], data["keys"], data["matrix"],
+                       [str(category) for category in data["categories"]],
+                       str(data["index_version"]) or None)
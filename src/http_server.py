@@ -0,0 +1,297 @@
+import json
+import socket
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.advanced_drug_search import AdvancedDrugSearch
+from src.drug_record import to_builtin
+from src.field_index import INDEXED_FIELDS
+from src.vector_database import SEARCH_MODES
+
+
+def _json_default(value):
+    """Записи лекарств и результаты поиска преобразуются в dict только при выводе"""
+    converted = to_builtin(value)
+    if converted is value:
+        raise TypeError(f"Объект {type(value).__name__} не сериализуется в JSON")
+    return converted
+
+
+class BadRequest(Exception):
+    """Некорректные параметры запроса (ответ 400)"""
+
+
+def _require(payload: dict, field: str, field_type=str):
+    """Обязательное поле JSON-запроса заданного типа"""
+    value = payload.get(field)
+    if not isinstance(value, field_type) or (field_type is str and not value.strip()):
+        raise BadRequest(f"Поле '{field}' обязательно")
+    return value
+
+
+def _positive_int(payload: dict, field: str, default: int) -> int:
+    """Необязательное целое поле JSON-запроса (не меньше 1)"""
+    value = payload.get(field, default)
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        number = int(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"Поле '{field}' должно быть целым числом")
+    if number < 1:
+        raise BadRequest(f"Поле '{field}' должно быть не меньше 1")
+    return number
+
+
+class MedicalRequestHandler(BaseHTTPRequestHandler):
+    server_version = "MedicalRAG/1.0"
+    
+    def _send_json(self, status: int, data):
+        body = json.dumps(data, ensure_ascii=False, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _read_json(self) -> dict:
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            raise BadRequest("Некорректный заголовок Content-Length")
+        if length < 0:
+            raise BadRequest("Некорректный заголовок Content-Length")
+        if not length:
+            return {}
+        try:
+            payload = json.loads(self.rfile.read(length).decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            raise BadRequest("Тело запроса должно быть JSON")
+        if not isinstance(payload, dict):
+            raise BadRequest("Тело запроса должно быть JSON-объектом")
+        return payload
+    
+    def _dispatch(self, routes: dict, payload: dict = None):
+        handler = routes.get(self.path.split('?', 1)[0])
+        if handler is None:
+            self._send_json(404, {"error": f"Неизвестный путь: {self.path}"})
+            return
+        
+        try:
+            self._send_json(200, handler(self.server.search_system, payload))
+        except BadRequest as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"Внутренняя ошибка: {e}"})
+    
+    def do_GET(self):
+        self._dispatch(GET_ROUTES)
+    
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+        except BadRequest as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._dispatch(POST_ROUTES, payload)
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def _smart_search(system: AdvancedDrugSearch, payload: dict):
+    conditions = payload.get("exclude_contraindications") or []
+    fields = payload.get("fields") or []
+    if not isinstance(conditions, list) or not isinstance(fields, list):
+        raise BadRequest("Поля 'exclude_contraindications' и 'fields' должны быть списками")
+    unknown = [field for field in fields if field not in INDEXED_FIELDS]
+    if unknown:
+        raise BadRequest(f"Поиск по полям {', '.join(map(str, unknown))} не поддерживается")
+    mode = payload.get("mode", "vector")
+    if mode not in SEARCH_MODES:
+        raise BadRequest(f"Поле 'mode' должно быть одним из: {', '.join(SEARCH_MODES)}")
+    if mode == "hybrid" and fields:
+        raise BadRequest("Гибридный поиск не сочетается с полем 'fields'")
+    return system.smart_search(
+        _require(payload, "query"),
+        max_results=_positive_int(payload, "max_results", 5),
+        use_llm=bool(payload.get("use_llm", True)),
+        exclude_contraindications=[str(condition) for condition in conditions],
+        fields=tuple(fields) or None,
+        mode=mode
+    )
+
+
+def _symptom_search(system: AdvancedDrugSearch, payload: dict):
+    symptoms = _require(payload, "symptoms", list)
+    return system.search_by_symptoms([str(s) for s in symptoms],
+                                     max_results=_positive_int(payload, "max_results", 5))
+
+
+def _category_search(system: AdvancedDrugSearch, payload: dict):
+    return {"results": system.search_by_category(_require(payload, "category"),
+                                                 str(payload.get("query", "")))}
+
+
+def _drug_info(system: AdvancedDrugSearch, payload: dict):
+    return {"info": system.get_drug_info(_require(payload, "name"))}
+
+
+def _compare(system: AdvancedDrugSearch, payload: dict):
+    drug1, drug2 = _require(payload, "drug1"), _require(payload, "drug2")
+    return {"comparison": system.compare_drugs(drug1, drug2)}
+
+
+def _compare_many(system: AdvancedDrugSearch, payload: dict):
+    names = _require(payload, "names", list)
+    return system.compare_many([str(name) for name in names],
+                               use_llm=bool(payload.get("use_llm", False)))
+
+
+def _similar(system: AdvancedDrugSearch, payload: dict):
+    return {"results": system.similar_drugs(_require(payload, "name"),
+                                            k=_positive_int(payload, "k", 5))}
+
+
+def _interactions(system: AdvancedDrugSearch, payload: dict):
+    drugs = _require(payload, "drugs", list)
+    return system.check_interactions([str(drug) for drug in drugs])
+
+
+GET_ROUTES = {
+    "/health": lambda system, _: {"status": "ok"},
+    "/categories": lambda system, _: {"categories": system.get_categories()},
+    "/stats": lambda system, _: system.get_stats(),
+}
+
+POST_ROUTES = {
+    "/search": _smart_search,
+    "/symptoms": _symptom_search,
+    "/category": _category_search,
+    "/drug": _drug_info,
+    "/compare": _compare,
+    "/compare_many": _compare_many,
+    "/similar": _similar,
+    "/interactions": _interactions,
+}
+
+
+class MedicalHTTPServer(HTTPServer):
+    # Сколько секунд дочитывать запрос клиента, получившего 503
+    DRAIN_TIMEOUT = 1.0
+    
+    def __init__(self, address, search_system: AdvancedDrugSearch,
+                 max_workers: int = 8, max_pending: int = 64, verbose: bool = False):
+        """
+        HTTP-сервер с пулом обработчиков и общей системой поиска
+        
+        Args:
+            address: (host, port)
+            search_system: общая для всех обработчиков система поиска
+                (модель и индекс загружаются один раз)
+            max_workers: количество потоков-обработчиков
+            max_pending: сколько запросов может ждать свободного обработчика;
+                сверх этого сервер сразу отвечает 503
+            verbose: логировать каждый запрос
+        """
+        super().__init__(address, MedicalRequestHandler)
+        self.search_system = search_system
+        self.verbose = verbose
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+    
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self._reject_overloaded(request)
+            return
+        self._pool.submit(self._process_in_pool, request, client_address)
+    
+    def _process_in_pool(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+    
+    def _reject_overloaded(self, request):
+        body = json.dumps({"error": "Сервер перегружен, повторите запрос позже"},
+                          ensure_ascii=False).encode('utf-8')
+        try:
+            request.sendall(
+                b"HTTP/1.0 503 Service Unavailable\r\n"
+                b"Content-Type: application/json; charset=utf-8\r\n"
+                b"Retry-After: 1\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode('ascii')
+                + body
+            )
+            request.shutdown(socket.SHUT_WR)
+        except OSError:
+            self.shutdown_request(request)
+            return
+        # Дочитывание запроса - не в потоке приема соединений: под нагрузкой
+        # он не должен ждать медленных клиентов
+        threading.Thread(target=self._drain_and_close, args=(request,), daemon=True).start()
+    
+    def _drain_and_close(self, request):
+        """
+        Дочитывание отправленного клиентом запроса (не дольше DRAIN_TIMEOUT),
+        иначе закрытие сокета с непрочитанными данными оборвет соединение
+        до получения ответа
+        """
+        deadline = time.monotonic() + self.DRAIN_TIMEOUT
+        try:
+            request.settimeout(0.05)
+            while time.monotonic() < deadline and request.recv(65536):
+                pass
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+    
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+
+def create_server(search_system: AdvancedDrugSearch, host: str = "127.0.0.1", port: int = 8000,
+                  max_workers: int = 8, max_pending: int = 64, batch_size: int = 64,
+                  batch_wait: float = 0.005, verbose: bool = False) -> MedicalHTTPServer:
+    """Создание сервера с пакетным кодированием запросов из разных обработчиков"""
+    search_system.db.enable_query_batching(batch_size, batch_wait)
+    return MedicalHTTPServer((host, port), search_system, max_workers, max_pending, verbose)
+
+
+def serve(data_path: str = "data/drugs_database.json", host: str = "127.0.0.1", port: int = 8000,
+          max_workers: int = 8, max_pending: int = 64, verbose: bool = False,
+          backend: str = "chroma", similarity_graph_path: str = None,
+          field_index_path: str = None, build_workers: int = 1):
+    """Запуск HTTP-сервиса медицинского поиска"""
+    search_system = AdvancedDrugSearch(data_path, backend=backend,
+                                       similarity_graph_path=similarity_graph_path,
+                                       field_index_path=field_index_path,
+                                       build_workers=build_workers)
+    search_system.warmup()
+    server = create_server(search_system, host, port, max_workers, max_pending, verbose=verbose)
+    
+    print(f"🌐 HTTP-сервер запущен на http://{host}:{port}")
+    print("   GET  /health, /categories, /stats")
+    print("   POST /search, /symptoms, /category, /drug, /compare, /compare_many, /similar, /interactions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Остановка сервера...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve("../data/drugs_database.json")
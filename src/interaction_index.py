@@ -0,0 +1,165 @@
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from src.lexical_index import tokenize
+
+# Основы слов, после которых упоминание категории описывает эффект,
+# а не группу препаратов ("седативный эффект" - не "седативные препараты")
+_EFFECT_STEMS = {"эффект", "действ"}
+
+_EMPTY_TARGETS: Tuple[FrozenSet[int], FrozenSet[str]] = (frozenset(), frozenset())
+
+
+class InteractionIndex:
+    def __init__(self, drugs: Iterable[Dict] = ()):
+        """
+        Индекс взаимодействий: текст поля "взаимодействие" каждого лекарства
+        разбирается в id упомянутых лекарств и категории ("антикоагулянтов" ->
+        категория "антикоагулянт"), проверка списка лекарств - поиск по множествам
+        без обращения к LLM
+        
+        Args:
+            drugs: записи лекарств
+        """
+        self._lock = threading.Lock()
+        self._tokens: Dict[int, List[str]] = {}
+        self._texts: Dict[int, str] = {}
+        self._targets: Dict[int, Tuple[FrozenSet[int], FrozenSet[str]]] = {}
+        self._drug_terms: Dict[Tuple[str, ...], Set[int]] = {}
+        self._category_terms: Dict[Tuple[str, ...], str] = {}
+        self._names: Dict[int, Tuple[str, ...]] = {}
+        self._max_term_length = 1
+        self._dirty = False
+        
+        for drug in drugs:
+            self.add(drug)
+        self.rebuild()
+    
+    def _term(self, text: str) -> Tuple[str, ...]:
+        """Термин из основ слов; учитывается длина самого длинного термина"""
+        term = tuple(tokenize(text))
+        if term:
+            self._max_term_length = max(self._max_term_length, len(term))
+        return term
+    
+    def add(self, drug: Dict):
+        """
+        Добавление лекарства: его название и категория становятся терминами,
+        текст взаимодействия разбирается при rebuild (или первом запросе),
+        чтобы учесть лекарства, добавленные позже
+        """
+        drug_id = drug['id']
+        if drug_id in self._names:
+            self.remove(drug_id)
+        
+        name_term = self._term(drug['название'])
+        if name_term:
+            self._drug_terms.setdefault(name_term, set()).add(drug_id)
+        self._names[drug_id] = name_term
+        
+        category = drug.get('категория')
+        if category:
+            category_term = self._term(category)
+            if category_term:
+                self._category_terms[category_term] = category
+        
+        text = drug.get('взаимодействие') or ""
+        self._texts[drug_id] = text
+        self._tokens[drug_id] = tokenize(text)
+        self._dirty = True
+    
+    def remove(self, drug_id: int):
+        """Удаление лекарства из индекса"""
+        name_term = self._names.pop(drug_id, None)
+        if name_term is None:
+            return
+        
+        ids = self._drug_terms.get(name_term)
+        if ids is not None:
+            ids.discard(drug_id)
+            if not ids:
+                del self._drug_terms[name_term]
+        self._texts.pop(drug_id, None)
+        self._tokens.pop(drug_id, None)
+        self._targets.pop(drug_id, None)
+        self._dirty = True
+    
+    def _parse(self, drug_id: int, tokens: List[str]) -> Tuple[FrozenSet[int], FrozenSet[str]]:
+        """Лекарства и категории, упомянутые в тексте взаимодействия (самые длинные совпадения)"""
+        drug_ids = set()
+        categories = set()
+        position = 0
+        while position < len(tokens):
+            matched = 0
+            for length in range(min(self._max_term_length, len(tokens) - position), 0, -1):
+                term = tuple(tokens[position:position + length])
+                if term in self._drug_terms:
+                    drug_ids.update(self._drug_terms[term])
+                elif term in self._category_terms:
+                    following = tokens[position + length] if position + length < len(tokens) else ""
+                    if following not in _EFFECT_STEMS:
+                        categories.add(self._category_terms[term])
+                else:
+                    continue
+                matched = length
+                break
+            position += matched or 1
+        
+        drug_ids.discard(drug_id)
+        return frozenset(drug_ids), frozenset(categories)
+    
+    def rebuild(self):
+        """Разбор текстов взаимодействий всех лекарств"""
+        with self._lock:
+            self._targets = {
+                drug_id: self._parse(drug_id, tokens)
+                for drug_id, tokens in self._tokens.items()
+            }
+            self._dirty = False
+    
+    def targets_of(self, drug_id: int) -> Tuple[FrozenSet[int], FrozenSet[str]]:
+        """(id лекарств, категории), с которыми взаимодействует лекарство"""
+        if self._dirty:
+            self.rebuild()
+        return self._targets.get(drug_id, _EMPTY_TARGETS)
+    
+    def check(self, drugs: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Проверка списка лекарств: каждая пара сверяется с разобранными
+        взаимодействиями (O(k^2) поисков по множествам)
+        
+        Returns:
+            (взаимодействия между лекарствами списка,
+             предупреждения лекарств, взаимодействие которых не относится
+             к лекарствам базы - алкоголь, продукты, "другие препараты")
+        """
+        interactions = []
+        warnings = []
+        for drug in drugs:
+            target_ids, target_categories = self.targets_of(drug['id'])
+            text = self._texts.get(drug['id']) or drug.get('взаимодействие') or ""
+            
+            for other in drugs:
+                if other['id'] == drug['id']:
+                    continue
+                if other['id'] in target_ids:
+                    reason = "лекарство"
+                elif other.get('категория') in target_categories:
+                    reason = "категория"
+                else:
+                    continue
+                interactions.append({
+                    "лекарство": drug['название'],
+                    "с": other['название'],
+                    "основание": reason,
+                    "категория": other.get('категория') if reason == "категория" else None,
+                    "описание": text
+                })
+            
+            if text and not target_ids and not target_categories:
+                warnings.append({"лекарство": drug['название'], "описание": text})
+        
+        return interactions, warnings
+    
+    def __len__(self) -> int:
+        return len(self._texts)
@@ -0,0 +1,187 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"[a-zа-я0-9]+")
+
+_STOPWORDS = {
+    "и", "в", "во", "не", "на", "с", "со", "при", "для", "от", "до", "по", "а", "но",
+    "или", "к", "у", "о", "об", "из", "за", "же", "ли", "бы", "то", "как", "что", "мг",
+}
+
+# Упрощенный стеммер Snowball для русского языка
+_RV_RE = re.compile(r"^(.*?[аеиоуыэюя])(.*)$")
+_PERFECTIVE_GERUND_RE = re.compile(r"((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$")
+_REFLEXIVE_RE = re.compile(r"(с[яь])$")
+_ADJECTIVE_RE = re.compile(r"(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$")
+_PARTICIPLE_RE = re.compile(r"((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$")
+_VERB_RE = re.compile(
+    r"((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)"
+    r"|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$"
+)
+_NOUN_RE = re.compile(
+    r"(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$"
+)
+_I_RE = re.compile(r"и$")
+_DERIVATIONAL_RE = re.compile(r".*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$")
+_OST_RE = re.compile(r"ость?$")
+_SUPERLATIVE_RE = re.compile(r"(ейше|ейш)$")
+_NN_RE = re.compile(r"нн$")
+_SOFT_SIGN_RE = re.compile(r"ь$")
+
+
+def normalize_text(text: str) -> str:
+    """Нижний регистр и замена ё на е"""
+    return text.lower().replace('ё', 'е')
+
+
+def stem_russian(word: str) -> str:
+    """Отсечение окончаний русского слова (упрощенный алгоритм Snowball)"""
+    match = _RV_RE.match(word)
+    if not match:
+        return word
+    
+    prefix, rv = match.groups()
+    stripped = _PERFECTIVE_GERUND_RE.sub('', rv, 1)
+    if stripped == rv:
+        rv = _REFLEXIVE_RE.sub('', rv, 1)
+        stripped = _ADJECTIVE_RE.sub('', rv, 1)
+        if stripped != rv:
+            rv = _PARTICIPLE_RE.sub('', stripped, 1)
+        else:
+            stripped = _VERB_RE.sub('', rv, 1)
+            rv = _NOUN_RE.sub('', rv, 1) if stripped == rv else stripped
+    else:
+        rv = stripped
+    
+    rv = _I_RE.sub('', rv, 1)
+    if _DERIVATIONAL_RE.match(rv):
+        rv = _OST_RE.sub('', rv, 1)
+    
+    stripped = _NN_RE.sub('н', rv, 1)
+    if stripped == rv:
+        rv = _SUPERLATIVE_RE.sub('', rv, 1)
+        rv = _NN_RE.sub('н', rv, 1)
+        rv = _SOFT_SIGN_RE.sub('', rv, 1)
+    else:
+        rv = stripped
+    
+    return prefix + rv
+
+
+def tokenize(text: str) -> List[str]:
+    """Токенизация с учетом русского языка: нормализация, стоп-слова, стемминг"""
+    return [
+        stem_russian(token)
+        for token in _TOKEN_RE.findall(normalize_text(text))
+        if token not in _STOPWORDS
+    ]
+
+
+class LexicalIndex:
+    # Веса полей лекарства в BM25F: совпадение в названии важнее побочных эффектов
+    FIELD_WEIGHTS = {
+        "название": 3.0,
+        "показания": 2.0,
+        "описание": 1.0,
+        "противопоказания": 1.0,
+        "побочные_эффекты": 0.5,
+    }
+    
+    def __init__(self, drugs: Iterable[Dict] = (), k1: float = 1.5, b: float = 0.75):
+        """
+        Инвертированный индекс BM25 по полям лекарств
+        
+        Args:
+            drugs: записи лекарств
+            k1: насыщение частоты термина
+            b: нормализация по длине документа
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._doc_lengths: Dict[int, float] = {}
+        # Термины документа: удаление обходит только его списки вхождений
+        self._tokens_by_id: Dict[int, Tuple[str, ...]] = {}
+        self._total_length = 0.0
+        
+        for drug in drugs:
+            self.add(drug)
+    
+    @staticmethod
+    def _field_text(value) -> str:
+        return " ".join(value) if isinstance(value, (list, tuple)) else str(value or "")
+    
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        """Нормализованное название для точного сравнения"""
+        return " ".join(_TOKEN_RE.findall(normalize_text(name)))
+    
+    def add(self, drug: Dict):
+        """Индексация лекарства"""
+        drug_id = drug['id']
+        if drug_id in self._doc_lengths:
+            self.remove(drug_id)
+        
+        weighted_tf: Counter = Counter()
+        for field, weight in self.FIELD_WEIGHTS.items():
+            for token in tokenize(self._field_text(drug.get(field))):
+                weighted_tf[token] += weight
+        
+        for token, frequency in weighted_tf.items():
+            self._postings.setdefault(token, {})[drug_id] = frequency
+        
+        self._doc_lengths[drug_id] = sum(weighted_tf.values())
+        self._tokens_by_id[drug_id] = tuple(weighted_tf)
+        self._total_length += self._doc_lengths[drug_id]
+    
+    def remove(self, drug_id: int):
+        """Удаление лекарства из индекса"""
+        length = self._doc_lengths.pop(drug_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        
+        for token in self._tokens_by_id.pop(drug_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(drug_id, None)
+            if not postings:
+                del self._postings[token]
+    
+    def search(self, query: str, n_results: int = 5,
+               allowed_ids: Optional[set] = None) -> List[Tuple[int, float]]:
+        """
+        Поиск BM25
+        
+        Args:
+            query: текст запроса
+            n_results: количество результатов
+            allowed_ids: ограничение множества лекарств (фильтр категории)
+        
+        Returns:
+            список (id лекарства, оценка) по убыванию оценки
+        """
+        total_docs = len(self._doc_lengths)
+        if not total_docs:
+            return []
+        
+        avg_length = self._total_length / total_docs
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            
+            idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for drug_id, frequency in postings.items():
+                if allowed_ids is not None and drug_id not in allowed_ids:
+                    continue
+                length_norm = 1 - self.b + self.b * self._doc_lengths[drug_id] / avg_length
+                scores[drug_id] = scores.get(drug_id, 0.0) + idf * frequency * (self.k1 + 1) / (
+                    frequency + self.k1 * length_norm
+                )
+        
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
@@ -1,23 +1,63 @@
 import requests
 import json
-from typing import List, Dict
+from typing import List, Dict, Iterator, Callable
 import time
+import threading
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.context_builder import DrugContextCache, context_window, estimate_tokens
+from src.drug_comparison import build_comparison_table, format_comparison_table
 
 class LocalLLMClient:
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    def __init__(self, base_url: str = "http://localhost:11434", discovery_timeout: float = 5.0,
+                 discovery_retry_interval: float = 30.0):
         """
         Инициализация клиента для локальной LLM (Ollama)
         
         Args:
             base_url: URL локального сервера Ollama
+            discovery_timeout: таймаут запроса списка моделей, сек
+            discovery_retry_interval: через сколько секунд повторить запрос
+                списка моделей, если Ollama была недоступна
         """
         self.base_url = base_url
-        self.available_models = self._get_available_models()
+        self.discovery_timeout = discovery_timeout
+        self.discovery_retry_interval = discovery_retry_interval
+        # Список моделей запрашивается при первой генерации, а не в конструкторе
+        self._available_models = None
+        self._models_checked_at = 0.0
+        # Ошибка последней генерации хранится отдельно для каждого потока,
+        # чтобы параллельные обработчики сервера не видели чужие ошибки
+        self._local = threading.local()
+    
+    @property
+    def last_error(self):
+        """Ошибка последней генерации в текущем потоке (None при успехе)"""
+        return getattr(self._local, 'last_error', None)
+    
+    @last_error.setter
+    def last_error(self, value):
+        self._local.last_error = value
         
+    @property
+    def available_models(self) -> List[str]:
+        """Список доступных моделей (запрашивается лениво и кешируется)"""
+        retry_due = time.monotonic() - self._models_checked_at > self.discovery_retry_interval
+        if self._available_models is None or (not self._available_models and retry_due):
+            self._available_models = self._get_available_models()
+            self._models_checked_at = time.monotonic()
+        return self._available_models
+    
+    def warmup(self):
+        """Заблаговременный запрос списка моделей (для серверов)"""
+        return self.available_models
+    
     def _get_available_models(self) -> List[str]:
         """Получение списка доступных моделей"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags")
+            response = requests.get(f"{self.base_url}/api/tags", timeout=self.discovery_timeout)
             if response.status_code == 200:
                 models = response.json().get('models', [])
                 return [model['name'] for model in models]
@@ -26,8 +66,32 @@ class LocalLLMClient:
             print(f"Не удалось подключиться к Ollama: {e}")
             return []
     
+    def resolve_model(self, model: str) -> str:
+        """Модель, которая фактически будет использована для генерации"""
+        if model in self.available_models or not self.available_models:
+            return model
+        return self.available_models[0]
+    
+    def _build_payload(self, prompt: str, model: str, temperature: float,
+                       max_tokens: int, stream: bool) -> Dict:
+        """Формирование запроса к /api/generate"""
+        if model not in self.available_models:
+            model = self.resolve_model(model)
+            print(f"Используется модель: {model}")
+        
+        return {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            }
+        }
+    
     def generate_response(self, prompt: str, model: str = "llama2", 
-                         temperature: float = 0.3, max_tokens: int = 1000) -> str:
+                         temperature: float = 0.3, max_tokens: int = 1000,
+                         on_token: Callable[[str], None] = None) -> str:
         """
         Генерация ответа с помощью локальной LLM
         
@@ -36,23 +100,21 @@ class LocalLLMClient:
             model: название модели
             temperature: креативность (0-1)
             max_tokens: максимальное количество токенов
+            on_token: callback, вызываемый для каждого токена по мере генерации;
+                если задан, ответ запрашивается в потоковом режиме
         """
+        if on_token is not None:
+            tokens = []
+            for token in self.generate_stream(prompt, model, temperature, max_tokens):
+                on_token(token)
+                tokens.append(token)
+            return "".join(tokens)
+        
         if not self.available_models:
+            self.last_error = "unavailable"
             return "Локальная LLM не доступна. Убедитесь, что Ollama запущен."
         
-        if model not in self.available_models:
-            model = self.available_models[0]
-            print(f"Используется модель: {model}")
-        
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": temperature,
-                "num_predict": max_tokens
-            }
-        }
+        payload = self._build_payload(prompt, model, temperature, max_tokens, stream=False)
         
         try:
             response = requests.post(
@@ -62,40 +124,164 @@ class LocalLLMClient:
             )
             
             if response.status_code == 200:
+                self.last_error = None
                 return response.json().get('response', 'Пустой ответ от модели')
             else:
+                self.last_error = f"HTTP {response.status_code}"
                 return f"Ошибка LLM: {response.status_code}"
                 
         except Exception as e:
+            self.last_error = str(e)
             return f"Ошибка подключения к LLM: {str(e)}"
+    
+    def generate_stream(self, prompt: str, model: str = "llama2",
+                        temperature: float = 0.3, max_tokens: int = 1000) -> Iterator[str]:
+        """
+        Потоковая генерация: токены возвращаются по мере получения
+        NDJSON-чанков от Ollama
+        
+        Args:
+            prompt: промпт для модели
+            model: название модели
+            temperature: креативность (0-1)
+            max_tokens: максимальное количество токенов
+        """
+        if not self.available_models:
+            self.last_error = "unavailable"
+            yield "Локальная LLM не доступна. Убедитесь, что Ollama запущен."
+            return
+        
+        payload = self._build_payload(prompt, model, temperature, max_tokens, stream=True)
+        
+        try:
+            with requests.post(
+                f"{self.base_url}/api/generate",
+                json=payload,
+                stream=True,
+                timeout=120
+            ) as response:
+                if response.status_code != 200:
+                    self.last_error = f"HTTP {response.status_code}"
+                    yield f"Ошибка LLM: {response.status_code}"
+                    return
+                
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        self.last_error = chunk['error']
+                        yield f"Ошибка LLM: {chunk['error']}"
+                        return
+                    token = chunk.get('response', '')
+                    if token:
+                        yield token
+                    if chunk.get('done'):
+                        break
+            
+            self.last_error = None
+                
+        except Exception as e:
+            self.last_error = str(e)
+            yield f"Ошибка подключения к LLM: {str(e)}"
 
 class RAGSystem:
-    def __init__(self, vector_db, llm_client):
+    # Версия шаблона промпта медицинского совета: увеличивать при любом
+    # изменении текста промпта, чтобы сбросить кешированные ответы
+    ADVICE_PROMPT_VERSION = 2
+    # Минимальная длина ответа, если промпт занял почти все окно модели
+    # (но не больше места, оставшегося в окне)
+    MIN_ANSWER_TOKENS = 256
+    
+    def __init__(self, vector_db, llm_client, advice_model: str = "llama2",
+                 advice_temperature: float = 0.2, context_token_budget: int = None,
+                 context_windows: Dict[str, int] = None, max_answer_tokens: int = 1000,
+                 max_context_drugs: int = 5):
         """
         Полноценная RAG система
         
         Args:
             vector_db: векторная база данных
             llm_client: клиент LLM
+            advice_model: модель для генерации медицинских советов
+            advice_temperature: температура генерации советов
+            context_token_budget: максимум токенов контекста лекарств в промпте
+                (None - ограничен только окном модели)
+            context_windows: окна контекста моделей в токенах, по префиксу имени
+                (по умолчанию MODEL_CONTEXT_WINDOWS)
+            max_answer_tokens: максимальная длина ответа совета в токенах
+            max_context_drugs: сколько лекарств из результатов поиска
+                рассматривается для контекста
         """
         self.vector_db = vector_db
         self.llm = llm_client
+        self.advice_model = advice_model
+        self.advice_temperature = advice_temperature
+        self.context_token_budget = context_token_budget
+        self.context_windows = context_windows
+        self.max_answer_tokens = max_answer_tokens
+        self.max_context_drugs = max_context_drugs
+        # Готовые блоки лекарств для промптов и их длина в токенах
+        self.context_cache = DrugContextCache()
         
-    def generate_medical_advice(self, query: str, search_results: List[Dict]) -> str:
+    def generate_medical_advice(self, query: str, search_results: List[Dict],
+                                stream: bool = False, on_token: Callable[[str], None] = None):
         """
         Генерация медицинского совета на основе результатов поиска
         
         Args:
             query: исходный запрос пользователя
             search_results: результаты векторного поиска
+            stream: вернуть генератор токенов вместо готовой строки
+            on_token: callback для каждого токена по мере генерации
         """
         if not search_results:
-            return "К сожалению, в базе данных не найдено подходящих лекарств для ваших симптомов."
+            message = "К сожалению, в базе данных не найдено подходящих лекарств для ваших симптомов."
+            return iter([message]) if stream else message
+        
+        prompt = self._build_advice_prompt(query, search_results)
+        max_tokens = self.advice_max_tokens(prompt)
+        
+        if stream:
+            return self.llm.generate_stream(prompt, model=self.advice_model,
+                                            temperature=self.advice_temperature,
+                                            max_tokens=max_tokens)
         
-        # Формируем контекст для LLM
-        context = self._build_context(search_results)
+        return self.llm.generate_response(prompt, model=self.advice_model,
+                                          temperature=self.advice_temperature,
+                                          max_tokens=max_tokens,
+                                          on_token=on_token)
+    
+    @property
+    def advice_context_window(self) -> int:
+        """Окно контекста модели советов в токенах"""
+        return context_window(self.advice_model, self.context_windows)
+    
+    def _answer_reserve(self) -> int:
+        """Токены окна, оставляемые под ответ: не больше четверти окна"""
+        return min(self.max_answer_tokens, self.advice_context_window // 4)
+    
+    def advice_max_tokens(self, prompt: str) -> int:
+        """Длина ответа (num_predict) по месту, оставшемуся в окне после промпта"""
+        remaining = self.advice_context_window - estimate_tokens(prompt)
+        answer_tokens = max(self.MIN_ANSWER_TOKENS, min(self.max_answer_tokens, remaining))
+        # Промпт с ответом должен помещаться в окно; хотя бы один токен ответа
+        return max(1, min(answer_tokens, remaining))
+    
+    def _build_advice_prompt(self, query: str, search_results: List[Dict]) -> str:
+        """Промпт медицинского совета с контекстом, упакованным в окно модели"""
+        # Бюджет контекста: окно модели минус шаблон промпта и запас под ответ
+        budget = (self.advice_context_window - self._answer_reserve()
+                  - estimate_tokens(self._advice_prompt_text(query, "")))
+        if self.context_token_budget is not None:
+            budget = min(budget, self.context_token_budget)
         
-        prompt = f"""Ты - медицинский ассистент. Пользователь спрашивает: "{query}"
+        context = self._build_context(search_results, max(budget, 0))
+        return self._advice_prompt_text(query, context)
+    
+    def _advice_prompt_text(self, query: str, context: str) -> str:
+        """Текст промпта медицинского совета"""
+        return f"""Ты - медицинский ассистент. Пользователь спрашивает: "{query}"
 
 На основе следующей информации о лекарствах дай обоснованный ответ:
 
@@ -110,33 +296,110 @@ class RAGSystem:
 6. Ответ дай на русском языке
 
 Ответ:"""
+    
+    def compare_drugs(self, drug1: str, drug2: str, stream: bool = False,
+                      on_token: Callable[[str], None] = None):
+        """
+        Сравнение двух лекарств
+        
+        Args:
+            drug1: название первого лекарства
+            drug2: название второго лекарства
+            stream: вернуть генератор токенов вместо готовой строки
+            on_token: callback для каждого токена по мере генерации
+        """
+        drug1_info, drug2_info = self.vector_db.resolve_drugs([drug1, drug2])
+        
+        if not drug1_info or not drug2_info:
+            message = "Не удалось найти информацию об одном из лекарств"
+            return iter([message]) if stream else message
+        
+        prompt = self._build_comparison_prompt(drug1, drug1_info, drug2, drug2_info)
         
-        return self.llm.generate_response(prompt, temperature=0.2)
+        if stream:
+            return self.llm.generate_stream(prompt)
+        
+        return self.llm.generate_response(prompt, on_token=on_token)
     
-    def compare_drugs(self, drug1: str, drug2: str) -> str:
-        """Сравнение двух лекарств"""
-        results1 = self.vector_db.search_drugs(drug1, n_results=1)
-        results2 = self.vector_db.search_drugs(drug2, n_results=1)
+    def build_comparison(self, names: List[str]) -> Dict:
+        """
+        Сравнение нескольких лекарств без LLM: названия разрешаются одним
+        пакетным запросом, таблица строится локально
         
-        if not results1 or not results2:
-            return "Не удалось найти информацию об одном из лекарств"
+        Returns:
+            {"лекарства": [найденные названия], "не_найдены": [запрошенные названия],
+             "таблица": таблица сравнения, "сравнение": None}
+        """
+        drugs = []
+        seen_ids = set()
+        missing = []
+        for name, drug in zip(names, self.vector_db.resolve_drugs(names)):
+            if not drug:
+                missing.append(name)
+            elif drug['id'] not in seen_ids:
+                # Два названия одного лекарства сравниваются один раз
+                seen_ids.add(drug['id'])
+                drugs.append(drug)
         
-        drug1_info = results1[0]['полные_данные']
-        drug2_info = results2[0]['полные_данные']
+        table = build_comparison_table(drugs)
+        return {
+            "лекарства": table["лекарства"],
+            "не_найдены": missing,
+            "таблица": table,
+            "сравнение": None
+        }
+    
+    def compare_many(self, names: List[str], use_llm: bool = False, stream: bool = False,
+                     on_token: Callable[[str], None] = None) -> Dict:
+        """
+        Сравнение нескольких лекарств: таблица по показаниям, противопоказаниям,
+        побочным эффектам и взаимодействию, по запросу - вывод LLM
+        
+        Args:
+            names: названия лекарств
+            use_llm: добавить текстовый вывод LLM ("сравнение")
+            stream: вернуть вывод как генератор токенов
+            on_token: callback для каждого токена по мере генерации
+        """
+        comparison = self.build_comparison(names)
+        if not use_llm or len(comparison["лекарства"]) < 2:
+            return comparison
         
-        prompt = f"""Сравни два лекарства:
+        prompt = self._build_many_comparison_prompt(comparison["таблица"])
+        if stream:
+            comparison["сравнение"] = self.llm.generate_stream(prompt)
+        else:
+            comparison["сравнение"] = self.llm.generate_response(prompt, on_token=on_token)
+        return comparison
+    
+    def _build_many_comparison_prompt(self, table: Dict) -> str:
+        """Промпт сравнения нескольких лекарств по готовой таблице"""
+        return f"""Сравни лекарства: {', '.join(table['лекарства'])}
+
+{format_comparison_table(table)}
+
+Сравни их по:
+1. Эффективности для разных состояний
+2. Безопасности и побочным эффектам
+3. Противопоказаниям
+4. Взаимодействию с другими лекарствами
+5. Удобству применения
+
+Вывод на русском языке:"""
+    
+    def _build_comparison_prompt(self, drug1: str, drug1_info: Dict,
+                                 drug2: str, drug2_info: Dict) -> str:
+        """Промпт сравнения двух лекарств"""
+        context_cache = self._context_blocks()
+        drug1_block, _ = context_cache.block(drug1_info, "comparison")
+        drug2_block, _ = context_cache.block(drug2_info, "comparison")
+        return f"""Сравни два лекарства:
 
 Лекарство 1: {drug1}
-- Описание: {drug1_info['описание']}
-- Показания: {', '.join(drug1_info['показания'])}
-- Противопоказания: {', '.join(drug1_info['противопоказания'])}
-- Побочные эффекты: {', '.join(drug1_info['побочные_эффекты'])}
+{drug1_block}
 
 Лекарство 2: {drug2}
-- Описание: {drug2_info['описание']}
-- Показания: {', '.join(drug2_info['показания'])}
-- Противопоказания: {', '.join(drug2_info['противопоказания'])}
-- Побочные эффекты: {', '.join(drug2_info['побочные_эффекты'])}
+{drug2_block}
 
 Сравни их по:
 1. Эффективности для разных состояний
@@ -145,22 +408,30 @@ class RAGSystem:
 4. Удобству применения
 
 Вывод на русском языке:"""
-        
-        return self.llm.generate_response(prompt)
     
-    def _build_context(self, search_results: List[Dict]) -> str:
-        """Построение контекста из результатов поиска"""
-        context = ""
-        for i, result in enumerate(search_results[:5], 1):
-            drug_data = result['полные_данные']
-            context += f"\n{i}. {drug_data['название']}:\n"
-            context += f"   - Описание: {drug_data['описание']}\n"
-            context += f"   - Показания: {', '.join(drug_data['показания'][:3])}\n"
-            context += f"   - Дозировка: {drug_data['дозировка']}\n"
-            context += f"   - Противопоказания: {', '.join(drug_data['противопоказания'][:3])}\n"
-            context += f"   - Побочные эффекты: {', '.join(drug_data['побочные_эффекты'][:3])}\n"
-        
+    def _build_drug_summary_prompt(self, drug_name: str, drug_data: Dict) -> str:
+        """Промпт краткого резюме о лекарстве"""
+        summary_block, _ = self._context_blocks().block(drug_data, "summary")
+        return f"""Дай краткое резюме о лекарстве {drug_name}:
+
+{summary_block}
+
+Краткое резюме:"""
+    
+    def _build_context(self, search_results: List[Dict], max_tokens: int = None) -> str:
+        """
+        Построение контекста из кешированных блоков лекарств: в бюджет токенов
+        помещаются лекарства с наибольшим рейтингом, у остальных блоки
+        сокращаются или отбрасываются
+        """
+        drugs = [result['полные_данные'] for result in search_results[:self.max_context_drugs]]
+        context, _ = self._context_blocks().build_context(drugs, max_tokens)
         return context
+    
+    def _context_blocks(self) -> DrugContextCache:
+        """Кеш блоков лекарств, сброшенный, если с прошлого обращения изменился индекс"""
+        self.context_cache.check_version(getattr(self.vector_db, "index_version", None))
+        return self.context_cache
 
 def test_llm_connection():
     """Тестирование подключения к локальной LLM"""
@@ -0,0 +1,156 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.lexical_index import LexicalIndex
+
+
+def _trigrams(name: str) -> Set[str]:
+    """Триграммы названия с границами слова"""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Расстояние Дамерау-Левенштейна (с перестановкой соседних букв)
+    с ранним выходом: при превышении max_distance возвращает max_distance + 1
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    
+    return previous[-1]
+
+
+class NameResolver:
+    def __init__(self, drugs: Iterable[Dict] = (), min_trigram_similarity: float = 0.3):
+        """
+        Разрешение названия лекарства в id без обращения к модели:
+        нормализованное точное совпадение, затем нечеткое (опечатки)
+        по триграммам с проверкой расстоянием редактирования
+        
+        Args:
+            drugs: записи лекарств
+            min_trigram_similarity: минимальный коэффициент Дайса по триграммам
+                для кандидата нечеткого совпадения
+        """
+        self.min_trigram_similarity = min_trigram_similarity
+        # Одно название может быть у нескольких лекарств: разрешается в последнее добавленное
+        self._ids_by_name: Dict[str, List[int]] = {}
+        self._name_by_id: Dict[int, str] = {}
+        self._trigrams_by_name: Dict[str, Set[str]] = {}
+        self._names_by_trigram: Dict[str, Set[str]] = {}
+        
+        for drug in drugs:
+            self.add(drug['id'], drug['название'])
+    
+    def add(self, drug_id: int, name: str):
+        """Добавление (или замена) названия в индексе"""
+        if drug_id in self._name_by_id:
+            self.remove(drug_id)
+        
+        normalized = LexicalIndex.normalize_name(name)
+        if not normalized:
+            return
+        
+        self._name_by_id[drug_id] = normalized
+        owners = self._ids_by_name.setdefault(normalized, [])
+        owners.append(drug_id)
+        if len(owners) > 1:
+            return
+        trigrams = _trigrams(normalized)
+        self._trigrams_by_name[normalized] = trigrams
+        for trigram in trigrams:
+            self._names_by_trigram.setdefault(trigram, set()).add(normalized)
+    
+    def remove(self, drug_id: int):
+        """Удаление названия лекарства из индекса"""
+        normalized = self._name_by_id.pop(drug_id, None)
+        if normalized is None:
+            return
+        
+        owners = self._ids_by_name[normalized]
+        owners.remove(drug_id)
+        # Название остается, пока есть другие лекарства с ним
+        if owners:
+            return
+        
+        del self._ids_by_name[normalized]
+        for trigram in self._trigrams_by_name.pop(normalized, ()):
+            names = self._names_by_trigram.get(trigram)
+            if names is None:
+                continue
+            names.discard(normalized)
+            if not names:
+                del self._names_by_trigram[trigram]
+    
+    @staticmethod
+    def _max_distance(name: str) -> int:
+        """Допустимое число опечаток зависит от длины названия"""
+        if len(name) <= 4:
+            return 0
+        return 1 if len(name) <= 7 else 2
+    
+    def resolve_exact(self, name: str) -> Optional[int]:
+        """id по нормализованному точному названию"""
+        owners = self._ids_by_name.get(LexicalIndex.normalize_name(name))
+        return owners[-1] if owners else None
+    
+    def resolve_fuzzy(self, name: str) -> Optional[Tuple[int, int]]:
+        """
+        Нечеткое совпадение названия
+        
+        Returns:
+            (id лекарства, расстояние редактирования) или None
+        """
+        normalized = LexicalIndex.normalize_name(name)
+        max_distance = self._max_distance(normalized)
+        if not max_distance:
+            return None
+        
+        query_trigrams = _trigrams(normalized)
+        shared: Dict[str, int] = {}
+        for trigram in query_trigrams:
+            for candidate in self._names_by_trigram.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        
+        best = None
+        for candidate, common in shared.items():
+            similarity = 2 * common / (len(query_trigrams) + len(self._trigrams_by_name[candidate]))
+            if similarity < self.min_trigram_similarity:
+                continue
+            distance = edit_distance(normalized, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            key = (distance, -similarity)
+            if best is None or key < best[0]:
+                best = (key, candidate, distance)
+        
+        if best is None:
+            return None
+        return self._ids_by_name[best[1]][-1], best[2]
+    
+    def resolve(self, name: str) -> Optional[int]:
+        """id лекарства по точному или нечеткому совпадению названия"""
+        drug_id = self.resolve_exact(name)
+        if drug_id is not None:
+            return drug_id
+        
+        fuzzy = self.resolve_fuzzy(name)
+        return fuzzy[0] if fuzzy else None
+    
+    def resolve_many(self, names: List[str]) -> List[Optional[int]]:
+        """Пакетное разрешение названий"""
+        return [self.resolve(name) for name in names]
@@ -0,0 +1,109 @@
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from src.drug_text import DrugTextBuilder
+
+# (id, документы, метаданные, эмбеддинги) одного пакета лекарств
+EncodedChunk = Tuple[List[int], List[str], List[Dict], np.ndarray]
+
+# Состояние процесса-исполнителя: собственная модель и построитель текстов
+_worker_model = None
+_worker_text_builder = None
+
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    """Разбиение потока на списки по size элементов"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def encode_chunk(drugs: List[Dict], text_builder: DrugTextBuilder, model) -> EncodedChunk:
+    """Тексты, метаданные и нормализованные эмбеддинги пакета лекарств"""
+    ids, documents, metadatas = [], [], []
+    for drug in drugs:
+        drug_id, drug_text, metadata = text_builder.prepare_entry(drug)
+        ids.append(drug_id)
+        documents.append(drug_text)
+        metadatas.append(metadata)
+    
+    embeddings = np.asarray(model.encode(documents, normalize_embeddings=True), dtype=np.float32)
+    return ids, documents, metadatas, embeddings
+
+
+def _init_worker(model_name: str, text_builder: DrugTextBuilder, torch_threads: int,
+                 model_loader: Callable[[str], Any] = None):
+    global _worker_model, _worker_text_builder
+    
+    if torch_threads:
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+    
+    if model_loader is None:
+        from sentence_transformers import SentenceTransformer
+        model_loader = SentenceTransformer
+    _worker_model = model_loader(model_name)
+    _worker_text_builder = text_builder
+
+
+def _encode_in_worker(drugs: List[Dict]) -> EncodedChunk:
+    return encode_chunk(drugs, _worker_text_builder, _worker_model)
+
+
+class ParallelIndexBuilder:
+    def __init__(self, text_builder: DrugTextBuilder, workers: int = None,
+                 batch_size: int = 256, max_pending_batches: int = None,
+                 model_loader: Callable[[str], Any] = None):
+        """
+        Параллельная сборка индекса: построение текстов и кодирование пакетами
+        в пуле процессов, у каждого процесса своя модель
+        
+        Args:
+            text_builder: построитель текстов (передается процессам)
+            workers: количество процессов (по умолчанию - число ядер)
+            batch_size: лекарств в одном пакете
+            max_pending_batches: сколько пакетов может находиться в работе
+                одновременно; ограничивает память независимо от размера данных
+                (по умолчанию 2 на процесс)
+            model_loader: загрузка модели в процессе по имени (функция уровня
+                модуля; по умолчанию SentenceTransformer)
+        """
+        self.text_builder = text_builder
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_pending_batches = max_pending_batches or 2 * self.workers
+        self.model_loader = model_loader
+    
+    def iter_encoded(self, drugs: Iterable[Dict]) -> Iterator[EncodedChunk]:
+        """
+        Закодированные пакеты в исходном порядке по мере готовности;
+        входной поток читается не дальше max_pending_batches пакетов вперед
+        """
+        torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        # spawn: fork процесса с уже инициализированным torch небезопасен
+        context = multiprocessing.get_context("spawn")
+        
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(self.text_builder.model_name, self.text_builder,
+                                           torch_threads, self.model_loader)) as pool:
+            pending = deque()
+            for chunk in chunked(drugs, self.batch_size):
+                pending.append(pool.submit(_encode_in_worker, chunk))
+                if len(pending) >= self.max_pending_batches:
+                    yield pending.popleft().result()
+            
+            while pending:
+                yield pending.popleft().result()
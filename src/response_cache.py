@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class ResponseCache:
+    def __init__(self, max_size: int = 1000, ttl: float = 3600.0):
+        """
+        Кеш готовых ответов поиска (включая AI-совет) с TTL и LRU-вытеснением
+        
+        Args:
+            max_size: максимальное количество ответов в кеше
+            ttl: время жизни ответа в секундах
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalize_conditions(conditions: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        """Состояния пользователя для ключа кеша: без учета регистра, порядка и повторов"""
+        return tuple(sorted({" ".join(str(condition).lower().split()) for condition in conditions or ()}))
+    
+    @classmethod
+    def _detached(cls, value: Any) -> Any:
+        """
+        Копия словарей и списков ответа: изменения вызывающего не затрагивают
+        запись в кеше (записи лекарств и результаты поиска неизменяемы)
+        """
+        if isinstance(value, dict):
+            return {key: cls._detached(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [cls._detached(item) for item in value]
+        return value
+    
+    def check_version(self, version: Any):
+        """Сброс кеша при изменении базы лекарств или индекса"""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Копия ответа из кеша или None, если его нет или он устарел"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self._detached(value)
+    
+    def put(self, key: Hashable, value: Any):
+        """Сохранение копии ответа с вытеснением самых старых записей"""
+        value = self._detached(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Полная очистка кеша"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Статистика использования кеша"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+            "max_size": self.max_size
+        }
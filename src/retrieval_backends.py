@@ -0,0 +1,564 @@
+import os
+import time
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.embedding_artifact import EmbeddingArtifact
+
+# Результат поиска для одного запроса: список (id лекарства, расстояние)
+Hits = List[Tuple[int, float]]
+
+
+class RetrievalBackend:
+    """
+    Интерфейс хранилища эмбеддингов лекарств для MedicalVectorDB
+    
+    Расстояние в результатах - квадрат евклидова расстояния между
+    нормализованными векторами (как у Chroma по умолчанию): 2 - 2 * cos.
+    """
+    
+    name = "base"
+    # Хранилище исключает id до ранжирования (query с exclude_ids);
+    # иначе MedicalVectorDB запрашивает результаты с запасом и фильтрует сам
+    supports_exclusion = False
+    
+    def count(self) -> int:
+        raise NotImplementedError
+    
+    def get_fingerprints(self) -> Dict[int, str]:
+        """Отпечатки текстов проиндексированных лекарств: id -> отпечаток"""
+        raise NotImplementedError
+    
+    def upsert(self, drug_ids: List[int], embeddings: np.ndarray,
+               documents: List[str], metadatas: List[Dict]):
+        """Добавление или замена записей"""
+        raise NotImplementedError
+    
+    def delete(self, drug_ids: List[int]):
+        """Удаление записей"""
+        raise NotImplementedError
+    
+    def reset(self):
+        """Удаление всех записей (перед полным пересозданием)"""
+        raise NotImplementedError
+    
+    def query(self, query_embeddings: np.ndarray, n_results: int,
+              category: str = None, exclude_ids: Set[int] = None) -> List[Hits]:
+        """
+        Ближайшие лекарства для каждого запроса
+        
+        exclude_ids учитывается только хранилищами с supports_exclusion
+        """
+        raise NotImplementedError
+    
+    def get_embeddings(self) -> Tuple[List[int], List[str], List[str], np.ndarray]:
+        """Все записи: id, отпечатки, категории и матрица эмбеддингов (по возрастанию id)"""
+        raise NotImplementedError
+    
+    def flush(self):
+        """Сохранение изменений на диск (если хранилище этого требует)"""
+    
+    def warmup(self):
+        """Заблаговременное открытие хранилища"""
+        self.count()
+
+
+class ChromaBackend(RetrievalBackend):
+    name = "chroma"
+    
+    def __init__(self, path: str = "./chroma_db", collection_name: str = "medical_drugs"):
+        """
+        Хранилище в персистентной коллекции Chroma
+        
+        Args:
+            path: каталог базы Chroma
+            collection_name: имя коллекции
+        """
+        self.path = path
+        self.collection_name = collection_name
+        # Клиент открывается при первом обращении (импорт chromadb небыстрый)
+        self._client = None
+        self._collection = None
+        self._init_lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """Клиент Chroma, открывается при первом обращении"""
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    import chromadb
+                    self._client = chromadb.PersistentClient(path=self.path)
+        return self._client
+    
+    @property
+    def collection(self):
+        """Коллекция лекарств в Chroma"""
+        if self._collection is None:
+            client = self.client
+            with self._init_lock:
+                if self._collection is None:
+                    self._collection = client.get_or_create_collection(
+                        name=self.collection_name,
+                        metadata={"description": "Medical drugs database"}
+                    )
+        return self._collection
+    
+    @staticmethod
+    def _record_id(drug_id: int) -> str:
+        return f"drug_{drug_id}"
+    
+    def count(self) -> int:
+        return self.collection.count()
+    
+    def get_fingerprints(self) -> Dict[int, str]:
+        existing = self.collection.get(include=["metadatas"])
+        return {
+            int(metadata["id"]): metadata.get("отпечаток")
+            for metadata in existing["metadatas"] if metadata
+        }
+    
+    def upsert(self, drug_ids, embeddings, documents, metadatas):
+        self.collection.upsert(
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+            documents=documents,
+            metadatas=metadatas,
+            ids=[self._record_id(drug_id) for drug_id in drug_ids]
+        )
+    
+    def delete(self, drug_ids):
+        if drug_ids:
+            self.collection.delete(ids=[self._record_id(drug_id) for drug_id in drug_ids])
+    
+    def reset(self):
+        try:
+            self.client.delete_collection(self.collection_name)
+        except Exception:
+            pass
+        self._collection = None
+    
+    def query(self, query_embeddings, n_results, category=None, exclude_ids=None):
+        results = self.collection.query(
+            query_embeddings=np.asarray(query_embeddings, dtype=np.float32).tolist(),
+            n_results=n_results,
+            where={"категория": category} if category else None
+        )
+        return [
+            [(int(metadata['id']), float(distance)) for metadata, distance in zip(metadatas, distances)]
+            for metadatas, distances in zip(results['metadatas'], results['distances'])
+        ]
+    
+    def get_embeddings(self):
+        stored = self.collection.get(include=["embeddings", "metadatas"])
+        rows = sorted(
+            (int(metadata["id"]), metadata.get("отпечаток", ""), metadata.get("категория", ""), embedding)
+            for metadata, embedding in zip(stored["metadatas"], stored["embeddings"])
+        )
+        return (
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            [row[2] for row in rows],
+            np.asarray([row[3] for row in rows], dtype=np.float32)
+        )
+
+
+QUANTIZED_STORAGES = ("float16", "int8")
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Симметричное скалярное квантование строк в int8
+    
+    Returns:
+        (матрица int8, масштаб строки float32): строка ~ квантованная * масштаб
+    """
+    scales = np.abs(matrix).max(axis=1) / 127.0 if len(matrix) else np.zeros(0, dtype=np.float32)
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales
+
+
+class NumpyBackend(RetrievalBackend):
+    name = "numpy"
+    supports_exclusion = True
+    # Строк квантованной матрицы, переводимых в float32 за один шаг сканирования
+    SCAN_BLOCK_ROWS = 16384
+    
+    def __init__(self, path: str = "./numpy_index.emb", model_name: str = "",
+                 storage: str = "float32", rerank_factor: int = 4):
+        """
+        Точный поиск в памяти процесса: нормализованная матрица float32,
+        скалярное произведение и argpartition для top-k
+        
+        Args:
+            path: файл артефакта эмбеддингов для сохранения индекса между запусками
+                (загружается через memory map); None - только в памяти
+            model_name: модель, записываемая в заголовок артефакта
+            storage: матрица для сканирования - "float32", "float16" или "int8"
+                (в 2 и 4 раза меньше памяти). Полная матрица float32 после flush
+                остается только в memory map артефакта
+            rerank_factor: для квантованной матрицы - во сколько раз больше
+                кандидатов отбирается приближенно и переранжируется по float32;
+                0 - без переранжирования (расстояния приближенные)
+        """
+        if storage != "float32" and storage not in QUANTIZED_STORAGES:
+            raise ValueError(f"Неподдерживаемый тип матрицы: {storage}")
+        
+        self.path = path
+        self.model_name = model_name
+        self.storage = storage
+        self.rerank_factor = rerank_factor
+        self._quantized: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._ids: List[int] = []
+        self._fingerprints: List[str] = []
+        self._categories: List[str] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._row_by_id: Dict[int, int] = {}
+        self._category_masks: Optional[Dict[str, np.ndarray]] = None
+        self._dirty = False
+        self._lock = threading.RLock()
+        
+        if path and os.path.exists(path):
+            self._load(path)
+    
+    def _load(self, path: str):
+        artifact = EmbeddingArtifact.load(path)
+        self._ids = list(artifact.ids)
+        self._fingerprints = list(artifact.fingerprints)
+        self._categories = list(artifact.categories or [""] * len(artifact.ids))
+        # Матрица остается read-only memory map до первого изменения
+        self._matrix = artifact.embeddings if artifact.dtype == "float32" else \
+            np.asarray(artifact.embeddings, dtype=np.float32)
+        self._row_by_id = {drug_id: row for row, drug_id in enumerate(self._ids)}
+        self._category_masks = None
+        self._quantized = None
+    
+    def _ensure_quantized(self):
+        """Квантованная копия матрицы; пересчитывается после изменений при первом запросе"""
+        if self.storage == "float32" or self._quantized is not None:
+            return
+        
+        if self.storage == "float16":
+            self._quantized = np.asarray(self._matrix, dtype=np.float16)
+            self._scales = None
+            return
+        
+        blocks, scales = [], []
+        for start in range(0, len(self._matrix), self.SCAN_BLOCK_ROWS):
+            block, block_scales = quantize_int8(np.asarray(self._matrix[start:start + self.SCAN_BLOCK_ROWS]))
+            blocks.append(block)
+            scales.append(block_scales)
+        self._quantized = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.int8)
+        self._scales = np.concatenate(scales) if scales else np.zeros(0, dtype=np.float32)
+    
+    def _scan_scores(self, query_embeddings: np.ndarray, quantized: np.ndarray,
+                     scales: Optional[np.ndarray]) -> np.ndarray:
+        """Приближенные скалярные произведения по квантованной матрице, блоками"""
+        scores = np.empty((len(query_embeddings), len(quantized)), dtype=np.float32)
+        for start in range(0, len(quantized), self.SCAN_BLOCK_ROWS):
+            block = quantized[start:start + self.SCAN_BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = query_embeddings @ block.T
+        if scales is not None:
+            scores *= scales[None, :]
+        return scores
+    
+    def memory_usage(self) -> Dict[str, int]:
+        """Размер матриц в байтах (memory map артефакта не занимает память процесса)"""
+        with self._lock:
+            self._ensure_quantized()
+            full_in_memory = 0 if isinstance(self._matrix, np.memmap) else self._matrix.nbytes
+            scan = self._quantized.nbytes if self._quantized is not None else self._matrix.nbytes
+            if self._scales is not None:
+                scan += self._scales.nbytes
+            return {"scan_matrix": scan, "float32_in_memory": full_in_memory}
+    
+    def _category_mask(self, category: str) -> np.ndarray:
+        """Булева маска строк категории (аналог where={"категория": ...})"""
+        if self._category_masks is None:
+            categories = np.asarray(self._categories, dtype=object)
+            self._category_masks = {
+                value: categories == value for value in set(self._categories)
+            }
+        mask = self._category_masks.get(category)
+        return mask if mask is not None else np.zeros(len(self._ids), dtype=bool)
+    
+    def count(self) -> int:
+        return len(self._ids)
+    
+    def get_fingerprints(self):
+        return dict(zip(self._ids, self._fingerprints))
+    
+    def upsert(self, drug_ids, embeddings, documents, metadatas):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            if not self._ids:
+                self._matrix = np.zeros((0, embeddings.shape[1]), dtype=np.float32)
+            elif not self._matrix.flags.writeable:
+                self._matrix = np.array(self._matrix, dtype=np.float32)
+            
+            new_rows = []
+            for drug_id, embedding, metadata in zip(drug_ids, embeddings, metadatas):
+                row = self._row_by_id.get(drug_id)
+                if row is None:
+                    self._row_by_id[drug_id] = len(self._ids)
+                    self._ids.append(drug_id)
+                    self._fingerprints.append(metadata.get("отпечаток", ""))
+                    self._categories.append(metadata.get("категория", ""))
+                    new_rows.append(embedding)
+                else:
+                    self._matrix[row] = embedding
+                    self._fingerprints[row] = metadata.get("отпечаток", "")
+                    self._categories[row] = metadata.get("категория", "")
+            
+            if new_rows:
+                self._matrix = np.vstack([self._matrix, np.asarray(new_rows, dtype=np.float32)])
+            self._category_masks = None
+            self._quantized = None
+            self._dirty = True
+    
+    def delete(self, drug_ids):
+        with self._lock:
+            rows = [self._row_by_id[drug_id] for drug_id in drug_ids if drug_id in self._row_by_id]
+            if not rows:
+                return
+            keep = np.ones(len(self._ids), dtype=bool)
+            keep[rows] = False
+            self._matrix = np.array(self._matrix[keep], dtype=np.float32)
+            self._ids = [value for value, kept in zip(self._ids, keep) if kept]
+            self._fingerprints = [value for value, kept in zip(self._fingerprints, keep) if kept]
+            self._categories = [value for value, kept in zip(self._categories, keep) if kept]
+            self._row_by_id = {drug_id: row for row, drug_id in enumerate(self._ids)}
+            self._category_masks = None
+            self._quantized = None
+            self._dirty = True
+    
+    def reset(self):
+        with self._lock:
+            self._ids, self._fingerprints, self._categories = [], [], []
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            self._row_by_id = {}
+            self._category_masks = None
+            self._quantized = None
+            self._dirty = True
+    
+    def _top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Индексы k лучших значений по убыванию (argpartition + сортировка k элементов)"""
+        if k >= scores.shape[1]:
+            return np.argsort(-scores, axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1)
+    
+    def _allowed_rows(self, category: str = None, exclude_ids=None) -> Optional[np.ndarray]:
+        """Строки, проходящие фильтры категории и исключения (None - все строки)"""
+        mask = self._category_mask(category) if category else None
+        if exclude_ids:
+            excluded_rows = [self._row_by_id[drug_id] for drug_id in exclude_ids
+                             if drug_id in self._row_by_id]
+            if excluded_rows:
+                mask = np.ones(len(self._ids), dtype=bool) if mask is None else mask.copy()
+                mask[excluded_rows] = False
+        return np.flatnonzero(mask) if mask is not None else None
+    
+    def query(self, query_embeddings, n_results, category=None, exclude_ids=None):
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        if query_embeddings.ndim == 1:
+            query_embeddings = query_embeddings[None, :]
+        
+        with self._lock:
+            self._ensure_quantized()
+            matrix, quantized, scales, ids = self._matrix, self._quantized, self._scales, self._ids
+            # Категория и исключенные лекарства отсекаются маской до ранжирования
+            rows = self._allowed_rows(category, exclude_ids)
+        
+        if quantized is not None:
+            return self._query_quantized(query_embeddings, n_results, matrix, quantized, scales, ids, rows)
+        
+        if rows is not None:
+            matrix = matrix[rows]
+        if not len(matrix) or n_results <= 0:
+            return [[] for _ in range(len(query_embeddings))]
+        
+        scores = query_embeddings @ matrix.T
+        top = self._top_k(scores, min(n_results, matrix.shape[0]))
+        
+        hits = []
+        for query_index, columns in enumerate(top):
+            query_hits = []
+            for column in columns:
+                row = rows[column] if rows is not None else column
+                query_hits.append((ids[row], float(2.0 - 2.0 * scores[query_index, column])))
+            hits.append(query_hits)
+        return hits
+    
+    def _query_quantized(self, query_embeddings, n_results, matrix, quantized, scales, ids, rows):
+        """Приближенный отбор по квантованной матрице и переранжирование кандидатов по float32"""
+        if rows is not None:
+            quantized = quantized[rows]
+            scales = scales[rows] if scales is not None else None
+        if not len(quantized) or n_results <= 0:
+            return [[] for _ in range(len(query_embeddings))]
+        
+        scores = self._scan_scores(query_embeddings, quantized, scales)
+        n_candidates = min(n_results * max(self.rerank_factor, 1), len(quantized))
+        top = self._top_k(scores, n_candidates)
+        
+        hits = []
+        for query_index, columns in enumerate(top):
+            candidate_rows = rows[columns] if rows is not None else columns
+            if self.rerank_factor:
+                # Читаются только строки кандидатов (из memory map - только их страницы)
+                order = np.sort(candidate_rows)
+                exact = np.asarray(matrix[order], dtype=np.float32) @ query_embeddings[query_index]
+                best = np.argsort(-exact)[:n_results]
+                candidate_rows, candidate_scores = order[best], exact[best]
+            else:
+                candidate_rows = candidate_rows[:n_results]
+                candidate_scores = scores[query_index, columns[:n_results]]
+            hits.append([
+                (ids[row], float(2.0 - 2.0 * score))
+                for row, score in zip(candidate_rows, candidate_scores)
+            ])
+        return hits
+    
+    def get_embeddings(self):
+        with self._lock:
+            order = np.argsort(self._ids) if self._ids else np.zeros(0, dtype=int)
+            return (
+                [self._ids[row] for row in order],
+                [self._fingerprints[row] for row in order],
+                [self._categories[row] for row in order],
+                np.asarray(self._matrix[order], dtype=np.float32)
+            )
+    
+    def flush(self):
+        """Сохранение индекса в артефакт, если он изменился"""
+        # Блокировка держится от снимка до перезагрузки: upsert/delete между ними
+        # иначе потерялись бы при чтении артефакта
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            ids, fingerprints, categories, matrix = self.get_embeddings()
+            if not ids:
+                return
+            EmbeddingArtifact.save(self.path, self.model_name, ids, fingerprints, matrix,
+                                   categories=categories)
+            self._dirty = False
+            
+            if self.storage != "float32":
+                # Полная матрица освобождается: для переранжирования достаточно memory map
+                self._load(self.path)
+
+
+def create_backend(backend, model_name: str = "", path: str = "./numpy_index.emb") -> RetrievalBackend:
+    """
+    Создание хранилища по имени ("chroma", "numpy", "numpy-float16", "numpy-int8")
+    или возврат готового экземпляра; path - файл артефакта эмбеддингов NumPy
+    """
+    if isinstance(backend, RetrievalBackend):
+        return backend
+    if backend == "chroma":
+        return ChromaBackend()
+    if backend == "numpy":
+        return NumpyBackend(path=path, model_name=model_name)
+    if backend in ("numpy-float16", "numpy-int8"):
+        storage = backend.split("-", 1)[1]
+        return NumpyBackend(path=path, model_name=model_name, storage=storage)
+    raise ValueError(f"Неизвестное хранилище векторов: {backend}")
+
+
+def benchmark_backends(n_drugs: int = 20000, dim: int = 384, n_queries: int = 200,
+                       n_results: int = 5, chroma_path: str = "./chroma_benchmark"):
+    """Сравнение времени поиска Chroma и NumPy на случайных нормализованных векторах"""
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((n_drugs, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = rng.standard_normal((n_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    
+    drug_ids = list(range(n_drugs))
+    metadatas = [{"id": str(i), "категория": f"категория_{i % 20}", "отпечаток": ""} for i in drug_ids]
+    
+    backends = [NumpyBackend(path=None), ChromaBackend(chroma_path, "benchmark")]
+    print(f"🧪 БЕНЧМАРК ХРАНИЛИЩ: {n_drugs} векторов x {dim}, {n_queries} запросов")
+    print("=" * 60)
+    
+    for backend in backends:
+        backend.reset()
+        for start in range(0, n_drugs, 5000):
+            end = start + 5000
+            backend.upsert(drug_ids[start:end], embeddings[start:end],
+                           [""] * len(drug_ids[start:end]), metadatas[start:end])
+        
+        start_time = time.perf_counter()
+        for query in queries:
+            backend.query(query[None, :], n_results)
+        single_time = (time.perf_counter() - start_time) / n_queries
+        
+        start_time = time.perf_counter()
+        backend.query(queries, n_results, category="категория_3")
+        filtered_time = (time.perf_counter() - start_time) / n_queries
+        
+        print(f"{backend.name:>7}: {single_time * 1000:.3f} мс/запрос, "
+              f"с фильтром категории (пакет): {filtered_time * 1000:.3f} мс/запрос")
+    
+    backends[1].reset()
+
+
+def benchmark_quantization(n_drugs: int = 50000, dim: int = 384, n_queries: int = 200,
+                           n_results: int = 10, rerank_factor: int = 4, path: str = "./quantization_benchmark.emb"):
+    """
+    Память, задержка и полнота (recall@k относительно точного float32)
+    для float16/int8 матрицы с переранжированием и без него
+    """
+    rng = np.random.default_rng(0)
+    # Кластеризованные векторы ближе к реальным эмбеддингам, чем равномерный шум
+    centers = rng.standard_normal((200, dim)).astype(np.float32)
+    embeddings = centers[rng.integers(0, len(centers), n_drugs)] + \
+        0.6 * rng.standard_normal((n_drugs, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = embeddings[rng.integers(0, n_drugs, n_queries)] + \
+        0.3 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    
+    drug_ids = list(range(n_drugs))
+    metadatas = [{"категория": "", "отпечаток": ""} for _ in drug_ids]
+    
+    configurations = [("float32", 0), ("float16", 0), ("float16", rerank_factor),
+                      ("int8", 0), ("int8", rerank_factor)]
+    print(f"🧪 БЕНЧМАРК КВАНТОВАНИЯ: {n_drugs} векторов x {dim}, {n_queries} запросов, top-{n_results}")
+    print("=" * 60)
+    
+    exact_ids = None
+    for storage, factor in configurations:
+        backend = NumpyBackend(path=path, storage=storage, rerank_factor=factor)
+        backend.reset()
+        backend.upsert(drug_ids, embeddings, [""] * n_drugs, metadatas)
+        backend.flush()
+        backend.query(queries[:1], n_results)
+        
+        start_time = time.perf_counter()
+        hits = backend.query(queries, n_results)
+        batch_time = (time.perf_counter() - start_time) / n_queries
+        
+        found_ids = [[drug_id for drug_id, _ in query_hits] for query_hits in hits]
+        if exact_ids is None:
+            exact_ids = found_ids
+        recall = np.mean([len(set(found) & set(exact)) / n_results
+                          for found, exact in zip(found_ids, exact_ids)])
+        
+        memory = backend.memory_usage()
+        label = f"{storage}" + (f" + rerank x{factor}" if factor else "")
+        print(f"{label:>20}: матрица {memory['scan_matrix'] / 2**20:.1f} МБ, "
+              f"{batch_time * 1000:.3f} мс/запрос, recall@{n_results} = {recall:.3f}")
+    
+    if os.path.exists(path):
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    benchmark_backends()
+    benchmark_quantization()
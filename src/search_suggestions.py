@@ -0,0 +1,42 @@
+from typing import List, Set
+
+
+def generate_suggestions(db, results, excluded_ids: Set[int] = None) -> List[str]:
+    """
+    Подсказки к результатам поиска (общие для синхронной и асинхронной систем)
+    
+    Args:
+        db: MedicalVectorDB
+        results: результаты поиска
+        excluded_ids: лекарства, противопоказанные пользователю; не предлагаются
+            как похожие
+    """
+    suggestions = []
+    
+    categories = list(dict.fromkeys(
+        db.drug_store.category_of(result['полные_данные']['id'])
+        for result in results
+    ))
+    
+    if categories:
+        suggestions.append(f"Похожие категории: {', '.join(categories[:3])}")
+    
+    # Соседи лучшего результата по графу похожих лекарств, кроме уже найденных
+    # и противопоказанных; без графа остаются подсказки по категориям
+    shown_ids = {result['полные_данные']['id'] for result in results} | set(excluded_ids or ())
+    try:
+        neighbors = db.similar_drugs(results[0]['полные_данные']['id'], k=len(shown_ids) + 3)
+    except Exception as e:
+        print(f"Ошибка графа похожих лекарств: {e}")
+        neighbors = []
+    similar = [
+        similar_result['лекарство']
+        for similar_result in neighbors
+        if similar_result['полные_данные']['id'] not in shown_ids
+    ]
+    if similar:
+        suggestions.append(f"Похожие лекарства: {', '.join(similar[:3])}")
+    
+    suggestions.append("Для точного диагноза обратитесь к врачу")
+    
+    return suggestions
@@ -0,0 +1,97 @@
+import os
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+class SimilarityGraph:
+    # Строк матрицы эмбеддингов в одном блоке умножения
+    BLOCK_ROWS = 1024
+    
+    def __init__(self, ids: np.ndarray, neighbors: np.ndarray, scores: np.ndarray,
+                 index_version: str = None):
+        """
+        Граф k ближайших соседей лекарств по эмбеддингам
+        
+        Args:
+            ids: id лекарств в порядке строк
+            neighbors: (количество лекарств x k) номера строк соседей, int32,
+                по убыванию схожести
+            scores: (количество лекарств x k) косинусная схожесть соседей, float16
+            index_version: версия индекса, по которой построен граф
+        """
+        self.ids = ids
+        self.neighbors = neighbors
+        self.scores = scores
+        self.index_version = index_version
+        self._row_by_id: Dict[int, int] = {int(drug_id): row for row, drug_id in enumerate(ids)}
+    
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    @classmethod
+    def build(cls, ids: Sequence[int], embeddings: np.ndarray, k: int = 10,
+              index_version: str = None, block_rows: int = None) -> "SimilarityGraph":
+        """
+        Построение графа блочным умножением матриц: память - блок x количество
+        лекарств, а не полная матрица схожести
+        
+        Args:
+            ids: id лекарств в порядке строк
+            embeddings: матрица эмбеддингов (количество лекарств x размерность)
+            k: соседей на лекарство
+            index_version: версия индекса для проверки актуальности
+            block_rows: строк в блоке (по умолчанию BLOCK_ROWS)
+        """
+        block_rows = block_rows or cls.BLOCK_ROWS
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        count = len(ids)
+        k = max(0, min(k, count - 1))
+        
+        neighbors = np.zeros((count, k), dtype=np.int32)
+        scores = np.zeros((count, k), dtype=np.float16)
+        if k:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.maximum(norms, 1e-12)
+            
+            for start in range(0, count, block_rows):
+                end = min(start + block_rows, count)
+                block_scores = matrix[start:end] @ matrix.T
+                # Лекарство не является соседом самого себя
+                block_scores[np.arange(end - start), np.arange(start, end)] = -np.inf
+                
+                top = np.argpartition(-block_scores, k - 1, axis=1)[:, :k]
+                top_scores = np.take_along_axis(block_scores, top, axis=1)
+                order = np.argsort(-top_scores, axis=1, kind="stable")
+                neighbors[start:end] = np.take_along_axis(top, order, axis=1)
+                scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+        
+        return cls(np.asarray(ids, dtype=np.int64), neighbors, scores, index_version)
+    
+    def neighbors_of(self, drug_id: int, k: int = None) -> List[Tuple[int, float]]:
+        """Соседи лекарства [(id, косинусная схожесть)] по убыванию схожести"""
+        row = self._row_by_id.get(int(drug_id))
+        if row is None:
+            return []
+        k = self.k if k is None else min(k, self.k)
+        return [
+            (int(self.ids[neighbor]), float(score))
+            for neighbor, score in zip(self.neighbors[row, :k], self.scores[row, :k])
+        ]
+    
+    def save(self, path: str):
+        """Сохранение в .npz: id (int64), соседи (int32), схожесть (float16), версия индекса"""
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, ids=self.ids, neighbors=self.neighbors, scores=self.scores,
+                 index_version=np.array(self.index_version or ""))
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "SimilarityGraph":
+        with np.load(path) as data:
+            return cls(data["ids"], data["neighbors"], data["scores"],
+                       str(data["index_version"]) or None)
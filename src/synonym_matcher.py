@@ -0,0 +1,164 @@
+import json
+from collections import deque
+from typing import Dict, Iterator, List, Tuple
+
+# Встроенный словарь (прежние синонимы из кода) - используется, если
+# data/synonyms.json отсутствует или поврежден
+BUILTIN_SYNONYMS: Dict[str, Dict[str, str]] = {
+    "расширения_запросов": {
+        'головная боль': 'мигрень цефалгия',
+        'мигрень': 'головная боль',
+        'боль': 'болевой синдром',
+        'болит': 'боль',
+        'температура': 'лихорадка жар',
+        'лихорадка': 'температура жар',
+        'жар': 'температура лихорадка',
+        'воспаление': 'воспалительный процесс',
+        'артрит': 'суставы артралгия',
+        'аллергия': 'аллергическая реакция зуд сыпь',
+        'зуд': 'аллергия сыпь',
+        'сыпь': 'аллергия зуд крапивница',
+        'крапивница': 'аллергия зуд сыпь',
+        'диарея': 'понос жидкий стул',
+        'тошнота': 'рвота диспепсия',
+        'изжога': 'желудок гастрит'
+    },
+    "синонимы_показаний": {
+        'головная боль': 'мигрень цефалгия головная боль голова',
+        'температура': 'лихорадка жар гипертермия горячка',
+        'воспаление': 'воспалительный процесс противовоспалительное',
+        'артрит': 'артрит суставы суставная боль ревматоидный',
+        'боль': 'болевой синдром болезненность анальгетик обезболивающее',
+        'лихорадка': 'температура жар лихорадка фебрильный',
+        'жаропонижающее': 'жар температура лихорадка противолихорадочное',
+        'обезболивающее': 'боль анальгетик анестезия противоболевое',
+        'противовоспалительное': 'воспаление противовоспалительный антифлогистическое',
+        'аллергия': 'аллергическая реакция зуд сыпь антигистаминное',
+        'кашель': 'кашель бронхит отхаркивающее',
+        'насморк': 'ринит назальный заложенность носа'
+    },
+    "синонимы_категорий": {
+        'анальгетик': 'обезболивающее боль анальгетик анестезия',
+        'противовоспалительное': 'воспаление противовоспалительный артрит',
+        'антибиотик': 'антибиотик инфекция бактерии антибактериальное',
+        'антигистаминное': 'аллергия антигистаминное зуд сыпь',
+        'жаропонижающее': 'температура жар лихорадка жаропонижающее'
+    }
+}
+
+
+class AhoCorasick:
+    def __init__(self, patterns: List[str]):
+        """
+        Автомат Ахо-Корасик: поиск всех вхождений набора подстрок
+        за один проход по тексту, независимо от количества шаблонов
+        
+        Args:
+            patterns: список шаблонов (индекс в списке - номер шаблона)
+        """
+        self.patterns = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[int]] = [[]]
+        
+        for index, pattern in enumerate(self.patterns):
+            if pattern:
+                self._insert(pattern, index)
+        self._build_failure_links()
+    
+    def _insert(self, pattern: str, index: int):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        self._outputs[node].append(index)
+    
+    def _build_failure_links(self):
+        """Суффиксные ссылки обходом в ширину; выходы наследуются по ссылкам"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+    
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Вхождения шаблонов: (позиция конца вхождения, номер шаблона)"""
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for index in self._outputs[node]:
+                yield position, index
+    
+    def matched_indices(self, text: str) -> List[int]:
+        """Номера шаблонов, входящих в текст, в порядке списка шаблонов"""
+        return sorted({index for _, index in self.iter_matches(text)})
+
+
+class SynonymMatcher:
+    def __init__(self, synonyms: Dict[str, str]):
+        """
+        Словарь синонимов "термин -> расширение" со скомпилированным поиском
+        терминов как подстрок текста (семантика `термин in текст`)
+        
+        Args:
+            synonyms: термины в нижнем регистре и их расширения
+        """
+        self.synonyms = dict(synonyms)
+        self._expansions = list(self.synonyms.values())
+        self._automaton = AhoCorasick(list(self.synonyms))
+    
+    def __len__(self) -> int:
+        return len(self.synonyms)
+    
+    def expansions(self, text: str) -> List[str]:
+        """
+        Расширения всех терминов, входящих в текст, в порядке словаря
+        (как при последовательной проверке каждого термина)
+        """
+        return [self._expansions[index] for index in self._automaton.matched_indices(text)]
+
+
+class SynonymDictionary:
+    QUERY_EXPANSIONS = "расширения_запросов"
+    INDICATION_SYNONYMS = "синонимы_показаний"
+    CATEGORY_SYNONYMS = "синонимы_категорий"
+    
+    def __init__(self, data: Dict[str, Dict[str, str]] = None):
+        """
+        Медицинский словарь синонимов (формат data/synonyms.json)
+        
+        Args:
+            data: разделы словаря - расширения запросов, синонимы показаний
+                и ключевые слова категорий
+        """
+        data = data or {}
+        self.query_expansions = SynonymMatcher(data.get(self.QUERY_EXPANSIONS, {}))
+        self.indication_synonyms = SynonymMatcher(data.get(self.INDICATION_SYNONYMS, {}))
+        self.category_synonyms: Dict[str, str] = dict(data.get(self.CATEGORY_SYNONYMS, {}))
+    
+    @classmethod
+    def load(cls, path: str) -> "SynonymDictionary":
+        """Загрузка словаря из JSON; при ошибке - встроенный словарь BUILTIN_SYNONYMS"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            dictionary = cls(data)
+            print(f"Загружен словарь синонимов: {len(dictionary.query_expansions)} расширений запросов, "
+                  f"{len(dictionary.indication_synonyms)} синонимов показаний")
+            return dictionary
+        except Exception as e:
+            print(f"Ошибка загрузки словаря синонимов: {e}; используется встроенный словарь")
+            return cls(BUILTIN_SYNONYMS)
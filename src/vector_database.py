@@ -1,199 +1,769 @@
-import json
-import chromadb 
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional, Set
 import re
-from sentence_transformers import SentenceTransformer
 import os
+import hashlib
+import threading
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.drug_store import DrugStore, SqliteDrugStore
+from src.drug_record import DrugRecord, SearchResult
+from src.drug_loader import iter_drug_records
+from src.lexical_index import LexicalIndex
+from src.name_resolver import NameResolver
+from src.interaction_index import InteractionIndex
+from src.contraindication_index import ContraindicationIndex
+from src.synonym_matcher import SynonymDictionary
+from src.drug_text import DrugTextBuilder
+from src.parallel_build import ParallelIndexBuilder, chunked, encode_chunk
+from src.embedding_cache import QueryEmbeddingCache
+from src.embedding_batcher import EmbeddingBatcher
+from src.embedding_artifact import EmbeddingArtifact
+from src.retrieval_backends import RetrievalBackend, ChromaBackend, create_backend
+from src.similarity_graph import SimilarityGraph
+from src.field_index import FieldVectorIndex
+
+# Режимы поиска MedicalVectorDB.search
+SEARCH_MODES = ("vector", "hybrid")
 
 class MedicalVectorDB:
     def __init__(self, data_path: str = "data/drugs_database.json", 
-                 model_name: str = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'):
+                 model_name: str = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2',
+                 query_cache_size: int = 10000, query_cache_dir: str = None,
+                 backend="chroma", synonyms_path: str = None, record_store_path: str = None,
+                 load_batch_size: int = 1000, similarity_graph_path: str = None,
+                 similarity_graph_k: int = 10, field_index_path: str = None):
         """
         Инициализация векторной базы данных для лекарств
         Используем multilingual модель которая лучше понимает русский
-        """
-        print(f"Загрузка модели: {model_name}")
-        try:
-            self.model = SentenceTransformer(model_name)
-            print("Мультиязычная модель успешно загружена")
-        except Exception as e:
-            print(f"Ошибка загрузки модели: {e}")
-            raise
         
-        self.client = chromadb.PersistentClient(path="./chroma_db")
-        self.collection = self.client.get_or_create_collection(
-            name="medical_drugs",
-            metadata={"description": "Medical drugs database"}
+        Args:
+            data_path: путь к JSON (или JSON Lines, .jsonl) файлу с лекарствами
+            model_name: модель SentenceTransformer
+            query_cache_size: размер LRU-кеша эмбеддингов запросов
+            query_cache_dir: каталог для сохранения кеша эмбеддингов между запусками
+            backend: хранилище векторов - "chroma", "numpy" или экземпляр RetrievalBackend
+                (артефакт эмбеддингов NumPy - numpy_index.emb рядом с data_path)
+            synonyms_path: словарь синонимов (по умолчанию synonyms.json рядом с data_path)
+            record_store_path: файл SQLite для записей лекарств; если задан, данные
+                читаются потоково и хранятся на диске, а не в памяти процесса
+            load_batch_size: записей в одном пакете потоковой загрузки
+            similarity_graph_path: файл .npz графа похожих лекарств (по умолчанию
+                similarity_graph.npz рядом с data_path, "" - не сохранять); граф
+                загружается из него, если построен по текущей версии индекса,
+                иначе перестраивается и сохраняется
+            similarity_graph_k: соседей на лекарство в графе похожих лекарств
+            field_index_path: файл .npz многовекторного индекса полей (поиск
+                по показаниям, противопоказаниям; по умолчанию field_index.npz
+                рядом с data_path, "" - не сохранять); перестраивается при смене
+                версии индекса с повторным использованием неизменных векторов
+        """
+        self.model_name = model_name
+        # Модель (torch/transformers) загружается при первом обращении,
+        # хранилище тоже открывается лениво
+        self._model = None
+        self._init_lock = threading.Lock()
+        # Отдельная блокировка: построение индекса полей загружает модель под _init_lock
+        self._field_index_lock = threading.Lock()
+        self.backend: RetrievalBackend = create_backend(
+            backend, model_name, os.path.join(os.path.dirname(data_path), "numpy_index.emb")
         )
+        
+        self.index_version = None
+        self.similarity_graph = None
+        self.similarity_graph_path = (os.path.join(os.path.dirname(data_path), "similarity_graph.npz")
+                                      if similarity_graph_path is None else similarity_graph_path)
+        self.similarity_graph_k = similarity_graph_k
+        self.field_index = None
+        self.field_index_path = (os.path.join(os.path.dirname(data_path), "field_index.npz")
+                                 if field_index_path is None else field_index_path)
+        self.query_encoder = self
+        self.query_cache = QueryEmbeddingCache(model_name, query_cache_size, query_cache_dir)
         self.data_path = data_path
+        self.record_store_path = record_store_path
+        self.load_batch_size = load_batch_size
+        self.synonyms = SynonymDictionary.load(
+            synonyms_path or os.path.join(os.path.dirname(data_path), "synonyms.json")
+        )
+        self.text_builder = DrugTextBuilder(model_name, self.synonyms)
         self.drugs_data = self._load_data()
     
+    @property
+    def model(self):
+        """SentenceTransformer, загружается при первом обращении"""
+        if self._model is None:
+            with self._init_lock:
+                if self._model is None:
+                    print(f"Загрузка модели: {self.model_name}")
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                        self._model = SentenceTransformer(self.model_name)
+                        print("Мультиязычная модель успешно загружена")
+                    except Exception as e:
+                        print(f"Ошибка загрузки модели: {e}")
+                        raise
+        return self._model
+    
+    @property
+    def client(self):
+        """Клиент Chroma (только для хранилища Chroma)"""
+        return self._chroma_backend().client
+    
+    @property
+    def collection(self):
+        """Коллекция лекарств в Chroma (только для хранилища Chroma)"""
+        return self._chroma_backend().collection
+    
+    def _chroma_backend(self) -> ChromaBackend:
+        if not isinstance(self.backend, ChromaBackend):
+            raise AttributeError(f"Хранилище '{self.backend.name}' не использует Chroma")
+        return self.backend
+    
+    def encode(self, texts: List[str], normalize_embeddings: bool = True) -> np.ndarray:
+        """Кодирование текстов моделью (модель загружается при первом вызове)"""
+        return self.model.encode(texts, normalize_embeddings=normalize_embeddings)
+    
+    def warmup(self):
+        """Заблаговременная загрузка модели и хранилища (для серверов)"""
+        self.backend.warmup()
+        self.encode(["прогрев"])
+        self.get_similarity_graph()
+        self.get_field_index()
+    
     def _load_data(self) -> List[Dict]:
-        """Загрузка данных о лекарствах из JSON файла"""
+        """Загрузка данных о лекарствах из JSON файла и построение индексов"""
+        if self.record_store_path:
+            return self._load_into_record_store()
+        
         try:
-            with open(self.data_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            print(f"Загружено {len(data['лекарства'])} лекарств")
-            return data['лекарства']
+            # Записи читаются потоково и сразу сжимаются в DrugRecord - исходные
+            # словари всего файла одновременно в памяти не держатся
+            drugs = [DrugRecord.from_dict(record) for record in iter_drug_records(self.data_path)]
+            print(f"Загружено {len(drugs)} лекарств")
+            self._build_indexes(drugs)
+            return drugs
         except Exception as e:
             print(f"Ошибка загрузки данных: {e}")
+            self._build_indexes([])
             return []
-
-    def _create_semantic_drug_text(self, drug: Dict) -> str:
-        # Создаем синонимы и ключевые слова
-        keyword_mapping = {
-            'головная боль': 'мигрень цефалгия головная боль голова',
-            'температура': 'лихорадка жар гипертермия горячка',
-            'воспаление': 'воспалительный процесс противовоспалительное',
-            'артрит': 'артрит суставы суставная боль ревматоидный',
-            'боль': 'болевой синдром болезненность анальгетик обезболивающее',
-            'лихорадка': 'температура жар лихорадка фебрильный',
-            'жаропонижающее': 'жар температура лихорадка противолихорадочное',
-            'обезболивающее': 'боль анальгетик анестезия противоболевое',
-            'противовоспалительное': 'воспаление противовоспалительный антифлогистическое',
-            'аллергия': 'аллергическая реакция зуд сыпь антигистаминное',
-            'кашель': 'кашель бронхит отхаркивающее',
-            'насморк': 'ринит назальный заложенность носа'
-        }
-        # Расширяем показания синонимами
-        enhanced_indications = []
-        for indication in drug['показания']:
-            enhanced = indication
-            for keyword, synonyms in keyword_mapping.items():
-                if keyword in indication.lower():
-                    enhanced += " " + synonyms
-            enhanced_indications.append(enhanced)
-        
-        # Создаем категориальные ключевые слова
-        category_keywords = {
-            'анальгетик': 'обезболивающее боль анальгетик анестезия',
-            'противовоспалительное': 'воспаление противовоспалительный артрит',
-            'антибиотик': 'антибиотик инфекция бактерии антибактериальное',
-            'антигистаминное': 'аллергия антигистаминное зуд сыпь',
-            'жаропонижающее': 'температура жар лихорадка жаропонижающее'
-        }
+    
+    def _load_into_record_store(self) -> SqliteDrugStore:
+        """
+        Потоковая загрузка лекарств пакетами в хранилище записей на диске.
+        Повторная загрузка выполняется только при изменении исходного файла;
+        в памяти остаются лексический индекс и индекс названий.
         
-        category_synonyms = category_keywords.get(drug.get('категория', ''), '')
-        # Собираем полный текст
-        text_parts = [
-            f"Лекарство: {drug['название']}",
-            f"Действие: {drug['описание']}",
-            f"Лечит: {', '.join(enhanced_indications)}", 
-            f"Симптомы: {', '.join(drug['показания'])}",
-            f"Категория: {drug.get('категория', '')} {category_synonyms}",
-            f"Применение: {drug['дозировка']}",
-            f"Ограничения: {', '.join(drug['противопоказания'])}",
-            f"Побочные: {', '.join(drug['побочные_эффекты'])}"
-        ]
+        Returns:
+            хранилище записей (итерируемое, с len) вместо списка лекарств
+        """
+        try:
+            store = SqliteDrugStore(self.record_store_path)
+            stat = os.stat(self.data_path)
+            source = f"{os.path.abspath(self.data_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+            
+            if store.get_meta("источник") != source:
+                print(f"Потоковая загрузка {self.data_path} в {self.record_store_path}...")
+                store.clear()
+                for chunk in chunked(iter_drug_records(self.data_path), self.load_batch_size):
+                    store.add_many(chunk)
+                store.set_meta("источник", source)
+            
+            self._build_indexes(store, store)
+            
+            print(f"Загружено {len(store)} лекарств (хранилище записей: {self.record_store_path})")
+            return store
+        except Exception as e:
+            print(f"Ошибка загрузки данных: {e}")
+            self._build_indexes([])
+            return []
+    
+    def _build_indexes(self, drugs: Iterable[Dict], store=None):
+        """
+        Хранилище записей и индексы в памяти за один проход по лекарствам
         
-        return ". ".join(text_parts)
+        Args:
+            drugs: записи лекарств
+            store: готовое хранилище записей (по умолчанию DrugStore из drugs)
+        """
+        # Индекс названий один: DrugStore в памяти заполняет его сам
+        self.name_resolver = NameResolver()
+        self.drug_store = DrugStore(names=self.name_resolver) if store is None else store
+        self.lexical_index = LexicalIndex()
+        self.interaction_index = InteractionIndex()
+        self.contraindication_index = ContraindicationIndex()
+        
+        for drug in drugs:
+            if store is None:
+                self.drug_store.add(drug)
+            else:
+                self.name_resolver.add(drug['id'], drug['название'])
+            self.lexical_index.add(drug)
+            self.interaction_index.add(drug)
+            self.contraindication_index.add(drug)
+        self.interaction_index.rebuild()
+
+    def _create_semantic_drug_text(self, drug: Dict) -> str:
+        return self.text_builder.semantic_text(drug)
+
+    def _fingerprint(self, drug_text: str) -> str:
+        """Отпечаток семантического текста лекарства вместе с именем модели"""
+        return self.text_builder.fingerprint(drug_text)
 
-    def build_vector_database(self):
-        """Пересоздание векторной базы с улучшенными текстами"""
+    def _update_index_version(self, fingerprints: Dict[str, str]):
+        """Версия индекса - хеш всех отпечатков, меняется при любом изменении данных"""
+        digest = hashlib.sha256()
+        for record_id in sorted(fingerprints):
+            digest.update(f"{record_id}:{fingerprints[record_id]}\n".encode('utf-8'))
+        self.index_version = digest.hexdigest()
+    
+    def _prepare_drug_entry(self, drug: Dict):
+        """Документ, метаданные и идентификатор записи лекарства для коллекции"""
+        return self.text_builder.prepare_entry(drug)
+
+    def build_vector_database(self, incremental: bool = False, workers: int = 1,
+                              batch_size: int = 256):
+        """Пересоздание векторной базы с улучшенными текстами
+
+        Args:
+            incremental: пересчитать эмбеддинги только для добавленных и
+                измененных лекарств и удалить отсутствующие вместо полного
+                пересоздания коллекции
+            workers: количество процессов для построения текстов и кодирования
+                (1 - в текущем процессе)
+            batch_size: лекарств в одном пакете; пакеты записываются в хранилище
+                по мере готовности, без накопления всей базы в памяти
+        """
         if not self.drugs_data:
             print("Нет данных для создания базы")
             return
-                
-        documents = []
-        metadatas = []
-        ids = []
         
-        for drug in self.drugs_data:
-            drug_text = self._create_semantic_drug_text(drug)
-            documents.append(drug_text)
-            
-            metadata = {
-                "название": drug["название"],
-                "категория": drug.get("категория", "не указана"),
-                "показания": ", ".join(drug["показания"][:3]),
-                "id": str(drug["id"])
-            }
-            metadatas.append(metadata)
-            ids.append(f"drug_{drug['id']}")
-        
-        print("Генерация эмбеддингов...")
-        embeddings = self.model.encode(documents, normalize_embeddings=True)
+        if incremental:
+            self._update_vector_database(workers=workers, batch_size=batch_size)
+            return
         
-        try:
-            self.client.delete_collection("medical_drugs")
-        except:
-            pass
+        print(f"Генерация эмбеддингов (процессов: {workers}, пакет: {batch_size})...")
+        self.backend.reset()
+        
+        fingerprints = {}
+        for ids, documents, metadatas, embeddings in self._iter_encoded_chunks(self.drugs_data,
+                                                                               workers, batch_size):
+            self.backend.upsert(ids, embeddings, documents, metadatas)
+            fingerprints.update((drug_id, metadata["отпечаток"]) for drug_id, metadata in zip(ids, metadatas))
+        
+        self.backend.flush()
+        
+        self._update_index_version(fingerprints)
+        print(f"Векторная база пересоздана! Добавлено {len(fingerprints)} записей")
+
+    def _iter_encoded_chunks(self, drugs, workers: int, batch_size: int):
+        """Закодированные пакеты лекарств: в пуле процессов или в текущем процессе"""
+        if workers > 1:
+            yield from ParallelIndexBuilder(self.text_builder, workers, batch_size).iter_encoded(drugs)
+            return
+        
+        for chunk in chunked(drugs, batch_size):
+            yield encode_chunk(chunk, self.text_builder, self)
+
+    def _update_vector_database(self, artifact: EmbeddingArtifact = None, workers: int = 1,
+                                batch_size: int = 256):
+        """
+        Инкрементальное обновление коллекции по отпечаткам текстов
+        
+        Args:
+            artifact: готовые эмбеддинги; для лекарств с совпадающим отпечатком
+                они используются вместо повторного кодирования
+            workers: количество процессов для кодирования измененных лекарств
+                (1 - в текущем процессе)
+            batch_size: измененные записи кодируются и записываются пакетами
+        """
+        stored_fingerprints = self.backend.get_fingerprints()
+        current_fingerprints = {}
+        reused = []
+        
+        def changed_drugs():
+            # Отпечатки считаются здесь, кодируются только измененные лекарства
+            # без готового эмбеддинга в артефакте
+            for drug in self.drugs_data:
+                drug_id, drug_text, metadata = self._prepare_drug_entry(drug)
+                current_fingerprints[drug_id] = metadata["отпечаток"]
+                if stored_fingerprints.get(drug_id) == metadata["отпечаток"]:
+                    continue
+                embedding = artifact.get(drug_id, metadata["отпечаток"]) if artifact else None
+                if embedding is None:
+                    yield drug
+                    continue
+                reused.append((drug_id, drug_text, metadata, embedding))
+                if len(reused) >= batch_size:
+                    self._upsert_entries(reused)
+                    reused.clear()
+        
+        for ids, documents, metadatas, embeddings in self._iter_encoded_chunks(changed_drugs(),
+                                                                               workers, batch_size):
+            print(f"Сгенерированы эмбеддинги для {len(ids)} измененных записей")
+            self.backend.upsert(ids, embeddings, documents, metadatas)
+        
+        if reused:
+            self._upsert_entries(reused)
+        changed = sum(1 for drug_id, fingerprint in current_fingerprints.items()
+                      if stored_fingerprints.get(drug_id) != fingerprint)
+        
+        removed_ids = [drug_id for drug_id in stored_fingerprints if drug_id not in current_fingerprints]
+        if removed_ids:
+            self.backend.delete(removed_ids)
+        self.backend.flush()
+        
+        self._update_index_version(current_fingerprints)
+        unchanged = len(current_fingerprints) - changed
+        print(f"Векторная база обновлена: добавлено/изменено {changed}, "
+              f"удалено {len(removed_ids)}, без изменений {unchanged}")
+    
+    def _upsert_entries(self, entries):
+        """Запись пакета (id, документ, метаданные, готовый эмбеддинг) без кодирования"""
+        ids = [drug_id for drug_id, _, _, _ in entries]
+        documents = [drug_text for _, drug_text, _, _ in entries]
+        metadatas = [metadata for _, _, metadata, _ in entries]
+        embeddings = np.asarray([embedding for _, _, _, embedding in entries], dtype=np.float32)
+        self.backend.upsert(ids, embeddings, documents, metadatas)
+    
+    def export_embeddings(self, path: str, dtype: str = "float32"):
+        """
+        Экспорт эмбеддингов лекарств из хранилища в артефакт для memory map
+        
+        Args:
+            path: файл артефакта
+            dtype: float32 или float16
+        """
+        ids, fingerprints, categories, embeddings = self.backend.get_embeddings()
+        if not ids:
+            print("Хранилище пусто, экспортировать нечего")
+            return
+        
+        EmbeddingArtifact.save(path, self.model_name, ids, fingerprints, embeddings,
+                               dtype=dtype, categories=categories)
+        print(f"Экспортировано {len(ids)} эмбеддингов ({dtype}) в {path}")
+    
+    def import_embeddings(self, path: str) -> bool:
+        """
+        Наполнение хранилища из артефакта эмбеддингов без повторного кодирования
+        (кодируются только лекарства, текст которых изменился после экспорта)
+        
+        Returns:
+            True, если артефакт подходит для текущей модели
+        """
+        artifact = EmbeddingArtifact.load(path)
+        if artifact.model_name != self.model_name:
+            print(f"Артефакт построен моделью {artifact.model_name}, ожидалась {self.model_name}")
+            return False
+        
+        self._update_vector_database(artifact)
+        return True
+    
+    def build_similarity_graph(self, k: int = None, path: str = None) -> SimilarityGraph:
+        """
+        Построение графа k ближайших соседей по эмбеддингам из хранилища
+        
+        Args:
+            k: соседей на лекарство (по умолчанию similarity_graph_k)
+            path: файл для сохранения графа
+        """
+        ids, _, _, embeddings = self.backend.get_embeddings()
+        graph = SimilarityGraph.build(ids, embeddings, k or self.similarity_graph_k,
+                                      index_version=self.index_version)
+        if path:
+            graph.save(path)
+        self.similarity_graph = graph
+        print(f"Граф похожих лекарств построен: {len(graph)} лекарств, {graph.k} соседей")
+        return graph
+    
+    def get_similarity_graph(self) -> SimilarityGraph:
+        """Граф похожих лекарств для текущей версии индекса: из памяти, файла или построенный заново"""
+        graph = self.similarity_graph
+        if graph is not None and graph.index_version == self.index_version:
+            return graph
+        
+        with self._init_lock:
+            graph = self.similarity_graph
+            if graph is not None and graph.index_version == self.index_version:
+                return graph
             
-        self.collection = self.client.get_or_create_collection(
-            name="medical_drugs",
-            metadata={"description": "Medical drugs database"}
-        )
+            path = self.similarity_graph_path
+            if path and os.path.exists(path):
+                try:
+                    graph = SimilarityGraph.load(path)
+                    if graph.index_version == self.index_version:
+                        self.similarity_graph = graph
+                        return graph
+                    print("Граф похожих лекарств построен по другой версии индекса, перестраиваем")
+                except Exception as e:
+                    print(f"Ошибка загрузки графа похожих лекарств: {e}")
+            
+            return self.build_similarity_graph(path=path)
+    
+    def prepare_similarity_graph(self) -> bool:
+        """
+        Загрузка или построение графа похожих лекарств сразу после индекса,
+        чтобы первый поиск не строил его синхронно; ошибка не прерывает запуск
+        """
+        try:
+            self.get_similarity_graph()
+            return True
+        except Exception as e:
+            print(f"Ошибка построения графа похожих лекарств: {e}")
+            return False
+    
+    def build_field_index(self, path: str = None, batch_size: int = 256) -> FieldVectorIndex:
+        """
+        Построение многовекторного индекса полей; векторы текстов, не
+        изменившихся с прошлого построения, переиспользуются
         
-        self.collection.add(
-            embeddings=embeddings.tolist(),
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+        Args:
+            path: файл для сохранения индекса
+            batch_size: лекарств в одном пакете кодирования
+        """
+        index = FieldVectorIndex.build(self.drugs_data, self.text_builder.field_texts, self.encode,
+                                       batch_size, index_version=self.index_version,
+                                       previous=self.field_index)
+        if path:
+            index.save(path)
+        self.field_index = index
+        print(f"Индекс полей построен: {len(index)} векторов")
+        return index
+    
+    def get_field_index(self) -> FieldVectorIndex:
+        """Индекс полей для текущей версии индекса: из памяти, файла или построенный заново"""
+        index = self.field_index
+        if index is not None and index.index_version == self.index_version:
+            return index
+        
+        # Одновременные первые запросы ждут одного построения, а не кодируют базу каждый
+        with self._field_index_lock:
+            index = self.field_index
+            if index is not None and index.index_version == self.index_version:
+                return index
+            
+            path = self.field_index_path
+            if path and os.path.exists(path):
+                try:
+                    loaded = FieldVectorIndex.load(path)
+                    if loaded.index_version == self.index_version:
+                        self.field_index = loaded
+                        return loaded
+                    # Устаревший индекс служит источником неизменных векторов
+                    if self.field_index is None:
+                        self.field_index = loaded
+                except Exception as e:
+                    print(f"Ошибка загрузки индекса полей: {e}")
+            
+            return self.build_field_index(path=path)
+    
+    def prepare_field_index(self) -> bool:
+        """
+        Загрузка или построение индекса полей при запуске, чтобы первый поиск
+        по симптомам не кодировал всю базу; ошибка не прерывает запуск
+        """
+        try:
+            self.get_field_index()
+            return True
+        except Exception as e:
+            print(f"Ошибка построения индекса полей: {e}")
+            return False
+    
+    def similar_drugs(self, drug_id: int, k: int = 5) -> List[SearchResult]:
+        """
+        Похожие лекарства из графа соседей, без кодирования запроса и поиска
         
-        print(f"Векторная база пересоздана! Добавлено {len(documents)} записей")
+        Args:
+            drug_id: id лекарства
+            k: количество лекарств (не больше similarity_graph_k)
+        """
+        neighbors = self.get_similarity_graph().neighbors_of(drug_id, k)
+        # Схожесть переводится в расстояние хранилища, как у результатов поиска
+        return self._format_results([(neighbor_id, 2.0 - 2.0 * score) for neighbor_id, score in neighbors])
     
-    def search_drugs(self, query: str, n_results: int = 5, category_filter: str = None):
+    def search_drugs(self, query: str, n_results: int = 5, category_filter: str = None,
+                     exclude_contraindications: Iterable[str] = None, fields: Iterable[str] = None):
         """
         Улучшенный поиск с расширением запроса
+        
+        Args:
+            exclude_contraindications: состояния пользователя ("язва",
+                "беременность"); противопоказанные при них лекарства
+                исключаются до ранжирования
+            fields: искать по векторам отдельных полей (SYMPTOM_FIELDS,
+                SAFETY_FIELDS из field_index) вместо общего вектора лекарства
         """
         expanded_query = self._expand_search_query(query)
         print(f"Расширенный запрос: '{query}' -> '{expanded_query}'")
         
-        where_filter = {"категория": category_filter} if category_filter else None
-        
         try:
-            query_embedding = self.model.encode([expanded_query], normalize_embeddings=True)[0].tolist()
-            
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                where=where_filter
-            )
+            query_embeddings = self._encode_queries([expanded_query])
+            hits = self._query_vectors(query_embeddings, n_results, category_filter,
+                                       self.excluded_ids(exclude_contraindications), fields)
             
-            return self._format_results(results)
+            return self._format_results(hits[0])
             
         except Exception as e:
             print(f"Ошибка поиска: {e}")
             return []
     
-    def _expand_search_query(self, query: str) -> str:
-        """Улучшенное расширение поискового запроса без дублирования"""
-        query_expansions = {
-            'головная боль': 'мигрень цефалгия',
-            'мигрень': 'головная боль',
-            'боль': 'болевой синдром',
-            'болит': 'боль',
-            
-            'температура': 'лихорадка жар',
-            'лихорадка': 'температура жар',
-            'жар': 'температура лихорадка',
-            
-            'воспаление': 'воспалительный процесс',
-            'артрит': 'суставы артралгия',
-            
-            'аллергия': 'аллергическая реакция зуд сыпь',
-            'зуд': 'аллергия сыпь',
-            'сыпь': 'аллергия зуд крапивница',
-            'крапивница': 'аллергия зуд сыпь',
+    def search_drugs_batch(self, queries: List[str], n_results: int = 5,
+                           category_filter: str = None, batch_size: int = 1000,
+                           exclude_contraindications: Iterable[str] = None,
+                           fields: Iterable[str] = None) -> List[List[Dict]]:
+        """
+        Пакетный поиск: все запросы кодируются одним вызовом модели
+        и отправляются в хранилище одним запросом с несколькими эмбеддингами
+        
+        Args:
+            queries: список поисковых запросов
+            n_results: количество результатов на каждый запрос
+            category_filter: фильтр по категории для всех запросов
+            batch_size: максимальное число запросов в одном обращении к модели и хранилищу
+            exclude_contraindications: состояния, противопоказанные лекарства
+                при которых исключаются из результатов всех запросов
+            fields: искать по векторам отдельных полей (см. search_drugs)
+        
+        Returns:
+            список отформатированных результатов в порядке запросов
+        """
+        all_results = []
+        excluded_ids = self.excluded_ids(exclude_contraindications)
+        
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            expanded_queries = [self._expand_search_query(query) for query in batch]
             
-            'диарея': 'понос жидкий стул',
-            'тошнота': 'рвота диспепсия',
-            'изжога': 'желудок гастрит',
+            try:
+                query_embeddings = self._encode_queries(expanded_queries)
+                
+                hits = self._query_vectors(query_embeddings, n_results, category_filter,
+                                           excluded_ids, fields)
+                
+                all_results.extend(self._format_results(query_hits) for query_hits in hits)
+                
+            except Exception as e:
+                print(f"Ошибка пакетного поиска: {e}")
+                all_results.extend([] for _ in batch)
+        
+        return all_results
+    
+    def excluded_ids(self, conditions: Iterable[str] = None) -> Set[int]:
+        """id лекарств, противопоказанных при состояниях пользователя"""
+        if not conditions:
+            return set()
+        return self.contraindication_index.excluded_ids(conditions)
+    
+    def unmatched_conditions(self, conditions: Iterable[str] = None) -> List[str]:
+        """Состояния пользователя, не совпавшие ни с одним противопоказанием"""
+        if not conditions:
+            return []
+        return self.contraindication_index.match(conditions)[1]
+    
+    def _query_vectors(self, query_embeddings: np.ndarray, n_results: int,
+                       category_filter: str = None, excluded_ids: Set[int] = None,
+                       fields: Iterable[str] = None):
+        """Запрос к общему вектору лекарств или, если заданы поля, к индексу полей (max-sim)"""
+        if fields:
+            return self.get_field_index().query(query_embeddings, n_results, list(fields),
+                                                category_filter, excluded_ids)
+        return self._query_backend(query_embeddings, n_results, category_filter, excluded_ids)
+    
+    def _query_backend(self, query_embeddings: np.ndarray, n_results: int,
+                       category_filter: str = None, excluded_ids: Set[int] = None):
+        """
+        Запрос к хранилищу с исключением лекарств: маской до ранжирования,
+        если хранилище это поддерживает, иначе запросом с запасом на число
+        исключенных (после фильтрации результатов остается n_results)
+        """
+        if not excluded_ids:
+            return self.backend.query(query_embeddings, n_results, category_filter)
+        
+        if self.backend.supports_exclusion:
+            return self.backend.query(query_embeddings, n_results, category_filter,
+                                      exclude_ids=excluded_ids)
+        
+        oversampled = min(n_results + len(excluded_ids), max(len(self.drug_store), n_results))
+        hits = self.backend.query(query_embeddings, oversampled, category_filter)
+        return [
+            [hit for hit in query_hits if hit[0] not in excluded_ids][:n_results]
+            for query_hits in hits
+        ]
+    
+    def hybrid_search(self, query: str, n_results: int = 5, category_filter: str = None,
+                      vector_weight: float = 0.6,
+                      exclude_contraindications: Iterable[str] = None) -> List[Dict]:
+        """
+        Гибридный поиск: BM25 по полям лекарств вместе с векторным поиском
+        
+        Запрос, совпадающий с названием лекарства, обслуживается лексическим
+        индексом без кодирования моделью.
+        
+        Args:
+            query: поисковый запрос
+            n_results: количество результатов
+            category_filter: фильтр по категории
+            vector_weight: доля векторной оценки в итоговой (остальное - BM25)
+            exclude_contraindications: состояния, противопоказанные лекарства
+                при которых исключаются до ранжирования
+        """
+        allowed_ids = set(self.drug_store.ids_for_category(category_filter)) if category_filter else None
+        excluded_ids = self.excluded_ids(exclude_contraindications)
+        
+        exact_id = self.name_resolver.resolve_exact(query)
+        if (exact_id is not None and exact_id not in excluded_ids
+                and (allowed_ids is None or exact_id in allowed_ids)):
+            return self._format_results([(exact_id, 0.0)])
+        
+        candidates = max(n_results * 3, 10)
+        lexical_hits = self.lexical_index.search(query, candidates + len(excluded_ids), allowed_ids)
+        lexical_hits = [hit for hit in lexical_hits if hit[0] not in excluded_ids][:candidates]
+        
+        try:
+            query_embeddings = self._encode_queries([self._expand_search_query(query)])
+            vector_hits = self._query_backend(query_embeddings, candidates, category_filter,
+                                              excluded_ids)[0]
+        except Exception as e:
+            print(f"Ошибка векторного поиска, используется только BM25: {e}")
+            vector_hits = []
+        
+        fused_hits = self._fuse_scores(lexical_hits, vector_hits, vector_weight)
+        return self._format_results(fused_hits[:n_results])
+    
+    def search(self, query: str, n_results: int = 5, mode: str = "vector",
+               category_filter: str = None, exclude_contraindications: Iterable[str] = None,
+               fields: Iterable[str] = None) -> List[Dict]:
+        """
+        Поиск в выбранном режиме (SEARCH_MODES)
+        
+        Args:
+            mode: "vector" - search_drugs, "hybrid" - hybrid_search (BM25
+                вместе с векторным поиском; не сочетается с fields)
+        """
+        if mode == "hybrid":
+            if fields:
+                raise ValueError("Гибридный поиск не поддерживает поиск по полям")
+            return self.hybrid_search(query, n_results, category_filter,
+                                      exclude_contraindications=exclude_contraindications)
+        if mode != "vector":
+            raise ValueError(f"Неизвестный режим поиска: {mode}")
+        return self.search_drugs(query, n_results, category_filter,
+                                 exclude_contraindications=exclude_contraindications, fields=fields)
+    
+    def resolve_drug(self, name: str) -> Optional[Dict]:
+        """Запись лекарства по названию (см. resolve_drugs)"""
+        return self.resolve_drugs([name])[0]
+    
+    def resolve_drugs(self, names: List[str]) -> List[Optional[Dict]]:
+        """
+        Разрешение названий лекарств: точное совпадение, затем исправление
+        опечаток по триграммам; семантический поиск одним пакетом выполняется
+        только для названий, не найденных в индексе
+        
+        Returns:
+            записи лекарств в порядке названий (None, если ничего не найдено)
+        """
+        drug_ids = self.name_resolver.resolve_many(names)
+        drugs = [self.drug_store.get(drug_id) if drug_id is not None else None for drug_id in drug_ids]
+        
+        unresolved = [i for i, drug in enumerate(drugs) if drug is None]
+        if unresolved:
+            semantic_results = self.search_drugs_batch([names[i] for i in unresolved], n_results=1)
+            for i, results in zip(unresolved, semantic_results):
+                if results:
+                    drugs[i] = results[0]['полные_данные']
+        
+        return drugs
+    
+    def check_interactions(self, names: List[str]) -> Dict:
+        """
+        Проверка взаимодействий между лекарствами списка по индексу
+        взаимодействий, без модели и LLM
+        
+        Returns:
+            {"лекарства": [найденные названия], "не_найдены": [запрошенные названия],
+             "взаимодействия": [пары с описанием], "предупреждения": [общие предупреждения]}
+        """
+        drugs = []
+        seen_ids = set()
+        missing = []
+        # Только индекс названий (с исправлением опечаток): семантический поиск
+        # мог бы подставить другое лекарство вместо неизвестного
+        for name, drug_id in zip(names, self.name_resolver.resolve_many(names)):
+            drug = self.drug_store.get(drug_id) if drug_id is not None else None
+            if not drug:
+                missing.append(name)
+            elif drug_id not in seen_ids:
+                seen_ids.add(drug_id)
+                drugs.append(drug)
+        
+        interactions, warnings = self.interaction_index.check(drugs)
+        return {
+            "лекарства": [drug['название'] for drug in drugs],
+            "не_найдены": missing,
+            "взаимодействия": interactions,
+            "предупреждения": warnings
         }
+    
+    @staticmethod
+    def _fuse_scores(lexical_hits, vector_hits, vector_weight: float):
+        """
+        Взвешенное слияние оценок: BM25 нормируется на лучший результат,
+        векторная часть - схожесть 1 - расстояние. Возвращает список
+        (id лекарства, 1 - итоговая оценка) в формате hits хранилища.
+        """
+        fused = {}
+        if lexical_hits:
+            best_score = lexical_hits[0][1]
+            for drug_id, score in lexical_hits:
+                fused[drug_id] = (1.0 - vector_weight) * score / best_score
         
+        for drug_id, distance in vector_hits:
+            fused[drug_id] = fused.get(drug_id, 0.0) + vector_weight * max(0.0, 1.0 - distance)
+        
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+        return [(drug_id, 1.0 - score) for drug_id, score in ranked]
+    
+    def _encode_queries(self, expanded_queries: List[str]) -> np.ndarray:
+        """Кодирование расширенных запросов с использованием кеша эмбеддингов"""
+        embeddings = [self.query_cache.get(query) for query in expanded_queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        
+        if missing:
+            # Уникальные промахи кодируются одним пакетом
+            unique_queries = list(dict.fromkeys(expanded_queries[i] for i in missing))
+            encoded = self.query_encoder.encode(unique_queries, normalize_embeddings=True)
+            by_query = dict(zip(unique_queries, encoded))
+            for query, embedding in by_query.items():
+                self.query_cache.put(query, embedding)
+            for i in missing:
+                embeddings[i] = by_query[expanded_queries[i]]
+        
+        return np.asarray(embeddings, dtype=np.float32)
+    
+    def enable_query_batching(self, max_batch_size: int = 64, max_wait: float = 0.005):
+        """
+        Объединять кодирование запросов из разных потоков в общие пакеты
+        (для многопоточного сервера с одной общей моделью)
+        """
+        if isinstance(self.query_encoder, EmbeddingBatcher):
+            self.query_encoder.close()
+        self.query_encoder = EmbeddingBatcher(self, max_batch_size, max_wait)
+    
+    def _expand_search_query(self, query: str) -> str:
+        """Улучшенное расширение поискового запроса без дублирования"""
         original_query = query.lower().strip()
-        expanded_terms = set(original_query.split())
+        # Порядок терминов детерминирован, чтобы одинаковые запросы
+        # давали одинаковый расширенный текст (ключ кеша эмбеддингов)
+        expanded_terms = list(dict.fromkeys(original_query.split()))
         
-        for term, expansion in query_expansions.items():
-            if term in original_query:
-                new_terms = expansion.split()
-                for new_term in new_terms:
-                    if new_term not in expanded_terms:
-                        expanded_terms.add(new_term)
+        # Все термины словаря находятся одним проходом автомата по запросу
+        for expansion in self.synonyms.query_expansions.expansions(original_query):
+            for new_term in expansion.split():
+                if new_term not in expanded_terms:
+                    expanded_terms.append(new_term)
         
-        final_terms = list(expanded_terms)
+        final_terms = expanded_terms
         if len(final_terms) > 8:
             original_terms = original_query.split()
             final_terms = original_terms + [t for t in final_terms if t not in original_terms][:8-len(original_terms)]
@@ -205,33 +775,17 @@ class MedicalVectorDB:
         
         return expanded_query
     
-    def _format_results(self, results) -> List[Dict]:
-        """Форматирование результатов поиска"""
+    def _format_results(self, hits) -> List[SearchResult]:
+        """Форматирование результатов поиска: hits - список (id лекарства, расстояние)"""
         formatted_results = []
         
-        if results['documents']:
-            for i, (doc, metadata, distance) in enumerate(zip(
-                results['documents'][0],
-                results['metadatas'][0],
-                results['distances'][0]
-            )):
-                drug_id = int(metadata['id'])
-                full_drug_data = next((drug for drug in self.drugs_data if drug['id'] == drug_id), None)
-                
-                if full_drug_data:
-                    similarity = max(0.0, 1.0 - distance)
-                    
-                    result = {
-                        "рейтинг": i + 1,
-                        "схожесть": f"{similarity:.3f}",
-                        "лекарство": full_drug_data["название"],
-                        "описание": full_drug_data["описание"],
-                        "показания": full_drug_data["показания"],
-                        "дозировка": full_drug_data["дозировка"],
-                        "противопоказания": full_drug_data["противопоказания"][:3],
-                        "полные_данные": full_drug_data
-                    }
-                    formatted_results.append(result)
+        for i, (drug_id, distance) in enumerate(hits):
+            full_drug_data = self.drug_store.get(drug_id)
+            
+            if full_drug_data:
+                similarity = max(0.0, 1.0 - distance)
+                # Результат ссылается на запись, поля не копируются
+                formatted_results.append(SearchResult(i + 1, similarity, full_drug_data))
         
         formatted_results.sort(key=lambda x: float(x['схожесть']), reverse=True)
         return formatted_results
@@ -0,0 +1,197 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import src.async_drug_search as async_drug_search
+from src.async_drug_search import AsyncAdvancedDrugSearch, AsyncLocalLLMClient
+
+DRUGS = [
+    {"id": 1, "название": "Альфа", "категория": "анальгетик", "описание": "обезболивающее",
+     "показания": ["боль"], "противопоказания": ["язва"], "побочные_эффекты": ["тошнота"],
+     "дозировка": "1 таблетка"},
+    {"id": 2, "название": "Бета", "категория": "антигистаминное", "описание": "от аллергии",
+     "показания": ["зуд"], "противопоказания": [], "побочные_эффекты": [],
+     "дозировка": "1 таблетка"},
+]
+
+def _ollama(tokens=("При", "вет"), status=200, models_status=200):
+    """Транспорт httpx, отвечающий как Ollama"""
+    def handler(request):
+        if request.url.path == "/api/tags":
+            return httpx.Response(models_status, json={"models": [{"name": "llama2"}]})
+        payload = json.loads(request.content)
+        if status != 200:
+            return httpx.Response(status)
+        if not payload["stream"]:
+            return httpx.Response(200, json={"response": "".join(tokens)})
+        lines = [json.dumps({"response": token, "done": False}) for token in tokens]
+        lines.append(json.dumps({"response": "", "done": True}))
+        return httpx.Response(200, content="\n".join(lines).encode('utf-8'))
+    
+    return httpx.MockTransport(handler)
+
+def _client(transport, **kwargs):
+    client = AsyncLocalLLMClient(**kwargs)
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=transport)
+    return client
+
+class _StubStore:
+    def __iter__(self):
+        return iter(DRUGS)
+    
+    def category_of(self, drug_id):
+        return next(drug['категория'] for drug in DRUGS if drug['id'] == drug_id)
+
+class _StubDB:
+    """Векторная база без модели: результаты поиска по всем лекарствам"""
+    index_version = "v1"
+    
+    def __init__(self, *args, **kwargs):
+        self.drug_store = _StubStore()
+    
+    def build_vector_database(self, incremental=False, workers=1):
+        pass
+    
+    def prepare_similarity_graph(self):
+        return True
+    
+    def prepare_field_index(self):
+        return True
+    
+    def search(self, query, n_results=5, mode="vector", category_filter=None,
+               exclude_contraindications=None, fields=None):
+        # Гибридный режим в заглушке - обратный порядок, чтобы различать режимы
+        drugs = DRUGS[::-1] if mode == "hybrid" else DRUGS
+        return [{"рейтинг": i + 1, "лекарство": drug['название'], "схожесть": 0.9,
+                 "полные_данные": drug} for i, drug in enumerate(drugs[:n_results])]
+    
+    def similar_drugs(self, drug_id, k=5):
+        return []
+    
+    def excluded_ids(self, conditions=None):
+        return set()
+    
+    def unmatched_conditions(self, conditions=None):
+        return [condition for condition in conditions or () if condition == "астма"]
+
+class TestAsyncLocalLLMClient:
+    """Тесты асинхронного клиента Ollama"""
+    
+    def test_generate_and_stream(self):
+        """Обычный ответ и NDJSON-поток токенов"""
+        async def run():
+            client = _client(_ollama())
+            text, success = await client.generate("промпт")
+            tokens = [token async for token in client.generate_stream("промпт")]
+            await client.aclose()
+            return text, success, tokens
+        
+        text, success, tokens = asyncio.run(run())
+        assert (text, success) == ("Привет", True)
+        assert tokens == ["При", "вет"]
+    
+    def test_http_error(self):
+        """Ошибка Ollama возвращается как текст с признаком неуспеха"""
+        async def run():
+            client = _client(_ollama(status=500))
+            result = await client.generate("промпт")
+            tokens = [token async for token in client.generate_stream("промпт")]
+            await client.aclose()
+            return result, tokens
+        
+        (text, success), tokens = asyncio.run(run())
+        assert not success and text == "Ошибка LLM: 500"
+        assert tokens == ["Ошибка LLM: 500"]
+    
+    def test_models_rediscovered_after_failure(self):
+        """Пустой список моделей после ошибки не кешируется навсегда"""
+        async def run():
+            client = _client(_ollama(models_status=503), discovery_retry_interval=0.0)
+            first = await client.get_available_models()
+            client._client = httpx.AsyncClient(base_url=client.base_url, transport=_ollama())
+            second = await client.get_available_models()
+            await client.aclose()
+            return first, second
+        
+        assert asyncio.run(run()) == ([], ["llama2"])
+
+class TestAsyncPipeline:
+    """Тесты асинхронного пайплайна поиска и RAG"""
+    
+    @pytest.fixture
+    def system(self, monkeypatch):
+        monkeypatch.setattr(async_drug_search, "MedicalVectorDB", _StubDB)
+        system = AsyncAdvancedDrugSearch("drugs.json", max_concurrent_generations=1)
+        system.llm_client = _client(_ollama())
+        system.rag_system.llm = system.llm_client
+        return system
+    
+    def test_smart_search_cached(self, system):
+        """Ответ с AI-советом кешируется, повторный запрос не обращается к LLM"""
+        async def run():
+            first = await system.smart_search("боль", max_results=2)
+            second = await system.smart_search("боль", max_results=2)
+            await system.aclose()
+            return first, second
+        
+        first, second = asyncio.run(run())
+        assert first["ai_advice"] == "Привет"
+        assert first["suggestions"][0] == "Похожие категории: анальгетик, антигистаминное"
+        assert second == first and second is not first
+    
+    def test_hybrid_mode(self, system):
+        """Режим поиска передается в базу и влияет на результаты"""
+        async def run():
+            vector = await system.smart_search("бета", use_llm=False)
+            hybrid = await system.smart_search("бета", use_llm=False, mode="hybrid")
+            await system.aclose()
+            return vector, hybrid
+        
+        vector, hybrid = asyncio.run(run())
+        assert vector["results"][0]["лекарство"] == "Альфа"
+        assert hybrid["results"][0]["лекарство"] == "Бета"
+    
+    def test_mode_and_fields_in_cache_key(self, system):
+        """Ответ одного режима поиска не отдается другому при тех же лекарствах"""
+        async def run():
+            vector = await system.smart_search("боль", use_llm=False)
+            vector["results"].clear()
+            hybrid = await system.smart_search("боль", use_llm=False, mode="hybrid")
+            fields = await system.smart_search("боль", use_llm=False, fields=("показания",))
+            again = await system.smart_search("боль", use_llm=False)
+            await system.aclose()
+            return hybrid, fields, again
+        
+        hybrid, fields, again = asyncio.run(run())
+        assert [result["лекарство"] for result in hybrid["results"]] == ["Бета", "Альфа"]
+        assert system.response_cache.stats()["size"] == 3
+        assert len(again["results"]) == 2
+    
+    def test_conditions_in_cache_key(self, system):
+        """Ответ без фильтра противопоказаний не отдается запросу с фильтром"""
+        async def run():
+            unfiltered = await system.smart_search("боль", use_llm=False)
+            filtered = await system.smart_search("боль", use_llm=False,
+                                                 exclude_contraindications=["язва", "астма"])
+            await system.aclose()
+            return unfiltered, filtered
+        
+        unfiltered, filtered = asyncio.run(run())
+        assert filtered is not unfiltered
+        assert "unmatched_conditions" not in unfiltered
+        assert filtered["unmatched_conditions"] == ["астма"]
+    
+    def test_abandoned_stream_releases_slot(self, system):
+        """Брошенный потребитель потока не держит единственный слот генерации"""
+        async def run():
+            stream = system.stream_advice("боль")
+            first_token = await stream.__anext__()
+            # Поток не дочитан и не закрыт - следующая генерация не должна ждать
+            text, success = await asyncio.wait_for(system._generate("промпт"), timeout=2)
+            await stream.aclose()
+            await system.aclose()
+            return first_token, text, success
+        
+        assert asyncio.run(run()) == ("При", "Привет", True)
@@ -0,0 +1,117 @@
+import pytest
+
+from src.context_builder import DrugContextCache, context_window, estimate_tokens
+
+def _drug(drug_id, name):
+    return {"id": drug_id, "название": name, "описание": f"{name} - лекарственное средство для примера",
+            "показания": ["головная боль", "температура", "простуда", "мигрень"],
+            "противопоказания": ["язвенная болезнь", "беременность"],
+            "побочные_эффекты": ["тошнота", "сыпь", "головокружение", "сонливость"],
+            "дозировка": "по 1 таблетке 3 раза в день после еды"}
+
+DRUGS = [_drug(drug_id, name) for drug_id, name in
+         enumerate(["Альфамол", "Бетапрофен", "Гаммазин", "Дельтадин", "Эпсилон"], 1)]
+
+class TestContextBuilder:
+    """Тесты кешированных блоков контекста для промптов"""
+    
+    def test_estimate_tokens(self):
+        """Кириллица оценивается плотнее латиницы"""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("абвгд") == 2
+        assert estimate_tokens("abcdefgh") == 2
+        assert estimate_tokens("парацетамол") > estimate_tokens("paracetamol")
+    
+    def test_blocks_are_cached(self):
+        """Блок лекарства строится один раз"""
+        cache = DrugContextCache()
+        drug = DRUGS[0]
+        
+        first = cache.block(drug)
+        assert cache.block(drug) is first
+        assert first[0].startswith(f"{drug['название']}:\n")
+        assert first[1] == estimate_tokens(first[0])
+        
+        cache.warm(DRUGS, kinds=("context", "summary"))
+        assert len(cache) == 2 * len(DRUGS)
+    
+    def test_warm_bounded_and_versioned(self):
+        """Прогрев читает только первые записи, смена версии индекса сбрасывает блоки"""
+        cache = DrugContextCache()
+        read = []
+        
+        def records():
+            for drug in DRUGS:
+                read.append(drug['id'])
+                yield drug
+        
+        cache.check_version("v1")
+        cache.warm(records(), limit=2)
+        assert read == [1, 2] and len(cache) == 2
+        
+        cache.check_version("v1")
+        assert len(cache) == 2
+        cache.check_version("v2")
+        assert len(cache) == 0
+    
+    def test_context_respects_budget(self):
+        """Контекст нумеруется по порядку и не превышает бюджет токенов"""
+        cache = DrugContextCache()
+        drugs = DRUGS
+        
+        full_context, full_tokens = cache.build_context(drugs)
+        assert full_context.startswith("\n1. ") and "\n5. " in full_context
+        
+        budget = full_tokens // 2
+        context, tokens = cache.build_context(drugs, max_tokens=budget)
+        assert 0 < tokens <= budget
+        assert context.startswith("\n1. ")
+        assert cache.build_context(drugs, max_tokens=1) == ("", 0)
+    
+    def test_lower_ranks_degraded_first(self):
+        """При нехватке бюджета сокращаются блоки лекарств с низким рейтингом"""
+        cache = DrugContextCache()
+        drugs = DRUGS
+        
+        full_first, _ = cache.block(drugs[0], "context")
+        brief_total = sum(cache.block(drug, "brief")[1] + 2 for drug in drugs)
+        budget = brief_total + cache.block(drugs[0], "context")[1]
+        context, tokens = cache.build_context(drugs, max_tokens=budget)
+        
+        assert tokens <= budget
+        assert context.startswith("\n1. " + full_first)
+        last_brief, _ = cache.block(drugs[4], "brief")
+        assert context.endswith("\n5. " + last_brief)
+    
+    def test_rag_blocks_follow_index_version(self):
+        """Промпты RAG не используют блоки, построенные по прежней версии индекса"""
+        from src.llm_integration import RAGSystem
+        
+        db = type("DB", (), {"index_version": "v1"})()
+        rag = RAGSystem(db, llm_client=None)
+        drug = dict(DRUGS[0])
+        assert "тошнота" in rag._build_drug_summary_prompt(drug['название'], drug)
+        
+        drug["побочные_эффекты"] = ["зуд"]
+        db.index_version = "v2"
+        prompt = rag._build_drug_summary_prompt(drug['название'], drug)
+        assert "зуд" in prompt and "тошнота" not in prompt
+    
+    def test_answer_tokens_fit_window(self):
+        """Длина ответа ограничена местом в окне, даже если оно меньше минимальной"""
+        from src.llm_integration import RAGSystem
+        
+        rag = RAGSystem(None, llm_client=None, advice_model="small", context_windows={"small": 1000},
+                        max_answer_tokens=500)
+        assert rag.advice_max_tokens("") == 500
+        # Осталось 100 токенов окна - минимальные 256 в него не помещаются
+        assert rag.advice_max_tokens("a" * 3600) == 100
+        assert rag.advice_max_tokens("a" * 2800) == 300
+        assert rag.advice_max_tokens("a" * 8000) == 1
+    
+    def test_model_context_window(self):
+        """Окно контекста определяется по префиксу имени модели"""
+        assert context_window("llama2") == 4096
+        assert context_window("llama2:13b") == 4096
+        assert context_window("unknown-model") == 2048
+        assert context_window("custom:7b", {"custom": 1000}) == 1000
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src.contraindication_index import ContraindicationIndex
+from src.retrieval_backends import NumpyBackend
+from src.vector_database import MedicalVectorDB
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "drugs_database.json")
+
+def _database_drugs():
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)["лекарства"]
+
+def _hash_encode(texts, normalize_embeddings=True):
+    """Кодирование без модели: детерминированный вектор из хеша текста"""
+    vectors = np.array([np.frombuffer(hashlib.sha256(text.encode('utf-8')).digest(), dtype=np.uint8)
+                        for text in texts], dtype=np.float32) - 127.5
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+class TestContraindicationIndex:
+    """Тесты индекса противопоказаний и фильтрации результатов поиска"""
+    
+    @pytest.fixture
+    def index(self):
+        return ContraindicationIndex([
+            {"id": 1, "противопоказания": ["язвенная болезнь", "беременность"]},
+            {"id": 2, "противопоказания": ["тяжелая почечная недостаточность"]},
+            {"id": 3, "противопоказания": ["сердечная недостаточность", "тяжелая гипертензия"]},
+        ])
+    
+    def test_condition_matching(self, index):
+        """Состояние находит противопоказания по основам и словарю состояний"""
+        assert index.drugs_with("язва") == {1}
+        assert index.drugs_with("Беременности") == {1}
+        assert index.drugs_with("почечная недостаточность") == {2}
+        assert index.drugs_with("почки") == {2}
+        # Общие слова по отдельности ничего не исключают
+        assert index.drugs_with("острая недостаточность") == set()
+        assert index.excluded_ids(["язва", "недостаточность"]) == {1, 2, 3}
+        assert index.excluded_ids([]) == set()
+    
+    def test_detailed_conditions(self, index):
+        """Подробное описание состояния находит более общие противопоказания"""
+        assert index.drugs_with("язвенная болезнь желудка") == {1}
+        assert index.drugs_with("беременность 2 триместр") == {1}
+        assert index.drugs_with("хроническая болезнь почек") == {2}
+        assert index.drugs_with("тяжелая сердечная патология") == {3}
+        assert index.drugs_with("бронхиальная астма") == set()
+    
+    def test_unmatched_conditions(self, index):
+        """Состояния без совпадений возвращаются, чтобы вызывающий знал о пустом фильтре"""
+        assert index.match(["язва", "астма", "боль"]) == ({1}, ["астма", "боль"])
+    
+    def test_database_conditions(self):
+        """Проверка на реальной базе: основы сравниваются целиком, без префиксов"""
+        drugs = _database_drugs()
+        index = ContraindicationIndex(drugs)
+        names = {drug["id"]: drug["название"] for drug in drugs}
+        
+        # "боль" (бол) не должна совпадать с "язвенная болезнь" (болезн)
+        assert index.drugs_with("боль") == set()
+        assert {names[drug_id] for drug_id in index.drugs_with("почки")} == {
+            "Ибупрофен", "Кеторолак", "Метформин", "Фуросемид", "Цетиризин"
+        }
+        assert index.match(["астма"]) == (set(), ["астма"])
+        
+        # Подробная формулировка исключает не меньше краткой
+        assert index.drugs_with("язвенная болезнь желудка") == index.drugs_with("язва")
+        assert index.drugs_with("язвенная болезнь желудка") >= {
+            drug["id"] for drug in drugs if "язвенная болезнь" in drug["противопоказания"]
+        }
+        assert index.drugs_with("хроническая болезнь почек") == index.drugs_with("почки")
+        assert index.match(["бронхиальная астма"]) == (set(), ["бронхиальная астма"])
+    
+    def test_remove(self, index):
+        """Удаленное лекарство не исключается"""
+        index.remove(1)
+        assert index.drugs_with("язва") == set()
+        assert len(index) == 2
+    
+    def test_search_excludes_contraindicated(self, monkeypatch):
+        """Поиск не возвращает противопоказанные лекарства и сохраняет top-k"""
+        db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None), field_index_path="",
+                             similarity_graph_path="")
+        monkeypatch.setattr(db, "encode", _hash_encode)
+        db.build_vector_database()
+        excluded = db.contraindication_index.excluded_ids(["беременность"])
+        assert excluded
+        
+        results = db.search_drugs("боль температура", n_results=5,
+                                  exclude_contraindications=["беременность"])
+        found_ids = {result['полные_данные']['id'] for result in results}
+        
+        assert len(results) == 5
+        assert not found_ids & excluded
+        
+        hybrid = db.hybrid_search("Кеторолак", exclude_contraindications=["беременность"])
+        assert hybrid
+        assert not {result['полные_данные']['id'] for result in hybrid} & excluded
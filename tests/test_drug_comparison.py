@@ -1,5 +1,12 @@
+import os
+
 import pytest
 
+from src.retrieval_backends import NumpyBackend
+from src.vector_database import MedicalVectorDB
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "drugs_database.json")
+
 class TestDrugComparison:
     """Тесты сравнения и группировки лекарств - ОБНОВЛЕННЫЕ"""
     
@@ -32,4 +39,50 @@ class TestDrugComparison:
             f"Успешность поиска {drug1} и {drug2}: {success_rate:.1%}, ожидалось {min_success_rate:.0%}"
         )
         
-        print(f"Успешность поиска {drug1} и {drug2}: {success_rate:.1%}")
\ No newline at end of file
+        print(f"Успешность поиска {drug1} и {drug2}: {success_rate:.1%}")
+
+class TestCompareMany:
+    """Тесты сравнения нескольких лекарств без LLM"""
+    
+    def test_comparison_table(self):
+        """Таблица содержит значения по каждому лекарству и общие элементы"""
+        from src.drug_comparison import build_comparison_table, format_comparison_table
+        
+        drugs = [
+            {"название": "А", "показания": ["боль", "жар"], "противопоказания": ["язва"],
+             "побочные_эффекты": [], "взаимодействие": "нет"},
+            {"название": "Б", "показания": ["Жар"], "противопоказания": ["астма"],
+             "побочные_эффекты": ["тошнота"], "взаимодействие": ""},
+        ]
+        table = build_comparison_table(drugs)
+        
+        assert table["лекарства"] == ["А", "Б"]
+        assert table["поля"]["показания"]["общие"] == ["жар"]
+        assert table["поля"]["противопоказания"]["общие"] == []
+        assert table["поля"]["взаимодействие"]["значения"] == ["нет", ""]
+        
+        text = format_comparison_table(table)
+        assert "- Б: тошнота" in text and "- Общие для всех: жар" in text
+    
+    def test_compare_many_resolves_batch(self, monkeypatch):
+        """Несколько лекарств разрешаются одним вызовом, повторы сравниваются один раз"""
+        from src.llm_integration import RAGSystem
+        
+        db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None), field_index_path="",
+                             similarity_graph_path="")
+        semantic_batches = []
+        
+        def search_drugs_batch(queries, n_results=5):
+            # Семантический поиск - только для названий, которых нет в индексе
+            semantic_batches.append(list(queries))
+            return [[] for _ in queries]
+        
+        monkeypatch.setattr(db, "search_drugs_batch", search_drugs_batch)
+        rag = RAGSystem(db, llm_client=None)
+        comparison = rag.compare_many(["Парацетамол", "ибупрофен", "Неизвестин", "Цетиризин", "парацетамол"])
+        
+        assert comparison["лекарства"] == ["Парацетамол", "Ибупрофен", "Цетиризин"]
+        assert comparison["не_найдены"] == ["Неизвестин"]
+        assert semantic_batches == [["Неизвестин"]]
+        assert comparison["сравнение"] is None
+        assert len(comparison["таблица"]["поля"]["показания"]["значения"]) == 3
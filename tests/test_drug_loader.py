@@ -0,0 +1,110 @@
+import json
+import os
+import pytest
+
+import src.drug_loader as drug_loader
+from src.drug_loader import iter_drug_records
+from src.drug_record import DrugRecord
+from src.drug_store import DrugStore, SqliteDrugStore
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "drugs_database.json")
+
+DRUGS = [
+    {"id": 1, "название": "Альфа", "категория": "анальгетик", "описание": "скобки {[ ]} и \"кавычки\" в тексте",
+     "показания": ["боль"], "противопоказания": ["язва"], "побочные_эффекты": [], "дозировка": "1 таблетка"},
+    {"id": 2, "название": "Бета", "категория": "антибиотик", "описание": "обратная косая черта \\ в конце\\",
+     "показания": ["инфекция"], "противопоказания": [], "побочные_эффекты": ["сыпь"], "дозировка": "2 раза"},
+    {"id": 3, "название": "Гамма", "категория": "анальгетик", "описание": "ё и юникод ✓",
+     "показания": ["температура"], "противопоказания": [], "побочные_эффекты": [], "дозировка": ""},
+]
+
+def _write_database(path, drugs, **extra):
+    path.write_text(json.dumps({"версия": 2, **extra, "лекарства": drugs}, ensure_ascii=False, indent=2),
+                    encoding='utf-8')
+    return str(path)
+
+class TestDrugLoader:
+    """Тесты потоковой загрузки и хранилища записей на диске"""
+    
+    def test_streaming_json_matches_full_load(self, tmp_path):
+        """Инкрементальный разбор JSON дает те же записи при любом размере блока"""
+        path = _write_database(tmp_path / "drugs.json", DRUGS, источник={"лекарства": "не массив"})
+        for read_size in (7, 16, 1000, 1 << 20):
+            assert list(iter_drug_records(path, read_size)) == DRUGS
+        
+        with open(DATA_PATH, "r", encoding="utf-8") as f:
+            expected = json.load(f)["лекарства"]
+        assert list(iter_drug_records(DATA_PATH, 64)) == expected
+    
+    def test_json_lines(self, tmp_path):
+        """JSON Lines вариант схемы "лекарства" """
+        path = tmp_path / "drugs.jsonl"
+        path.write_text("\n".join(json.dumps(drug, ensure_ascii=False) for drug in DRUGS) + "\n",
+                        encoding='utf-8')
+        
+        assert list(iter_drug_records(str(path))) == DRUGS
+    
+    def test_malformed_record_fails_fast(self, tmp_path, monkeypatch):
+        """Ошибочная запись прерывает чтение сразу, а не после дочитывания файла"""
+        path = tmp_path / "drugs.json"
+        valid = [{**DRUGS[0], "id": number} for number in range(200)]
+        text = json.dumps({"лекарства": valid[:1] + [{"id": 1}] + valid}, ensure_ascii=False)
+        path.write_text(text.replace('{"id": 1}', '{"id": 1, "название": }', 1), encoding='utf-8')
+        
+        reads = []
+        real_open = open
+        
+        class CountingFile:
+            def __init__(self, f):
+                self._f = f
+            
+            def read(self, size):
+                reads.append(size)
+                return self._f.read(size)
+            
+            def __enter__(self):
+                return self
+            
+            def __exit__(self, *args):
+                self._f.close()
+        
+        monkeypatch.setattr(drug_loader, "open", lambda *args, **kwargs: CountingFile(real_open(*args, **kwargs)),
+                            raising=False)
+        records = iter_drug_records(str(path), read_size=256)
+        
+        assert next(records)["id"] == 0
+        with pytest.raises(ValueError):
+            next(records)
+        assert len(reads) < 5 < len(text) // 256
+    
+    def test_truncated_file(self, tmp_path):
+        """Обрыв файла посреди записи - ошибка, а не молчаливо неполная база"""
+        path = tmp_path / "drugs.json"
+        text = json.dumps({"лекарства": DRUGS}, ensure_ascii=False)
+        path.write_text(text[:len(text) // 2], encoding='utf-8')
+        
+        with pytest.raises(ValueError):
+            list(iter_drug_records(str(path), read_size=16))
+    
+    def test_sqlite_store_interface(self, tmp_path):
+        """Хранилище на диске отвечает так же, как хранилище в памяти"""
+        drugs = [DrugRecord.from_dict(drug) for drug in DRUGS]
+        store = SqliteDrugStore(str(tmp_path / "drugs.sqlite"), cache_size=2)
+        store.add_many(drugs)
+        memory_store = DrugStore(drugs)
+        
+        assert len(store) == len(drugs)
+        for drug in drugs:
+            assert store.get(drug['id']) == drug
+            assert store.id_for_name(drug['название'].upper()) == drug['id']
+            assert store.category_of(drug['id']) == memory_store.category_of(drug['id'])
+        
+        assert sorted(store.categories()) == sorted(memory_store.categories())
+        for category in memory_store.categories():
+            assert store.ids_for_category(category) == sorted(memory_store.ids_for_category(category))
+        
+        first = drugs[0]
+        store.remove(first['id'])
+        assert first['id'] not in store and store.get(first['id']) is None
+        assert len(list(store)) == len(drugs) - 1
+        store.close()
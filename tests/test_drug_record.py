@@ -0,0 +1,57 @@
+import json
+import pickle
+import pytest
+
+from src.drug_record import DrugRecord, SearchResult, to_builtin
+
+class TestDrugRecord:
+    """Тесты компактной записи лекарства"""
+    
+    @pytest.fixture
+    def raw(self):
+        return {
+            "id": 1, "название": "Тест", "описание": "Описание",
+            "показания": ["боль"], "противопоказания": ["беременность", "язва", "астма", "дети"],
+            "дозировка": "1 таб", "побочные_эффекты": ["тошнота"],
+            "взаимодействие": "нет", "категория": "анальгетик"
+        }
+    
+    def test_mapping_access_and_round_trip(self, raw):
+        """Доступ по ключам схемы и обратное преобразование в dict"""
+        record = DrugRecord.from_dict(raw)
+        
+        assert record['название'] == "Тест" and record.name == "Тест"
+        assert record['показания'] == ("боль",)
+        assert record.get('нет такого', 'по умолчанию') == 'по умолчанию'
+        assert record.to_dict() == raw and record == raw
+        assert pickle.loads(pickle.dumps(record)) == record
+    
+    def test_missing_and_extra_fields(self, raw):
+        """Отсутствующие поля не появляются, лишние сохраняются"""
+        del raw["категория"]
+        raw["производитель"] = "Завод"
+        record = DrugRecord.from_dict(raw)
+        
+        assert record.get('категория', 'не указана') == 'не указана'
+        assert record['производитель'] == "Завод"
+        assert record.to_dict() == raw
+    
+    def test_shared_strings(self, raw):
+        """Одинаковые строки разных записей - один объект"""
+        first = DrugRecord.from_dict(raw)
+        second = DrugRecord.from_dict(json.loads(json.dumps(raw)))
+        
+        assert first.category is second.category
+        assert first.contraindications[0] is second.contraindications[0]
+    
+    def test_search_result_output(self, raw):
+        """Результат поиска дает прежние поля и сериализуется в JSON"""
+        result = SearchResult(1, 0.87654, DrugRecord.from_dict(raw))
+        
+        assert result['схожесть'] == "0.877"
+        assert result['лекарство'] == "Тест"
+        assert result['противопоказания'] == ("беременность", "язва", "астма")
+        
+        data = json.loads(json.dumps(to_builtin({"results": [result]}), ensure_ascii=False))
+        assert data["results"][0]["полные_данные"] == raw
+        assert data["results"][0]["противопоказания"] == ["беременность", "язва", "астма"]
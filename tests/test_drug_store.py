@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from src.drug_store import DrugStore
+from src.name_resolver import NameResolver
+from src.retrieval_backends import NumpyBackend
+from src.vector_database import MedicalVectorDB
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "drugs_database.json")
+
+class TestDrugStore:
+    """Тесты индексов хранилища лекарств"""
+    
+    @pytest.fixture
+    def db(self):
+        return MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None), field_index_path="",
+                               similarity_graph_path="")
+    
+    def test_lookup_by_id_and_name(self, db):
+        """Поиск записи по id и по названию без учета регистра"""
+        store = db.drug_store
+        
+        for drug in db.drugs_data:
+            assert store.get(drug['id']) is drug
+            assert store.id_for_name(drug['название'].upper()) == drug['id']
+        
+        assert store.get(-1) is None
+        assert store.get_by_name("несуществующее лекарство") is None
+    
+    def test_category_index(self, db):
+        """Индекс категорий совпадает с данными"""
+        store = db.drug_store
+        
+        for category in store.categories():
+            ids = store.ids_for_category(category)
+            assert ids, f"Категория '{category}' пуста"
+            assert all(store.category_of(drug_id) == category for drug_id in ids)
+        
+        total = sum(len(store.ids_for_category(c)) for c in store.categories())
+        assert total == len(db.drugs_data)
+    
+    def test_shared_name_index(self):
+        """Хранилище заполняет общий индекс названий и убирает из него удаленные"""
+        names = NameResolver()
+        store = DrugStore([{"id": 1, "название": "Но-шпа", "категория": "спазмолитик"}], names=names)
+        
+        assert store.id_for_name("НО ШПА") == 1
+        assert names.resolve("ношпа") == 1
+        
+        store.remove(1)
+        assert store.get_by_name("Но-шпа") is None
+        assert names.resolve_exact("но-шпа") is None
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from src.embedding_artifact import EmbeddingArtifact
+
+class TestEmbeddingArtifact:
+    """Тесты формата артефакта эмбеддингов"""
+    
+    @pytest.mark.parametrize("dtype", ["float32", "float16"])
+    def test_roundtrip_memory_mapped(self, tmp_path, dtype):
+        """Артефакт загружается через read-only memory map с теми же данными"""
+        path = str(tmp_path / "drugs.emb")
+        embeddings = np.random.RandomState(0).rand(3, 8).astype(np.float32)
+        EmbeddingArtifact.save(path, "test-model", [1, 5, 7], ["a", "b", "c"], embeddings, dtype=dtype)
+        
+        artifact = EmbeddingArtifact.load(path)
+        
+        assert artifact.model_name == "test-model"
+        assert artifact.dtype == dtype
+        assert isinstance(artifact.embeddings, np.memmap)
+        assert not artifact.embeddings.flags.writeable
+        assert np.allclose(artifact.get(5), embeddings[1], atol=1e-3)
+    
+    def test_fingerprint_mismatch(self, tmp_path):
+        """Эмбеддинг с устаревшим отпечатком не используется"""
+        path = str(tmp_path / "drugs.emb")
+        EmbeddingArtifact.save(path, "test-model", [1], ["old"], np.ones((1, 4)))
+        
+        artifact = EmbeddingArtifact.load(path)
+        
+        assert artifact.get(1, "old") is not None
+        assert artifact.get(1, "new") is None
+        assert artifact.get(2) is None
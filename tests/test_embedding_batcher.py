@@ -0,0 +1,40 @@
+import threading
+import numpy as np
+import pytest
+
+from src.embedding_batcher import EmbeddingBatcher
+
+class CountingEncoder:
+    """Кодировщик, запоминающий размеры пакетов"""
+    
+    def __init__(self):
+        self.batches = []
+    
+    def encode(self, texts, normalize_embeddings=True):
+        self.batches.append(len(texts))
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+class TestEmbeddingBatcher:
+    """Тесты объединения запросов на кодирование"""
+    
+    def test_concurrent_requests_are_batched(self):
+        """Одновременные запросы из разных потоков кодируются общими пакетами"""
+        encoder = CountingEncoder()
+        batcher = EmbeddingBatcher(encoder, max_batch_size=64, max_wait=0.05)
+        results = {}
+        
+        def worker(text):
+            results[text] = batcher.encode([text])
+        
+        texts = ["а" * i for i in range(1, 17)]
+        threads = [threading.Thread(target=worker, args=(text,)) for text in texts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+        
+        assert sum(encoder.batches) == len(texts)
+        assert len(encoder.batches) < len(texts), f"Запросы не объединялись: {encoder.batches}"
+        for text in texts:
+            assert results[text][0][0] == len(text), "Эмбеддинг вернулся не тому запросу"
@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.field_index import FieldVectorIndex, SAFETY_FIELDS, SYMPTOM_FIELDS
+from src.retrieval_backends import NumpyBackend
+from src.vector_database import MedicalVectorDB
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "drugs_database.json")
+
+VOCABULARY = ["головная боль", "кашель", "язва", "беременность", "тошнота"]
+
+def _encode(texts):
+    """Векторы-индикаторы слов словаря"""
+    matrix = np.zeros((len(texts), len(VOCABULARY)), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for column, word in enumerate(VOCABULARY):
+            if word in text:
+                matrix[row, column] = 1.0
+    matrix[:, 0] += 1e-3
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+def _field_texts(drug):
+    return ([("показания", text) for text in drug["показания"]]
+            + [("противопоказания", text) for text in drug["противопоказания"]])
+
+DRUGS = [
+    {"id": 1, "категория": "а", "показания": ["головная боль", "кашель"], "противопоказания": ["язва"]},
+    {"id": 2, "категория": "б", "показания": ["кашель"], "противопоказания": ["беременность"]},
+    {"id": 3, "категория": "а", "показания": ["тошнота"], "противопоказания": ["язва", "беременность"]},
+]
+
+class TestFieldVectorIndex:
+    """Тесты многовекторного индекса полей"""
+    
+    @pytest.fixture
+    def index(self):
+        return FieldVectorIndex.build(DRUGS, _field_texts, _encode, batch_size=2, index_version="v1")
+    
+    def test_max_sim_per_field(self, index):
+        """Лекарство оценивается лучшим вектором выбранных полей"""
+        hits = index.query(_encode(["кашель"]), 2, SYMPTOM_FIELDS)[0]
+        assert {drug_id for drug_id, _ in hits} == {1, 2}
+        assert hits[0][1] == pytest.approx(0.0, abs=1e-3)
+        
+        hits = index.query(_encode(["беременность"]), 3, SAFETY_FIELDS)[0]
+        assert [drug_id for drug_id, _ in hits][:2] in ([2, 3], [3, 2])
+        # Противопоказания не влияют на поиск по показаниям
+        hits = index.query(_encode(["язва"]), 3, SYMPTOM_FIELDS)[0]
+        assert hits[0][1] > 1.0
+    
+    def test_filters_before_ranking(self, index):
+        """Категория и исключенные лекарства отсекаются до ранжирования"""
+        hits = index.query(_encode(["кашель"]), 3, SYMPTOM_FIELDS, category="а", exclude_ids={1})[0]
+        assert [drug_id for drug_id, _ in hits] == [3]
+        
+        with pytest.raises(ValueError):
+            index.query(_encode(["кашель"]), 3, ("дозировка",))
+    
+    def test_reuse_and_persistence(self, index, tmp_path):
+        """Неизменные тексты не кодируются повторно, индекс сохраняется в .npz"""
+        encoded = []
+        def counting_encode(texts):
+            encoded.extend(texts)
+            return _encode(texts)
+        
+        changed = DRUGS[:2] + [{**DRUGS[2], "показания": ["головная боль"]}]
+        rebuilt = FieldVectorIndex.build(changed, _field_texts, counting_encode, previous=index)
+        assert encoded == []
+        assert len(rebuilt) == len(index)
+        
+        path = str(tmp_path / "fields.npz")
+        rebuilt.save(path)
+        loaded = FieldVectorIndex.load(path)
+        query = _encode(["головная боль"])
+        assert loaded.query(query, 3, SYMPTOM_FIELDS) == rebuilt.query(query, 3, SYMPTOM_FIELDS)
+    
+    def test_symptom_search(self, tmp_path, monkeypatch):
+        """Поиск по показаниям через MedicalVectorDB"""
+        drugs = [{**drug, "название": f"Лекарство {drug['id']}", "описание": "", "побочные_эффекты": [],
+                  "дозировка": ""} for drug in DRUGS]
+        data_path = tmp_path / "drugs.json"
+        data_path.write_text(json.dumps({"лекарства": drugs}, ensure_ascii=False), encoding="utf-8")
+        db = MedicalVectorDB(str(data_path), backend=NumpyBackend(path=None), field_index_path="",
+                             similarity_graph_path="")
+        monkeypatch.setattr(db, "encode", lambda texts, normalize_embeddings=True: _encode(texts))
+        db.build_vector_database()
+        
+        results = db.search_drugs("кашель", n_results=3, fields=SYMPTOM_FIELDS)
+        
+        assert len(results) == 3
+        assert {result['полные_данные']['id'] for result in results[:2]} == {1, 2}
+        assert db.get_field_index().index_version == db.index_version
+    
+    def test_built_once_and_persisted(self, tmp_path, monkeypatch):
+        """Одновременные первые запросы строят индекс один раз, следующий запуск читает файл"""
+        def open_db():
+            db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None),
+                                 field_index_path=str(tmp_path / "fields.npz"))
+            builds = []
+            build = db.build_field_index
+            
+            def slow_encode(texts):
+                # Медленное кодирование без модели, чтобы потоки пересеклись
+                time.sleep(0.01)
+                return _encode(texts)
+            
+            def counting_build(**kwargs):
+                builds.append(kwargs)
+                return build(**kwargs)
+            
+            monkeypatch.setattr(db, "encode", slow_encode)
+            monkeypatch.setattr(db, "build_field_index", counting_build)
+            return db, builds
+        
+        db, builds = open_db()
+        threads = [threading.Thread(target=db.get_field_index) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        assert len(builds) == 1
+        
+        restarted, builds = open_db()
+        assert restarted.prepare_field_index()
+        assert builds == []
+        assert len(restarted.field_index) == len(db.field_index)
+    
+    def test_default_path_next_to_data(self):
+        """По умолчанию индекс полей сохраняется рядом с файлом данных"""
+        db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None))
+        assert db.field_index_path == os.path.join(os.path.dirname(DATA_PATH), "field_index.npz")
@@ -0,0 +1,219 @@
+import http.client
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import src.advanced_drug_search as advanced_drug_search
+from src.advanced_drug_search import AdvancedDrugSearch
+from src.http_server import create_server
+
+class _StubSystem:
+    """Система поиска без модели и LLM: запоминает параметры вызовов"""
+    
+    def __init__(self):
+        self.calls = []
+        self.db = self
+    
+    def enable_query_batching(self, max_batch_size=64, max_wait=0.005):
+        pass
+    
+    def get_categories(self):
+        return ["анальгетик"]
+    
+    def get_stats(self):
+        return {"total_searches": len(self.calls)}
+    
+    def smart_search(self, query, **kwargs):
+        self.calls.append((query, kwargs))
+        return {"results": [], "ai_advice": "", "suggestions": []}
+    
+    def search_by_symptoms(self, symptoms, max_results=5):
+        return self.smart_search(" ".join(symptoms), max_results=max_results)
+    
+    def similar_drugs(self, name, k=5):
+        self.calls.append((name, {"k": k}))
+        return []
+
+class _BlockingSystem(_StubSystem):
+    """Система поиска, занимающая обработчик до release"""
+    
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+    
+    def smart_search(self, query, **kwargs):
+        self.started.set()
+        self.release.wait(timeout=5)
+        return super().smart_search(query, **kwargs)
+
+class _StubQueryCache:
+    def stats(self):
+        return {}
+
+class _StubDB:
+    """Векторная база без модели: поиск ничего не находит"""
+    index_version = "v1"
+    
+    def __init__(self, *args, **kwargs):
+        self.drug_store = []
+        self.query_cache = _StubQueryCache()
+    
+    def build_vector_database(self, incremental=False, workers=1):
+        pass
+    
+    def prepare_similarity_graph(self):
+        return True
+    
+    def prepare_field_index(self):
+        return True
+    
+    def enable_query_batching(self, max_batch_size=64, max_wait=0.005):
+        pass
+    
+    def search(self, query, n_results=5, mode="vector", category_filter=None,
+               exclude_contraindications=None, fields=None):
+        return []
+    
+    def unmatched_conditions(self, conditions=None):
+        return []
+
+def _start(system, **kwargs):
+    server = create_server(system, port=0, **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def _stop(server):
+    server.shutdown()
+    server.server_close()
+
+def _request(server, method, path, payload=None, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+    connection.request(method, path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    data = json.loads(response.read().decode('utf-8'))
+    connection.close()
+    return response.status, data
+
+def _raw_request(server, head: bytes):
+    """Запрос с произвольными заголовками, в обход проверок http.client"""
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    connection.connect()
+    connection.sock.sendall(head)
+    response = http.client.HTTPResponse(connection.sock)
+    response.begin()
+    data = json.loads(response.read().decode('utf-8'))
+    connection.close()
+    return response.status, data
+
+class TestHTTPServer:
+    """Тесты HTTP-сервиса на настоящем сервере с заглушкой системы поиска"""
+    
+    @pytest.fixture
+    def server(self):
+        system = _StubSystem()
+        server = _start(system)
+        yield server
+        _stop(server)
+    
+    def test_get_routes(self, server):
+        """GET-запросы отвечают JSON, неизвестный путь - 404"""
+        assert _request(server, "GET", "/health") == (200, {"status": "ok"})
+        assert _request(server, "GET", "/categories") == (200, {"categories": ["анальгетик"]})
+        assert _request(server, "GET", "/unknown")[0] == 404
+    
+    def test_search_parameters(self, server):
+        """Параметры поиска передаются в систему"""
+        status, data = _request(server, "POST", "/search",
+                                {"query": "боль", "max_results": "3", "use_llm": False, "mode": "hybrid"})
+        
+        assert status == 200 and data["results"] == []
+        query, kwargs = server.search_system.calls[0]
+        assert query == "боль"
+        assert kwargs["max_results"] == 3 and kwargs["mode"] == "hybrid"
+        assert kwargs["use_llm"] is False
+    
+    @pytest.mark.parametrize("path, payload", [
+        ("/search", {"max_results": 5}),
+        ("/search", {"query": "боль", "max_results": "пять"}),
+        ("/search", {"query": "боль", "max_results": None}),
+        ("/search", {"query": "боль", "max_results": 0}),
+        ("/search", {"query": "боль", "mode": "bm25"}),
+        ("/search", {"query": "боль", "mode": "hybrid", "fields": ["показания"]}),
+        ("/similar", {"name": "Альфа", "k": [5]}),
+        ("/symptoms", {"symptoms": ["боль"], "max_results": "много"}),
+    ])
+    def test_bad_parameters(self, server, path, payload):
+        """Некорректные параметры - ответ 400, система поиска не вызывается"""
+        status, data = _request(server, "POST", path, payload)
+        
+        assert status == 400 and data["error"]
+        assert server.search_system.calls == []
+    
+    def test_bad_body(self, server):
+        """Некорректное тело и заголовок Content-Length - ответ 400"""
+        status, _ = _raw_request(server, b"POST /search HTTP/1.1\r\nHost: localhost\r\n"
+                                         b"Content-Length: 2\r\nConnection: close\r\n\r\n[]")
+        assert status == 400
+        
+        status, data = _raw_request(server, b"POST /search HTTP/1.1\r\nHost: localhost\r\n"
+                                            b"Content-Length: abc\r\nConnection: close\r\n\r\n")
+        assert status == 400 and "Content-Length" in data["error"]
+    
+    def test_concurrent_stats(self, monkeypatch):
+        """Счетчики статистики не теряют запросы из параллельных обработчиков"""
+        monkeypatch.setattr(advanced_drug_search, "MedicalVectorDB", _StubDB)
+        server = _start(AdvancedDrugSearch("drugs.json"))
+        try:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                statuses = list(pool.map(
+                    lambda i: _request(server, "POST", "/search", {"query": f"запрос {i}"})[0],
+                    range(40)
+                ))
+            status, stats = _request(server, "GET", "/stats")
+        finally:
+            _stop(server)
+        
+        assert statuses == [200] * 40
+        assert status == 200 and stats["total_searches"] == 40
+    
+    def test_overload_does_not_stall_accept(self):
+        """Медленный клиент, получивший 503, не задерживает ответы остальным"""
+        system = _BlockingSystem()
+        server = _start(system, max_workers=1, max_pending=0)
+        busy = threading.Thread(target=_request, args=(server, "POST", "/search", {"query": "боль"}))
+        busy.start()
+        assert system.started.wait(timeout=5)
+        
+        def slow_client():
+            # Заголовки приходят по байту, пока сервер не закроет соединение
+            with socket.create_connection(server.server_address, timeout=5) as sock:
+                try:
+                    sock.sendall(b"POST /search HTTP/1.1\r\n")
+                    for _ in range(100):
+                        sock.sendall(b"X")
+                        time.sleep(0.02)
+                except OSError:
+                    pass
+        
+        slow = threading.Thread(target=slow_client)
+        slow.start()
+        time.sleep(0.1)
+        try:
+            started = time.monotonic()
+            status, data = _request(server, "GET", "/health")
+            elapsed = time.monotonic() - started
+        finally:
+            system.release.set()
+            busy.join(timeout=5)
+            slow.join(timeout=5)
+            _stop(server)
+        
+        assert status == 503 and data["error"]
+        assert elapsed < 0.5
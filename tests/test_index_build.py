@@ -0,0 +1,128 @@
+import functools
+import hashlib
+import os
+
+import numpy as np
+import pytest
+
+import src.vector_database as vector_database
+from src.drug_record import DrugRecord
+from src.parallel_build import ParallelIndexBuilder
+from src.retrieval_backends import NumpyBackend
+from src.vector_database import MedicalVectorDB
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "drugs_database.json")
+
+class _HashEncoder:
+    """Кодировщик без модели: детерминированный вектор из хеша текста"""
+    
+    def encode(self, texts, normalize_embeddings=True):
+        vectors = np.array([np.frombuffer(hashlib.sha256(text.encode('utf-8')).digest(), dtype=np.uint8)
+                            for text in texts], dtype=np.float32) - 127.5
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def _load_hash_encoder(model_name):
+    # Уровень модуля: загрузчик передается процессам пула через pickle
+    return _HashEncoder()
+
+def _expected_embeddings(db):
+    entries = sorted(db._prepare_drug_entry(drug) for drug in db.drugs_data)
+    return [drug_id for drug_id, _, _ in entries], _HashEncoder().encode([text for _, text, _ in entries])
+
+class TestIndexBuild:
+    """Тесты инкрементального построения векторной базы"""
+    
+    @pytest.fixture
+    def db(self, monkeypatch):
+        """База без модели над данными проекта; db.encoded - закодированные тексты"""
+        db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None), field_index_path="",
+                             similarity_graph_path="")
+        db.encoded = []
+        
+        def counting_encode(texts, normalize_embeddings=True):
+            db.encoded.extend(texts)
+            return _HashEncoder().encode(texts)
+        
+        monkeypatch.setattr(db, "encode", counting_encode)
+        db.build_vector_database()
+        db.encoded.clear()
+        return db
+    
+    def test_incremental_build_keeps_collection(self, db):
+        """Повторное инкрементальное построение не должно менять хранилище"""
+        version = db.index_version
+        db.build_vector_database(incremental=True)
+        
+        assert db.backend.count() == len(db.drugs_data), (
+            "Количество записей в хранилище не совпадает с количеством лекарств"
+        )
+        assert db.encoded == []
+        assert db.index_version == version
+    
+    def test_incremental_build_updates_changes(self, db):
+        """Кодируются только измененные лекарства, удаленные убираются из хранилища"""
+        version = db.index_version
+        removed = db.drugs_data.pop()
+        db.drugs_data[0] = DrugRecord.from_dict({**db.drugs_data[0].to_dict(), "описание": "новое описание"})
+        
+        db.build_vector_database(incremental=True)
+        
+        assert db.encoded == [db._create_semantic_drug_text(db.drugs_data[0])]
+        assert removed['id'] not in db.backend.get_fingerprints()
+        assert db.backend.count() == len(db.drugs_data)
+        assert db.index_version != version
+    
+    def test_fingerprints_stored(self, db):
+        """Отпечатки текстов сохраняются вместе с эмбеддингами"""
+        fingerprints = db.backend.get_fingerprints()
+        
+        for drug in db.drugs_data:
+            drug_id, _, metadata = db._prepare_drug_entry(drug)
+            assert fingerprints.get(drug_id) == metadata["отпечаток"], (
+                f"Отпечаток для {drug['название']} не совпадает"
+            )
+    
+    def test_chunked_build_matches_index(self, db):
+        """Пакетная сборка записывает те же эмбеддинги и версию индекса"""
+        version = db.index_version
+        db.build_vector_database(batch_size=7)
+        
+        ids, _, _, embeddings = db.backend.get_embeddings()
+        expected_ids, expected = _expected_embeddings(db)
+        assert ids == expected_ids
+        assert np.allclose(embeddings, expected, atol=1e-6)
+        assert db.index_version == version
+    
+    def test_chunked_helper(self):
+        """Поток разбивается на пакеты без потери элементов"""
+        from src.parallel_build import chunked
+        
+        assert list(chunked(iter(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+        assert list(chunked([], 3)) == []
+    
+    def test_two_worker_build(self, monkeypatch):
+        """Полная сборка и инкрементальное обновление в пуле из двух процессов"""
+        monkeypatch.setattr(vector_database, "ParallelIndexBuilder",
+                            functools.partial(ParallelIndexBuilder, model_loader=_load_hash_encoder))
+        
+        def encode_in_parent(self, texts, normalize_embeddings=True):
+            pytest.fail("При workers=2 лекарства кодируются в процессах пула")
+        
+        monkeypatch.setattr(MedicalVectorDB, "encode", encode_in_parent)
+        db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None), field_index_path="")
+        
+        db.build_vector_database(workers=2, batch_size=4)
+        ids, _, _, embeddings = db.backend.get_embeddings()
+        expected_ids, expected = _expected_embeddings(db)
+        assert ids == expected_ids
+        assert np.allclose(embeddings, expected, atol=1e-6)
+        version = db.index_version
+        
+        changed = db.drugs_data[0]
+        db.drugs_data[0] = DrugRecord.from_dict({**changed.to_dict(), "описание": "новое описание"})
+        db.build_vector_database(incremental=True, workers=2, batch_size=4)
+        ids, _, _, embeddings = db.backend.get_embeddings()
+        expected_ids, expected = _expected_embeddings(db)
+        assert ids == expected_ids
+        assert np.allclose(embeddings, expected, atol=1e-6)
+        assert db.index_version != version
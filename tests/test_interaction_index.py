@@ -0,0 +1,45 @@
+import json
+import os
+
+from src.interaction_index import InteractionIndex
+from src.retrieval_backends import NumpyBackend
+from src.vector_database import MedicalVectorDB
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "drugs_database.json")
+
+class TestInteractionIndex:
+    """Тесты индекса взаимодействий лекарств"""
+    
+    def test_targets_parsed(self):
+        """Категории и названия из текста взаимодействия разбираются в цели"""
+        with open(DATA_PATH, "r", encoding="utf-8") as f:
+            drugs = json.load(f)["лекарства"]
+        index = InteractionIndex(drugs)
+        by_name = {drug['название']: drug['id'] for drug in drugs}
+        
+        assert "антикоагулянт" in index.targets_of(by_name["Парацетамол"])[1]
+        assert "противовоспалительное" in index.targets_of(by_name["Лозартан"])[1]
+        assert by_name["Омепразол"] in index.targets_of(by_name["Клопидогрел"])[0]
+        # "седативный эффект" описывает эффект, а не группу препаратов
+        assert index.targets_of(by_name["Цетиризин"]) == (frozenset(), frozenset())
+    
+    def test_later_drugs_resolved(self):
+        """Лекарство, добавленное после упоминающего его, тоже находится"""
+        index = InteractionIndex([
+            {"id": 1, "название": "Альфа", "категория": "x", "взаимодействие": "Бетазол снижает эффективность"},
+        ])
+        index.add({"id": 2, "название": "Бетазол", "категория": "y", "взаимодействие": ""})
+        
+        assert index.targets_of(1) == (frozenset({2}), frozenset())
+    
+    def test_check_interactions(self):
+        """Проверка списка находит пары и общие предупреждения без LLM"""
+        # Модель и векторы не нужны: проверка идет только по индексам
+        db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None))
+        report = db.check_interactions(["Варфарин", "аспирин", "Метформин", "Неизвестин"])
+        
+        assert report["лекарства"] == ["Варфарин", "Аспирин", "Метформин"]
+        assert report["не_найдены"] == ["Неизвестин"]
+        pairs = {(item["лекарство"], item["с"]) for item in report["взаимодействия"]}
+        assert pairs == {("Аспирин", "Варфарин")}
+        assert {item["лекарство"] for item in report["предупреждения"]} == {"Варфарин", "Метформин"}
@@ -0,0 +1,81 @@
+import hashlib
+import os
+
+import numpy as np
+import pytest
+
+from src.lexical_index import LexicalIndex, stem_russian, tokenize
+from src.retrieval_backends import NumpyBackend
+from src.vector_database import MedicalVectorDB
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "drugs_database.json")
+
+def _hash_encode(texts, normalize_embeddings=True):
+    """Кодирование без модели: детерминированный вектор из хеша текста"""
+    vectors = np.array([np.frombuffer(hashlib.sha256(text.encode('utf-8')).digest(), dtype=np.uint8)
+                        for text in texts], dtype=np.float32) - 127.5
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+class TestLexicalIndex:
+    """Тесты лексического индекса BM25"""
+    
+    def test_stemmer_merges_word_forms(self):
+        """Разные формы слова приводятся к одной основе"""
+        assert stem_russian("боль") == stem_russian("боли")
+        assert stem_russian("аллергия") == stem_russian("аллергии")
+        assert tokenize("Головная боль и температура") == tokenize("головной боли температуры")
+    
+    def test_bm25_ranking_and_filter(self):
+        """Совпадение по показаниям ранжируется выше, фильтр ограничивает выдачу"""
+        index = LexicalIndex([
+            {"id": 1, "название": "Альфа", "показания": ["головная боль"], "противопоказания": []},
+            {"id": 2, "название": "Бета", "показания": ["кашель"], "побочные_эффекты": ["головная боль"]},
+            {"id": 3, "название": "Гамма", "показания": ["аллергия"]},
+        ])
+        
+        hits = index.search("головные боли")
+        assert [drug_id for drug_id, _ in hits] == [1, 2]
+        assert index.search("головные боли", allowed_ids={2})[0][0] == 2
+        assert index.search("космические корабли") == []
+        
+        index.remove(1)
+        assert [drug_id for drug_id, _ in index.search("головная боль")] == [2]
+        assert index.search("альфа") == []
+        assert "альф" not in index._postings
+    
+    def test_hybrid_exact_name_skips_encoder(self):
+        """Запрос по точному названию не обращается к модели"""
+        db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None), field_index_path="",
+                             similarity_graph_path="")
+        drug = db.drugs_data[0]
+        
+        def fail_encode(*args, **kwargs):
+            raise AssertionError("модель не должна вызываться")
+        
+        db.query_encoder = type("Encoder", (), {"encode": staticmethod(fail_encode)})()
+        results = db.hybrid_search(drug['название'].lower(), n_results=3)
+        
+        assert results[0]['лекарство'] == drug['название']
+    
+    def test_hybrid_search_relevance(self, monkeypatch):
+        """Гибридный поиск находит жаропонижающие по симптому и без смысловых векторов"""
+        db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None), field_index_path="",
+                             similarity_graph_path="")
+        monkeypatch.setattr(db, "encode", _hash_encode)
+        db.build_vector_database()
+        
+        results = db.hybrid_search("температура", n_results=5)
+        found = [result['лекарство'] for result in results]
+        
+        assert any(name in found for name in ["Парацетамол", "Ибупрофен", "Аспирин"])
+    
+    def test_search_modes(self):
+        """Режим поиска выбирается параметром mode; точное название в гибридном режиме без модели"""
+        db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None))
+        
+        results = db.search("парацетамол", n_results=3, mode="hybrid")
+        assert [result['лекарство'] for result in results] == ["Парацетамол"]
+        with pytest.raises(ValueError):
+            db.search("парацетамол", mode="bm25")
+        with pytest.raises(ValueError):
+            db.search("кашель", mode="hybrid", fields=("показания",))
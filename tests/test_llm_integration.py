@@ -0,0 +1,146 @@
+import json
+
+import pytest
+
+import src.advanced_drug_search as advanced_drug_search
+import src.llm_integration as llm_integration
+from src.advanced_drug_search import AdvancedDrugSearch
+from src.llm_integration import LocalLLMClient
+
+DRUGS = {
+    "альфа": {"id": 1, "название": "Альфа", "категория": "анальгетик", "описание": "обезболивающее",
+              "показания": ["боль"], "противопоказания": ["язва"], "побочные_эффекты": ["тошнота"],
+              "дозировка": "1 таблетка"},
+    "бета": {"id": 2, "название": "Бета", "категория": "анальгетик", "описание": "жаропонижающее",
+             "показания": ["температура"], "противопоказания": [], "побочные_эффекты": [],
+             "дозировка": "2 таблетки"},
+}
+
+class _FakeResponse:
+    """Ответ requests: JSON целиком или построчный NDJSON-поток"""
+    
+    def __init__(self, status_code=200, payload=None, lines=()):
+        self.status_code = status_code
+        self._payload = payload
+        self._lines = lines
+    
+    def json(self):
+        return self._payload
+    
+    def iter_lines(self):
+        for line in self._lines:
+            yield line.encode('utf-8')
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        return False
+
+def _ndjson(*chunks):
+    return [json.dumps(chunk, ensure_ascii=False) if chunk else "" for chunk in chunks]
+
+@pytest.fixture
+def ollama(monkeypatch):
+    """Ollama с одной моделью; ответы /api/generate задаются списком строк NDJSON"""
+    state = {"lines": _ndjson({"response": "При"}, None, {"response": "вет"}, {"response": "", "done": True}),
+             "status": 200, "payloads": []}
+    
+    def fake_get(url, timeout=None):
+        return _FakeResponse(payload={"models": [{"name": "llama2"}]})
+    
+    def fake_post(url, json=None, stream=False, timeout=None):
+        state["payloads"].append(json)
+        if stream:
+            return _FakeResponse(state["status"], lines=state["lines"])
+        return _FakeResponse(state["status"], payload={"response": "Привет"})
+    
+    monkeypatch.setattr(llm_integration.requests, "get", fake_get)
+    monkeypatch.setattr(llm_integration.requests, "post", fake_post)
+    return state
+
+class TestLocalLLMClient:
+    """Тесты потоковой генерации через Ollama"""
+    
+    def test_stream_parses_ndjson(self, ollama):
+        """Токены читаются из NDJSON-чанков, пустые строки пропускаются"""
+        client = LocalLLMClient()
+        
+        assert list(client.generate_stream("промпт")) == ["При", "вет"]
+        assert client.last_error is None
+        assert ollama["payloads"][0]["stream"] is True
+    
+    def test_stream_stops_after_done(self, ollama):
+        """Чанки после done не читаются"""
+        ollama["lines"] = _ndjson({"response": "А", "done": True}, {"response": "лишнее"})
+        
+        assert list(LocalLLMClient().generate_stream("промпт")) == ["А"]
+    
+    def test_stream_errors(self, ollama):
+        """Ошибка в чанке и HTTP-ошибка возвращаются текстом и запоминаются"""
+        client = LocalLLMClient()
+        ollama["lines"] = _ndjson({"response": "А"}, {"error": "model not found"})
+        assert list(client.generate_stream("промпт")) == ["А", "Ошибка LLM: model not found"]
+        assert client.last_error == "model not found"
+        
+        ollama["status"] = 500
+        assert list(client.generate_stream("промпт")) == ["Ошибка LLM: 500"]
+        assert client.last_error == "HTTP 500"
+    
+    def test_on_token_receives_every_token(self, ollama):
+        """on_token вызывается для каждого токена, ответ собирается целиком"""
+        received = []
+        
+        answer = LocalLLMClient().generate_response("промпт", on_token=received.append)
+        
+        assert answer == "Привет"
+        assert received == ["При", "вет"]
+
+class _StubDB:
+    """Векторная база без модели: только разрешение названий"""
+    index_version = "v1"
+    
+    def __init__(self, *args, **kwargs):
+        self.drug_store = []
+    
+    def build_vector_database(self, incremental=False, workers=1):
+        pass
+    
+    def prepare_similarity_graph(self):
+        return True
+    
+    def prepare_field_index(self):
+        return True
+    
+    def resolve_drugs(self, names):
+        return [DRUGS.get(name.lower()) for name in names]
+
+class TestInteractiveCompare:
+    """Тесты сравнения двух лекарств в интерактивном режиме"""
+    
+    @pytest.fixture
+    def run_compare(self, monkeypatch, capsys):
+        monkeypatch.setattr(advanced_drug_search, "MedicalVectorDB", _StubDB)
+        system = AdvancedDrugSearch("drugs.json")
+        
+        def run(names):
+            answers = iter(["5", names, "8"])
+            monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+            capsys.readouterr()
+            system.interactive_search()
+            return capsys.readouterr().out
+        
+        return run
+    
+    def test_not_found_message_printed(self, run_compare, ollama):
+        """Сообщение о ненайденном лекарстве выводится, хотя токенов не было"""
+        output = run_compare("Альфа, Неизвестин")
+        
+        assert "Не удалось найти информацию об одном из лекарств" in output
+        assert ollama["payloads"] == []
+    
+    def test_streamed_comparison_printed_once(self, run_compare, ollama):
+        """Потоковый ответ выводится по токенам и не дублируется"""
+        output = run_compare("Альфа, Бета")
+        
+        assert output.count("Привет") == 1
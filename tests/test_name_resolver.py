@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from src.name_resolver import NameResolver, edit_distance
+from src.retrieval_backends import NumpyBackend
+from src.vector_database import MedicalVectorDB
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "drugs_database.json")
+
+class TestNameResolver:
+    """Тесты разрешения названий лекарств"""
+    
+    @pytest.fixture
+    def resolver(self):
+        return NameResolver([
+            {"id": 1, "название": "Парацетамол"},
+            {"id": 2, "название": "Ибупрофен"},
+            {"id": 3, "название": "Но-шпа"},
+        ])
+    
+    def test_edit_distance(self):
+        """Расстояние учитывает перестановку соседних букв и обрывается по порогу"""
+        assert edit_distance("ибупрофен", "ибупрофен", 2) == 0
+        assert edit_distance("ибупрофен", "ибупорфен", 2) == 1
+        assert edit_distance("парацетамол", "парацитамоль", 2) == 2
+        assert edit_distance("парацетамол", "ибупрофен", 2) == 3
+    
+    def test_exact_and_fuzzy(self, resolver):
+        """Точное название без учета регистра и пунктуации, затем опечатки"""
+        assert resolver.resolve(" ПАРАЦЕТАМОЛ ") == 1
+        assert resolver.resolve("но шпа") == 3
+        assert resolver.resolve("парацитамол") == 1
+        assert resolver.resolve_fuzzy("ибупорфен") == (2, 1)
+        assert resolver.resolve("аспирин") is None
+        assert resolver.resolve_many(["ибупрофен", "неизвестно"]) == [2, None]
+    
+    def test_database_resolution(self, monkeypatch):
+        """Все названия базы разрешаются без семантического поиска"""
+        db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None), field_index_path="",
+                             similarity_graph_path="")
+        
+        def no_semantic_search(queries, n_results=5):
+            pytest.fail(f"Семантический поиск для названий: {queries}")
+        
+        monkeypatch.setattr(db, "search_drugs_batch", no_semantic_search)
+        for drug in db.drugs_data:
+            assert db.name_resolver.resolve(drug['название'].lower()) == drug['id']
+        
+        first, second = db.drugs_data[:2]
+        assert db.resolve_drugs([first['название'], second['название'].upper()]) == [first, second]
+    
+    def test_remove_and_rename(self, resolver):
+        """Удаленное или переименованное лекарство не находится по старому названию"""
+        resolver.remove(1)
+        assert resolver.resolve("парацетамол") is None
+        assert resolver.resolve("парацитамол") is None
+        
+        resolver.add(2, "Нурофен")
+        assert resolver.resolve_exact("ибупрофен") is None
+        assert resolver.resolve_exact("НУРОФЕН!") == 2
+    
+    def test_shared_name(self, resolver):
+        """Название, общее для двух лекарств, остается после удаления одного из них"""
+        resolver.add(4, "парацетамол")
+        assert resolver.resolve_exact("Парацетамол") == 4
+        
+        resolver.remove(4)
+        assert resolver.resolve_exact("Парацетамол") == 1
+        assert resolver.resolve("парацитамол") == 1
+        
+        resolver.add(4, "Парацетамол")
+        resolver.remove(1)
+        assert resolver.resolve_exact("парацетамол") == 4
+        resolver.remove(4)
+        assert resolver.resolve("парацетамол") is None
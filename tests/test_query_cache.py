@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from src.embedding_cache import QueryEmbeddingCache
+
+class TestQueryEmbeddingCache:
+    """Тесты LRU-кеша эмбеддингов запросов"""
+    
+    def test_lru_eviction_and_counters(self):
+        """Самые старые записи вытесняются, счетчики считают попадания и промахи"""
+        cache = QueryEmbeddingCache("test-model", max_size=2)
+        cache.put("головная боль", np.ones(4))
+        cache.put("температура", np.zeros(4))
+        
+        assert cache.get("головная боль") is not None
+        cache.put("аллергия", np.ones(4))
+        
+        assert cache.get("температура") is None, "Самая старая запись должна быть вытеснена"
+        assert cache.get("Головная   боль") is not None, "Ключ должен нормализоваться"
+        
+        stats = cache.stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        assert stats["size"] == 2
+    
+    def test_persistence_roundtrip(self, tmp_path):
+        """Кеш сохраняется на диск и загружается при следующем запуске"""
+        cache = QueryEmbeddingCache("test-model", cache_dir=str(tmp_path))
+        cache.put("кашель", np.arange(4, dtype=np.float32))
+        cache.save()
+        
+        restored = QueryEmbeddingCache("test-model", cache_dir=str(tmp_path))
+        assert np.allclose(restored.get("кашель"), np.arange(4))
+        
+        other_model = QueryEmbeddingCache("other-model", cache_dir=str(tmp_path))
+        assert other_model.get("кашель") is None, "Кеш другой модели не должен использоваться"
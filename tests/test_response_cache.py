@@ -0,0 +1,58 @@
+import time
+import pytest
+
+from src.response_cache import ResponseCache
+
+class TestResponseCache:
+    """Тесты кеша ответов smart_search"""
+    
+    def test_ttl_expiration(self):
+        """Устаревший ответ не возвращается"""
+        cache = ResponseCache(max_size=10, ttl=0.05)
+        cache.put(("кашель", (1, 2)), {"ai_advice": "совет"})
+        
+        assert cache.get(("кашель", (1, 2))) == {"ai_advice": "совет"}
+        time.sleep(0.1)
+        assert cache.get(("кашель", (1, 2))) is None
+    
+    def test_size_eviction(self):
+        """При переполнении вытесняются давно не использованные ответы"""
+        cache = ResponseCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+    
+    def test_version_invalidation(self):
+        """Изменение версии индекса сбрасывает кеш"""
+        cache = ResponseCache()
+        cache.check_version("v1")
+        cache.put("a", 1)
+        
+        cache.check_version("v1")
+        assert cache.get("a") == 1
+        
+        cache.check_version("v2")
+        assert cache.get("a") is None
+    
+    def test_conditions_key(self):
+        """Состояния пользователя в ключе не зависят от регистра, порядка и повторов"""
+        assert ResponseCache.normalize_conditions(["Язва ", "беременность", "язва"]) == ("беременность", "язва")
+        assert ResponseCache.normalize_conditions(None) == ()
+    
+    def test_caller_changes_not_cached(self):
+        """Изменение сохраненного или полученного ответа не портит запись в кеше"""
+        cache = ResponseCache()
+        response = {"results": [1, 2], "ai_advice": "совет"}
+        cache.put("a", response)
+        response["results"].append(3)
+        
+        first = cache.get("a")
+        first["results"].clear()
+        first["ai_advice"] = ""
+        
+        assert cache.get("a") == {"results": [1, 2], "ai_advice": "совет"}
@@ -0,0 +1,140 @@
+import threading
+
+import numpy as np
+import pytest
+
+import src.retrieval_backends as retrieval_backends
+from src.retrieval_backends import NumpyBackend
+from src.vector_database import MedicalVectorDB
+
+def _normalized(rows):
+    matrix = np.asarray(rows, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+class TestNumpyBackend:
+    """Тесты точного поиска в памяти"""
+    
+    @pytest.fixture
+    def backend(self):
+        backend = NumpyBackend(path=None)
+        embeddings = _normalized([[1, 0, 0], [0.9, 0.1, 0], [0, 1, 0], [0, 0, 1]])
+        metadatas = [
+            {"категория": "анальгетик", "отпечаток": "a"},
+            {"категория": "антибиотик", "отпечаток": "b"},
+            {"категория": "анальгетик", "отпечаток": "c"},
+            {"категория": "антибиотик", "отпечаток": "d"},
+        ]
+        backend.upsert([1, 2, 3, 4], embeddings, [""] * 4, metadatas)
+        return backend
+    
+    def test_top_k_order_and_distance(self, backend):
+        """Результаты упорядочены по близости, расстояние как у Chroma (2 - 2cos)"""
+        hits = backend.query(_normalized([[1, 0, 0]]), n_results=2)[0]
+        
+        assert [drug_id for drug_id, _ in hits] == [1, 2]
+        assert hits[0][1] == pytest.approx(0.0, abs=1e-6)
+    
+    def test_category_filter(self, backend):
+        """Фильтр категории эквивалентен where={"категория": ...}"""
+        hits = backend.query(_normalized([[1, 0, 0]]), n_results=5, category="антибиотик")[0]
+        
+        assert [drug_id for drug_id, _ in hits] == [2, 4]
+        assert backend.query(_normalized([[1, 0, 0]]), 5, category="нет такой")[0] == []
+    
+    def test_exclude_ids_before_ranking(self, backend):
+        """Исключенные id отсекаются маской, top-k заполняется остальными"""
+        hits = backend.query(_normalized([[1, 0, 0]]), n_results=2, exclude_ids={1})[0]
+        assert [drug_id for drug_id, _ in hits] == [2, 3]
+        
+        hits = backend.query(_normalized([[1, 0, 0]]), n_results=5, category="анальгетик",
+                             exclude_ids={1, 99})[0]
+        assert [drug_id for drug_id, _ in hits] == [3]
+        # Кешированная маска категории не изменилась
+        assert len(backend.query(_normalized([[1, 0, 0]]), 5, category="анальгетик")[0]) == 2
+    
+    def test_delete_and_persistence(self, backend, tmp_path):
+        """Удаление записей и сохранение индекса в артефакт"""
+        backend.delete([1])
+        backend.path = str(tmp_path / "index.emb")
+        backend.flush()
+        
+        restored = NumpyBackend(path=backend.path)
+        
+        assert restored.count() == 3
+        assert restored.get_fingerprints() == {2: "b", 3: "c", 4: "d"}
+        assert restored.query(_normalized([[1, 0, 0]]), 1)[0][0][0] == 2
+
+class TestQuantizedNumpyBackend:
+    """Тесты квантованной матрицы float16/int8"""
+    
+    @pytest.fixture
+    def embeddings(self):
+        rng = np.random.default_rng(0)
+        return _normalized(rng.standard_normal((300, 16)))
+    
+    def _build(self, embeddings, storage, rerank_factor, path=None):
+        backend = NumpyBackend(path=path, storage=storage, rerank_factor=rerank_factor)
+        metadatas = [{"категория": "а" if i % 2 else "б", "отпечаток": str(i)} for i in range(len(embeddings))]
+        backend.upsert(list(range(len(embeddings))), embeddings, [""] * len(embeddings), metadatas)
+        return backend
+    
+    @pytest.mark.parametrize("storage", ["float16", "int8"])
+    def test_rerank_matches_exact(self, embeddings, storage):
+        """С переранжированием результаты и расстояния совпадают с float32"""
+        exact = self._build(embeddings, "float32", 0)
+        quantized = self._build(embeddings, storage, 4)
+        queries = embeddings[:5]
+        
+        for category in (None, "а"):
+            expected = exact.query(queries, 5, category)
+            actual = quantized.query(queries, 5, category)
+            for expected_hits, actual_hits in zip(expected, actual):
+                assert [drug_id for drug_id, _ in actual_hits] == [drug_id for drug_id, _ in expected_hits]
+                assert [d for _, d in actual_hits] == pytest.approx([d for _, d in expected_hits], abs=1e-5)
+    
+    def test_int8_without_rerank_is_close(self, embeddings):
+        """Без переранжирования лучший результат находится, расстояния приближенные"""
+        backend = self._build(embeddings, "int8", 0)
+        hits = backend.query(embeddings[:3], 3)
+        
+        assert [query_hits[0][0] for query_hits in hits] == [0, 1, 2]
+        assert hits[0][0][1] == pytest.approx(0.0, abs=0.02)
+        assert backend.memory_usage()["scan_matrix"] < embeddings.nbytes / 3
+    
+    def test_flush_releases_float32_matrix(self, embeddings, tmp_path):
+        """После сохранения полная матрица читается из memory map артефакта"""
+        backend = self._build(embeddings, "int8", 4, path=str(tmp_path / "index.emb"))
+        backend.flush()
+        
+        assert backend.memory_usage()["float32_in_memory"] == 0
+        assert backend.query(embeddings[7], 1)[0][0][0] == 7
+    
+    def test_upsert_during_flush_not_lost(self, embeddings, tmp_path, monkeypatch):
+        """Запись, пришедшая во время сохранения, не теряется при перезагрузке артефакта"""
+        backend = self._build(embeddings[:-1], "int8", 4, path=str(tmp_path / "index.emb"))
+        save = retrieval_backends.EmbeddingArtifact.save
+        writers = []
+        
+        def save_with_concurrent_upsert(*args, **kwargs):
+            writer = threading.Thread(target=backend.upsert, args=(
+                [999], embeddings[-1:], [""], [{"категория": "а", "отпечаток": "new"}]
+            ))
+            writer.start()
+            writers.append(writer)
+            save(*args, **kwargs)
+        
+        monkeypatch.setattr(retrieval_backends.EmbeddingArtifact, "save", save_with_concurrent_upsert)
+        backend.flush()
+        writers[0].join(timeout=5)
+        
+        assert not writers[0].is_alive()
+        assert backend.get_fingerprints()[999] == "new"
+        assert backend.query(embeddings[-1], 1)[0][0][0] == 999
+    
+    def test_default_path_next_to_data(self, tmp_path):
+        """Артефакт NumPy по умолчанию лежит рядом с файлом данных, а не в рабочем каталоге"""
+        db = MedicalVectorDB(str(tmp_path / "drugs.json"), backend="numpy-int8",
+                             field_index_path="", similarity_graph_path="")
+        
+        assert db.backend.path == str(tmp_path / "numpy_index.emb")
+        assert db.backend.storage == "int8"
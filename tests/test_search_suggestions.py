@@ -0,0 +1,53 @@
+import pytest
+
+from src.search_suggestions import generate_suggestions
+
+DRUGS = {
+    1: {"id": 1, "название": "Альфа", "категория": "анальгетик"},
+    2: {"id": 2, "название": "Бета", "категория": "анальгетик"},
+    3: {"id": 3, "название": "Гамма", "категория": "нпвп"},
+}
+
+class _Store:
+    def category_of(self, drug_id):
+        return DRUGS[drug_id]["категория"]
+
+class _DB:
+    def __init__(self, neighbors=(2, 3), error=None):
+        self.drug_store = _Store()
+        self.neighbors = neighbors
+        self.error = error
+    
+    def similar_drugs(self, drug_id, k=5):
+        if self.error:
+            raise self.error
+        return [{"лекарство": DRUGS[i]["название"], "полные_данные": DRUGS[i]} for i in self.neighbors]
+
+def _results(*ids):
+    return [{"лекарство": DRUGS[i]["название"], "полные_данные": DRUGS[i]} for i in ids]
+
+class TestSearchSuggestions:
+    """Тесты подсказок к результатам поиска"""
+    
+    def test_categories_and_neighbors(self):
+        """Категории результатов и соседи лучшего результата, кроме уже найденных"""
+        suggestions = generate_suggestions(_DB(), _results(1, 2))
+        
+        assert suggestions == [
+            "Похожие категории: анальгетик",
+            "Похожие лекарства: Гамма",
+            "Для точного диагноза обратитесь к врачу",
+        ]
+    
+    def test_graph_error_falls_back_to_categories(self):
+        """Ошибка графа похожих лекарств не прерывает поиск"""
+        suggestions = generate_suggestions(_DB(error=RuntimeError("нет эмбеддингов")), _results(1))
+        
+        assert suggestions == ["Похожие категории: анальгетик", "Для точного диагноза обратитесь к врачу"]
+    
+    def test_contraindicated_neighbors_dropped(self):
+        """Противопоказанные пользователю лекарства не предлагаются как похожие"""
+        suggestions = generate_suggestions(_DB(), _results(1), excluded_ids={3})
+        
+        assert "Похожие лекарства: Бета" in suggestions
+        assert not any("Гамма" in suggestion for suggestion in suggestions)
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pytest
+
+import src.vector_database as vector_database
+from src.retrieval_backends import NumpyBackend
+from src.similarity_graph import SimilarityGraph
+from src.vector_database import MedicalVectorDB
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "drugs_database.json")
+
+def _hash_encode(texts, normalize_embeddings=True):
+    """Кодирование без модели: детерминированный вектор из хеша текста"""
+    vectors = np.array([np.frombuffer(hashlib.sha256(text.encode('utf-8')).digest(), dtype=np.uint8)
+                        for text in texts], dtype=np.float32) - 127.5
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+class TestSimilarityGraph:
+    """Тесты графа похожих лекарств"""
+    
+    def test_blockwise_build_matches_full(self):
+        """Блочное построение совпадает с полной матрицей схожести"""
+        rng = np.random.default_rng(0)
+        embeddings = rng.normal(size=(50, 16)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        ids = list(range(100, 150))
+        
+        graph = SimilarityGraph.build(ids, embeddings, k=5, block_rows=7)
+        
+        full = embeddings @ embeddings.T
+        np.fill_diagonal(full, -np.inf)
+        for row, drug_id in enumerate(ids):
+            expected = [ids[column] for column in np.argsort(-full[row])[:5]]
+            assert [neighbor for neighbor, _ in graph.neighbors_of(drug_id)] == expected
+        
+        assert graph.neighbors.dtype == np.int32 and graph.scores.dtype == np.float16
+        assert graph.neighbors_of(999) == []
+    
+    def test_save_and_load(self, tmp_path):
+        """Граф сохраняется и загружается вместе с версией индекса"""
+        embeddings = np.eye(4, dtype=np.float32)
+        graph = SimilarityGraph.build([1, 2, 3, 4], embeddings, k=10, index_version="v1")
+        assert graph.k == 3
+        
+        path = str(tmp_path / "graph.npz")
+        graph.save(path)
+        loaded = SimilarityGraph.load(path)
+        
+        assert loaded.index_version == "v1"
+        assert loaded.neighbors_of(2) == graph.neighbors_of(2)
+    
+    def test_similar_drugs(self, monkeypatch):
+        """Похожие лекарства берутся из графа и не включают само лекарство"""
+        db = MedicalVectorDB(DATA_PATH, backend=NumpyBackend(path=None), field_index_path="",
+                             similarity_graph_path="")
+        monkeypatch.setattr(db, "encode", _hash_encode)
+        db.build_vector_database()
+        
+        drug = db.drugs_data[0]
+        results = db.similar_drugs(drug['id'], k=3)
+        
+        assert len(results) == 3
+        assert drug['id'] not in [result['полные_данные']['id'] for result in results]
+        similarities = [float(result['схожесть']) for result in results]
+        assert similarities == sorted(similarities, reverse=True)
+        assert db.get_similarity_graph().index_version == db.index_version
+    
+    def test_default_path_loaded_without_rebuild(self, tmp_path, monkeypatch):
+        """Граф по умолчанию сохраняется рядом с данными; следующий запуск его читает"""
+        data_path = tmp_path / "drugs.json"
+        with open(DATA_PATH, "r", encoding="utf-8") as f:
+            data_path.write_text(f.read(), encoding="utf-8")
+        builds = []
+        build = SimilarityGraph.build
+        
+        def counting_build(*args, **kwargs):
+            builds.append(args[0])
+            return build(*args, **kwargs)
+        
+        monkeypatch.setattr(vector_database.SimilarityGraph, "build", counting_build)
+        
+        def open_db():
+            db = MedicalVectorDB(str(data_path), backend=NumpyBackend(path=None), field_index_path="")
+            monkeypatch.setattr(db, "encode", _hash_encode)
+            db.build_vector_database()
+            assert db.prepare_similarity_graph()
+            return db
+        
+        db = open_db()
+        assert db.similarity_graph_path == str(tmp_path / "similarity_graph.npz")
+        assert os.path.exists(db.similarity_graph_path) and len(builds) == 1
+        
+        restarted = open_db()
+        assert len(builds) == 1
+        assert restarted.similarity_graph.index_version == db.index_version
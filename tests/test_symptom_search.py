@@ -1,6 +1,32 @@
+import hashlib
+import json
+
+import numpy as np
 import pytest
 import time
 
+from src.retrieval_backends import NumpyBackend
+from src.vector_database import MedicalVectorDB
+
+DRUGS = [
+    {"id": number, "название": name, "категория": category, "описание": description,
+     "показания": indications, "противопоказания": [], "побочные_эффекты": [], "дозировка": ""}
+    for number, (name, category, description, indications) in enumerate([
+        ("Альфа", "анальгетик", "обезболивающее", ["головная боль"]),
+        ("Бета", "антигистаминное", "от аллергии", ["аллергия", "зуд"]),
+        ("Гамма", "отхаркивающее", "от кашля", ["кашель"]),
+        ("Дельта", "жаропонижающее", "снижает температуру", ["температура"]),
+        ("Эпсилон", "анальгетик", "спазмолитик", ["спазм", "боль"]),
+        ("Дзета", "антибиотик", "антибактериальное", ["инфекция"]),
+    ], start=1)
+]
+
+def _hash_encode(texts, normalize_embeddings=True):
+    """Кодирование без модели: детерминированный вектор из хеша текста"""
+    vectors = np.array([np.frombuffer(hashlib.sha256(text.encode('utf-8')).digest(), dtype=np.uint8)
+                        for text in texts], dtype=np.float32) - 127.5
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
 class TestSymptomSearch:
     """Тесты поиска лекарств по симптомам"""
     
@@ -68,4 +94,32 @@ class TestSymptomSearch:
             assert len(results) > 0, f"Поиск '{query}' не вернул результатов"
         
         avg_time = sum(search_performance['search_times']) / len(search_performance['search_times'])
-        print(f"Среднее время поиска: {avg_time:.3f} сек")
\ No newline at end of file
+        print(f"Среднее время поиска: {avg_time:.3f} сек")
+    
+    def test_batch_search_matches_single(self, tmp_path, monkeypatch):
+        """Пакетный поиск кодирует запросы одним вызовом и возвращает те же лекарства"""
+        data_path = tmp_path / "drugs.json"
+        data_path.write_text(json.dumps({"лекарства": DRUGS}, ensure_ascii=False), encoding="utf-8")
+        db = MedicalVectorDB(str(data_path), backend=NumpyBackend(path=None), field_index_path="",
+                             similarity_graph_path="")
+        monkeypatch.setattr(db, "encode", _hash_encode)
+        db.build_vector_database()
+        
+        encoded = []
+        
+        def counting_encode(texts, normalize_embeddings=True):
+            encoded.append(list(texts))
+            return _hash_encode(texts)
+        
+        monkeypatch.setattr(db, "encode", counting_encode)
+        queries = ["головная боль", "аллергия зуд", "кашель"]
+        
+        batch_results = db.search_drugs_batch(queries, n_results=3)
+        
+        assert len(encoded) == 1 and len(encoded[0]) == len(queries)
+        assert len(batch_results) == len(queries)
+        for query, results in zip(queries, batch_results):
+            db.query_cache.clear()
+            single = [result['лекарство'] for result in db.search_drugs(query, n_results=3)]
+            batched = [result['лекарство'] for result in results]
+            assert batched == single, f"Результаты для '{query}' не совпадают: {batched} != {single}"
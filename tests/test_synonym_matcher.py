@@ -0,0 +1,57 @@
+import pytest
+
+from src.retrieval_backends import NumpyBackend
+from src.synonym_matcher import AhoCorasick, BUILTIN_SYNONYMS, SynonymMatcher, SynonymDictionary
+from src.vector_database import MedicalVectorDB
+
+class TestSynonymMatcher:
+    """Тесты автомата Ахо-Корасик для расширения запросов"""
+    
+    def test_overlapping_patterns(self):
+        """Находятся вложенные и пересекающиеся шаблоны"""
+        automaton = AhoCorasick(["he", "she", "his", "hers"])
+        
+        matches = sorted(automaton.iter_matches("ushers"))
+        assert matches == [(3, 0), (3, 1), (5, 3)]
+        assert automaton.matched_indices("ahishers") == [0, 1, 2, 3]
+    
+    def test_same_as_substring_checks(self):
+        """Результат совпадает с последовательной проверкой `термин in текст`"""
+        synonyms = {
+            'головная боль': 'мигрень цефалгия',
+            'боль': 'болевой синдром',
+            'жар': 'температура лихорадка',
+            'сыпь': 'аллергия зуд крапивница',
+        }
+        matcher = SynonymMatcher(synonyms)
+        
+        for text in ["сильная головная боль и жар", "сыпь", "обезболивающее", "жаропонижающее", ""]:
+            expected = [expansion for term, expansion in synonyms.items() if term in text]
+            assert matcher.expansions(text) == expected
+    
+    def test_dictionary_loading(self, tmp_path):
+        """Словарь загружается из JSON, при ошибке используется встроенный"""
+        path = tmp_path / "synonyms.json"
+        path.write_text('{"расширения_запросов": {"зуд": "аллергия"}}', encoding='utf-8')
+        
+        dictionary = SynonymDictionary.load(str(path))
+        assert dictionary.query_expansions.expansions("кожный зуд") == ["аллергия"]
+        assert len(dictionary.indication_synonyms) == 0
+        
+        fallback = SynonymDictionary.load(str(tmp_path / "нет.json"))
+        assert len(fallback.query_expansions) == len(BUILTIN_SYNONYMS[SynonymDictionary.QUERY_EXPANSIONS])
+        assert fallback.query_expansions.expansions("температура") == ["лихорадка жар"]
+        assert fallback.category_synonyms == BUILTIN_SYNONYMS[SynonymDictionary.CATEGORY_SYNONYMS]
+    
+    def test_query_expansion_uses_dictionary(self, tmp_path):
+        """Расширение запроса берет синонимы из словаря рядом с файлом данных"""
+        (tmp_path / "drugs.json").write_text('{"лекарства": []}', encoding='utf-8')
+        (tmp_path / "synonyms.json").write_text('{"расширения_запросов": {"температура": "гипертермия"}}',
+                                                encoding='utf-8')
+        db = MedicalVectorDB(str(tmp_path / "drugs.json"), backend=NumpyBackend(path=None),
+                             field_index_path="", similarity_graph_path="")
+        
+        expanded = db._expand_search_query("температура")
+        
+        assert expanded.split()[0] == "температура"
+        assert "гипертермия" in expanded and "жар" not in expanded